@@ -0,0 +1,262 @@
+"""
+Async AI Clone
+AIClone for asyncio applications: turns await Ollama over a pooled httpx
+client and run memory (SQLite) work in a thread executor, so one process can
+drive many concurrent chats
+"""
+
+import asyncio
+import functools
+from typing import Any, AsyncIterator, Dict, List, Union
+
+# Handle imports for both package and direct execution
+try:
+    from .clone import AIClone, CACHED_TOKEN
+    from .ollama_client import AsyncOllamaClient, httpx
+    from .response_cache import ResponseCache
+except ImportError:
+    from ai_clone.clone import AIClone, CACHED_TOKEN
+    from ai_clone.ollama_client import AsyncOllamaClient, httpx
+    from ai_clone.response_cache import ResponseCache
+
+# Seconds a whole turn (prompt building, generation, memory writes) may take
+DEFAULT_TURN_TIMEOUT = 120
+
+class AsyncAIClone(AIClone):
+    """
+    An AI clone whose turns are coroutines.
+
+    A clone answers one message at a time; turns of different clones run
+    concurrently and share the httpx connection pool of their event loop.
+    Every turn has a deadline (turn_timeout) and can be cancelled, which
+    closes the request and stops the generation.
+    """
+
+    def __init__(self, personality_data: Dict[str, Any], ollama_host: str = "http://localhost:11434",
+                 memory_type: str = "sqlite_vec", memory_options: Dict[str, Any] = None,
+                 ollama_options: Dict[str, Any] = None, generation_options: Dict[str, Any] = None,
+                 response_cache: Union[bool, ResponseCache] = False, turn_timeout: float = DEFAULT_TURN_TIMEOUT):
+        """
+        Initialize the clone; prefer ``await AsyncAIClone.create(...)`` inside a
+        running event loop, which does the blocking setup in an executor.
+
+        Args:
+            personality_data (Dict[str, Any]): Personality questionnaire data
+            ollama_host (str): Base URL of the Ollama server
+            memory_type (str): Memory backend, see AIClone
+            memory_options (Dict[str, Any], optional): Options for the memory backend
+            ollama_options (Dict[str, Any], optional): Options for the Ollama clients
+            generation_options (Dict[str, Any], optional): Overrides of the model options
+            response_cache (Union[bool, ResponseCache]): Opt-in completion cache, see AIClone
+            turn_timeout (float): Seconds a turn may take before it is abandoned
+        """
+        if httpx is None:
+            raise ImportError("AsyncAIClone requires httpx: pip install httpx")
+        self.turn_timeout = turn_timeout
+        self._turn_lock = asyncio.Lock()
+        super().__init__(personality_data, ollama_host, memory_type, memory_options, ollama_options,
+                         generation_options, response_cache)
+
+    @classmethod
+    async def create(cls, personality_data: Dict[str, Any], **kwargs) -> "AsyncAIClone":
+        """
+        Create a clone without blocking the event loop and check its Ollama server.
+
+        Args:
+            personality_data (Dict[str, Any]): Personality questionnaire data
+            **kwargs: Constructor arguments
+
+        Returns:
+            AsyncAIClone: The initialized clone
+        """
+        loop = asyncio.get_running_loop()
+        clone = await loop.run_in_executor(None, functools.partial(cls, personality_data, **kwargs))
+        await clone.test_ollama_connection_async()
+        return clone
+
+    def _test_ollama_connection(self):
+        """Skipped at construction: create() probes the server asynchronously"""
+
+    def _async_ollama(self) -> AsyncOllamaClient:
+        """Client for the running event loop (the connection pool is shared per loop)"""
+        return AsyncOllamaClient(self.ollama_host, **self.ollama_options)
+
+    async def test_ollama_connection_async(self):
+        """Test if Ollama is running and model is available"""
+        try:
+            model_names = await self._async_ollama().list_models(timeout=5)
+
+            if self.model not in model_names:
+                print(f"Warning: Model {self.model} not found. Available: {', '.join(model_names[:3])}")
+                print(f"Run: ollama pull {self.model}")
+        except Exception as e:
+            print(f"Warning: Ollama connection test failed: {e}")
+            print("Make sure Ollama is running: ollama serve")
+
+    async def respond_async(self, message: str, context: List[Dict] = None, use_cache: bool = True) -> str:
+        """
+        Generate a personality-driven response to a message, like respond().
+
+        Args:
+            message (str): The incoming message to respond to
+            context (List[Dict], optional): Recent conversation context for memory
+            use_cache (bool): Whether the response cache may answer this turn
+
+        Returns:
+            str: The response, or an apology if the turn failed or timed out
+        """
+        try:
+            return await asyncio.wait_for(self._respond_async(message, context, use_cache), self.turn_timeout)
+        except asyncio.TimeoutError:
+            error_msg = "Sorry, I'm having trouble responding right now: Ollama is taking too long to respond"
+            print(f"Error in respond_async(): turn timed out after {self.turn_timeout}s")
+            return error_msg
+        except Exception as e:
+            error_msg = f"Sorry, I'm having trouble responding right now: {str(e)}"
+            print(f"Error in respond_async(): {e}")
+            return error_msg
+
+    async def _respond_async(self, message: str, context: List[Dict], use_cache: bool) -> str:
+        async with self._turn_lock:
+            if context is None:
+                context = self.get_recent_history(5)
+
+            # Memory lookups and writes hit SQLite: keep them off the event loop
+            prompt = await asyncio.to_thread(self._build_prompt, message, context)
+            response = await self._call_ollama_async(prompt, use_cache)
+            processed_response = self._post_process_response(response)
+
+            await asyncio.to_thread(self._add_turn_to_history, message, processed_response)
+            return processed_response
+
+    async def respond_stream_async(self, message: str, context: List[Dict] = None,
+                                   use_cache: bool = True) -> AsyncIterator[str]:
+        """
+        Generate a response like respond_stream(), yielding it token by token.
+
+        The turn deadline covers the whole stream; when it passes, the stream
+        ends with an apology if nothing was emitted yet. A consumer that stops
+        iterating without closing the stream holds the clone until then.
+
+        Args:
+            message (str): The incoming message to respond to
+            context (List[Dict], optional): Recent conversation context for memory
+            use_cache (bool): Whether the response cache may answer this turn
+
+        Yields:
+            str: Response text fragments, in order
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.turn_timeout
+
+        def remaining() -> float:
+            return max(deadline - loop.time(), 0)
+
+        streamed = ""
+        holding = False
+
+        def release_turn():
+            nonlocal holding
+            if holding:
+                holding = False
+                self._turn_lock.release()
+
+        try:
+            await asyncio.wait_for(self._turn_lock.acquire(), remaining())
+            holding = True
+            try:
+                if context is None:
+                    context = self.get_recent_history(5)
+
+                prompt = await asyncio.wait_for(asyncio.to_thread(self._build_prompt, message, context), remaining())
+                limit = self._get_truncation_limit()
+                budget = self._get_response_length_constraint()
+
+                cache_key = self._get_response_cache_key(prompt, stream=True) if use_cache else None
+                cached = await asyncio.to_thread(self.response_cache.get, cache_key) if cache_key else None
+                if cached is not None:
+                    tokens = self._replay_tokens(cached)
+                else:
+                    tokens = self._stream_ollama_async(prompt)
+                try:
+                    while True:
+                        try:
+                            token = await asyncio.wait_for(tokens.__anext__(), remaining())
+                        except StopAsyncIteration:
+                            break
+                        piece, complete = self._clip_stream_token(streamed, token, limit, budget)
+                        if piece:
+                            streamed += piece
+                            # Suspended at a yield nothing else bounds the hold, and an
+                            # abandoned stream is only closed once garbage collected
+                            watchdog = loop.call_at(deadline, release_turn)
+                            yield piece
+                            watchdog.cancel()
+                            if not holding:
+                                raise asyncio.TimeoutError()
+                        if complete:
+                            break  # Closing the stream below stops the generation
+                finally:
+                    await tokens.aclose()
+
+                if cache_key and cached is None:
+                    await asyncio.to_thread(self.response_cache.put, cache_key, self.model, streamed)
+                await asyncio.to_thread(self._add_turn_to_history, message, self._post_process_response(streamed))
+            finally:
+                release_turn()
+
+        except asyncio.TimeoutError:
+            print(f"Error in respond_stream_async(): turn timed out after {self.turn_timeout}s")
+            if not streamed:
+                yield "Sorry, I'm having trouble responding right now: Ollama is taking too long to respond"
+        except Exception as e:
+            error_msg = f"Sorry, I'm having trouble responding right now: {str(e)}"
+            print(f"Error in respond_stream_async(): {e}")
+            if not streamed:
+                yield error_msg
+
+    def _add_turn_to_history(self, message: str, response: str):
+        self.add_to_conversation_history("User", message)
+        self.add_to_conversation_history(self.name, response)
+
+    async def _call_ollama_async(self, prompt: str, use_cache: bool = True) -> str:
+        """Async counterpart of _call_ollama"""
+        cache_key = self._get_response_cache_key(prompt) if use_cache else None
+        if cache_key:
+            cached = await asyncio.to_thread(self.response_cache.get, cache_key)
+            if cached is not None:
+                return cached
+
+        try:
+            response = await self._async_ollama().generate(self.model, prompt, self._get_generation_options())
+        except httpx.TimeoutException:
+            raise Exception("Request timed out - Ollama is taking too long to respond")
+        except httpx.ConnectError:
+            raise Exception("Cannot connect to Ollama - make sure it's running")
+        except Exception as e:
+            raise Exception(f"Error calling Ollama: {str(e)}")
+
+        if cache_key:
+            await asyncio.to_thread(self.response_cache.put, cache_key, self.model, response)
+        return response
+
+    @staticmethod
+    async def _replay_tokens(cached: str) -> AsyncIterator[str]:
+        """Word tokens of a cached streamed response"""
+        for match in CACHED_TOKEN.finditer(cached):
+            yield match.group()
+
+    async def _stream_ollama_async(self, prompt: str) -> AsyncIterator[str]:
+        """Async counterpart of _stream_ollama"""
+        tokens = self._async_ollama().generate_stream(self.model, prompt, self._get_generation_options())
+        try:
+            async for token in tokens:
+                yield token
+        except httpx.TimeoutException:
+            raise Exception("Request timed out - Ollama is taking too long to respond")
+        except httpx.ConnectError:
+            raise Exception("Cannot connect to Ollama - make sure it's running")
+        except Exception as e:
+            raise Exception(f"Error calling Ollama: {str(e)}")
+        finally:
+            await tokens.aclose()
@@ -5,13 +5,17 @@ Main class for creating and managing AI clones with personalities
 
 import requests
 import json
-from typing import Dict, List, Any, Optional
+import math
+import re
+from typing import Dict, List, Any, Iterator, Optional, Tuple, Union
 from datetime import datetime
 import os
 import sys
 
 # Handle imports for both package and direct execution
 try:
+    from .ollama_client import OllamaClient
+    from .response_cache import ResponseCache, get_response_cache, is_deterministic, response_cache_key
     from ..personality.templates import PersonalityTemplate
     from ..memory.memory_manager import MemoryManager
     from ..memory.sqlite_vec_memory import SqliteVecMemory
@@ -21,26 +25,58 @@ except ImportError:
     # Add parent directory to path for direct execution
     parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     sys.path.insert(0, parent_dir)
+    from ai_clone.ollama_client import OllamaClient
+    from ai_clone.response_cache import ResponseCache, get_response_cache, is_deterministic, response_cache_key
     from personality.templates import PersonalityTemplate
     from memory.memory_manager import MemoryManager
     from memory.sqlite_vec_memory import SqliteVecMemory
     from memory.enhanced_memory import EnhancedMemory
     from memory.simple_memory import SimpleMemory
 
+# Rough characters per token of English text, to turn a length budget into num_predict
+CHARS_PER_TOKEN = 4
+
+# Generation room past the length budget for the sentence that crosses it
+SENTENCE_OVERRUN_CHARS = 150
+
+# End of a sentence: terminal punctuation (and closing quotes/brackets) followed by whitespace
+SENTENCE_END = re.compile(r"[.!?]+[\"')\]]*(?=\s)")
+
+# Splits a cached streamed response back into word tokens for replay
+CACHED_TOKEN = re.compile(r"\s*\S+")
+
 class AIClone:
     """An AI clone with personality that can have conversations"""
     
     # Main AI clone class for personality-driven conversations
     
-    def __init__(self, personality_data: Dict[str, Any], ollama_host: str = "http://localhost:11434", memory_type: str = "sqlite_vec"):
+    def __init__(self, personality_data: Dict[str, Any], ollama_host: str = "http://localhost:11434", memory_type: str = "sqlite_vec",
+                 memory_options: Dict[str, Any] = None, ollama_options: Dict[str, Any] = None,
+                 generation_options: Dict[str, Any] = None, response_cache: Union[bool, ResponseCache] = False):
         self.personality_data = personality_data
         self.name = personality_data["basic_info"]["name"]
         self.ollama_host = ollama_host
         self.model = "llama3.2:3b"  # Default model
+        
+        # Clones on the same host share one pooled keep-alive session
+        # ollama_options are passed to OllamaClient, e.g. {"pool_size": 32, "retries": 5}
+        self.ollama_options = ollama_options or {}
+        self.ollama = OllamaClient(ollama_host, **self.ollama_options)
         self.conversation_history = []
         
+        # generation_options override the model options, e.g. {"seed": 42} or {"temperature": 0}
+        self.generation_options = generation_options or {}
+        
+        # Opt-in completion cache (True: the shared default cache); only used for
+        # deterministic generations, see response_cache.is_deterministic
+        if response_cache is True:
+            response_cache = get_response_cache()
+        self.response_cache = response_cache or None
+        
         # Initialize memory system
+        # memory_options are passed to SqliteVecMemory, e.g. {"embedding_backend": "ollama"}
         self.memory_type = memory_type
+        self.memory_options = memory_options or {}
         self.memory = self._initialize_memory()
         
         # Create system prompt from personality
@@ -59,7 +95,7 @@ class AIClone:
             # Direct memory type selection - prioritize SQLite vector memory
             if self.memory_type == "sqlite_vec" or self.memory_type == "vector":
                 try:
-                    return SqliteVecMemory(self.name)
+                    return SqliteVecMemory(self.name, **self.memory_options)
                 except Exception as e:
                     print(f"⚠️ SQLite vector memory failed: {e}, falling back to enhanced")
                     return EnhancedMemory(self.name)
@@ -70,7 +106,7 @@ class AIClone:
             else:
                 print(f"Warning: Unknown memory type '{self.memory_type}', using SQLite vector memory")
                 try:
-                    return SqliteVecMemory(self.name)
+                    return SqliteVecMemory(self.name, **self.memory_options)
                 except Exception as e:
                     print(f"⚠️ SQLite vector memory failed: {e}, falling back to enhanced")
                     return EnhancedMemory(self.name)
@@ -81,12 +117,7 @@ class AIClone:
     def _test_ollama_connection(self):
         """Test if Ollama is running and model is available"""
         try:
-            response = requests.get(f"{self.ollama_host}/api/tags")
-            if response.status_code != 200:
-                raise ConnectionError("Ollama server not responding")
-            
-            models = response.json().get("models", [])
-            model_names = [model["name"] for model in models]
+            model_names = self.ollama.list_models(timeout=5)
             
             if self.model not in model_names:
                 print(f"Warning: Model {self.model} not found. Available: {', '.join(model_names[:3])}")
@@ -95,7 +126,7 @@ class AIClone:
             print(f"Warning: Ollama connection test failed: {e}")
             print("Make sure Ollama is running: ollama serve")
     
-    def respond(self, message: str, context: List[Dict] = None) -> str:
+    def respond(self, message: str, context: List[Dict] = None, use_cache: bool = True) -> str:
         """
         Generate a personality-driven response to a message.
         
@@ -109,6 +140,7 @@ class AIClone:
         Args:
             message (str): The incoming message to respond to
             context (List[Dict], optional): Recent conversation context for memory
+            use_cache (bool): Whether the response cache may answer this turn
             
         Returns:
             str: A personality-appropriate response that matches the clone's traits
@@ -122,7 +154,7 @@ class AIClone:
             prompt = self._build_prompt(message, context)
             
             # Get response from Ollama
-            response = self._call_ollama(prompt)
+            response = self._call_ollama(prompt, use_cache)
             
             # Post-process the response
             processed_response = self._post_process_response(response)
@@ -138,6 +170,101 @@ class AIClone:
             print(f"Error in respond(): {e}")
             return error_msg
     
+    def respond_stream(self, message: str, context: List[Dict] = None, use_cache: bool = True) -> Iterator[str]:
+        """
+        Generate a response like respond(), yielding it token by token.
+        
+        The reply is shown as soon as the model starts producing it instead of
+        after the whole completion. Post-processing runs as the text arrives:
+        leading whitespace is dropped, generation stops at the end of the
+        sentence that crosses the personality's length budget and, for
+        personalities with a hard limit, as soon as the next token would
+        exceed it. The post-processed reply is added to the conversation
+        history once the stream ends.
+        
+        Args:
+            message (str): The incoming message to respond to
+            context (List[Dict], optional): Recent conversation context for memory
+            use_cache (bool): Whether the response cache may answer this turn
+            
+        Yields:
+            str: Response text fragments, in order
+            
+        Returns:
+            str: The post-processed reply as added to the history (the value of
+            the generator's StopIteration), or the displayed text if the turn failed
+        """
+        streamed = ""
+        try:
+            if context is None:
+                context = self.get_recent_history(5)
+            
+            prompt = self._build_prompt(message, context)
+            limit = self._get_truncation_limit()
+            budget = self._get_response_length_constraint()
+            
+            # A cached stream is replayed word by word through the same cut-off
+            cache_key = self._get_response_cache_key(prompt, stream=True) if use_cache else None
+            cached = self.response_cache.get(cache_key) if cache_key else None
+            if cached is not None:
+                tokens = (match.group() for match in CACHED_TOKEN.finditer(cached))
+            else:
+                tokens = self._stream_ollama(prompt)
+            try:
+                for token in tokens:
+                    piece, complete = self._clip_stream_token(streamed, token, limit, budget)
+                    if piece:
+                        streamed += piece
+                        yield piece
+                    if complete:
+                        break  # Closing the stream below stops the generation
+            finally:
+                tokens.close()
+            
+            if cache_key and cached is None:
+                self.response_cache.put(cache_key, self.model, streamed)
+            
+            processed_response = self._post_process_response(streamed)
+            self.add_to_conversation_history("User", message)
+            self.add_to_conversation_history(self.name, processed_response)
+            return processed_response
+            
+        except Exception as e:
+            error_msg = f"Sorry, I'm having trouble responding right now: {str(e)}"
+            print(f"Error in respond_stream(): {e}")
+            if not streamed:
+                yield error_msg
+            return streamed or error_msg
+    
+    def _clip_stream_token(self, streamed: str, token: str, limit: Optional[int], budget: int) -> Tuple[str, bool]:
+        """
+        Apply post-processing to the next token of a streamed response.
+        
+        Leading whitespace of the response is dropped, the response ends with
+        the sentence that crosses the length budget, and a token that would
+        pass the hard truncation limit is not emitted.
+        
+        Args:
+            streamed (str): Response text emitted so far
+            token (str): Next token from the model
+            limit (Optional[int]): Hard length limit, see _get_truncation_limit
+            budget (int): Length budget, see _get_response_length_constraint
+            
+        Returns:
+            Tuple[str, bool]: Text to emit, and whether the response is complete
+        """
+        if not streamed:
+            token = token.lstrip()
+        if limit and len(streamed) + len(token) > limit:
+            return "", True
+        
+        # Stop once the sentence that crosses the budget has ended
+        text = streamed + token
+        sentence_end = SENTENCE_END.search(text, max(budget - 1, 0))
+        if sentence_end:
+            return text[len(streamed):sentence_end.end()], True
+        return token, False
+    
     def _build_prompt(self, message: str, context: List[Dict]) -> str:
         """
         Build the complete prompt for Ollama including personality and context.
@@ -260,7 +387,7 @@ class AIClone:
             print(f"Warning: Error getting response instruction: {e}")
             return "Keep your response natural and appropriate to the conversation."
     
-    def _call_ollama(self, prompt: str) -> str:
+    def _call_ollama(self, prompt: str, use_cache: bool = True) -> str:
         """
         Call the Ollama API to generate a response using the configured model.
         
@@ -270,6 +397,7 @@ class AIClone:
         
         Args:
             prompt (str): The complete prompt to send to the LLM
+            use_cache (bool): Whether to answer from (and store into) the response cache
             
         Returns:
             str: The raw response from the LLM
@@ -277,30 +405,15 @@ class AIClone:
         Raises:
             Exception: If the API call fails or returns an error
         """
+        cache_key = self._get_response_cache_key(prompt) if use_cache else None
+        if cache_key:
+            cached = self.response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         try:
-            payload = {
-                "model": self.model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.7,
-                    "top_p": 0.9,
-                    "max_tokens": 300,  # Reasonable limit, model should follow instructions
-                    "repeat_penalty": 1.1,  # Prevent repetitive responses
-                    "top_k": 40  # Better response diversity
-                }
-            }
-            
-            response = requests.post(
-                f"{self.ollama_host}/api/generate",
-                json=payload,
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json().get("response", "")
-            else:
-                raise Exception(f"Ollama API error: {response.status_code}")
+            # Pooled session: the connection to Ollama is reused across turns and clones
+            response = self.ollama.generate(self.model, prompt, self._get_generation_options())
                 
         except requests.exceptions.Timeout:
             raise Exception("Request timed out - Ollama is taking too long to respond")
@@ -308,14 +421,81 @@ class AIClone:
             raise Exception("Cannot connect to Ollama - make sure it's running")
         except Exception as e:
             raise Exception(f"Error calling Ollama: {str(e)}")
+        
+        if cache_key:
+            self.response_cache.put(cache_key, self.model, response)
+        return response
+    
+    def _get_response_cache_key(self, prompt: str, stream: bool = False) -> Optional[str]:
+        """
+        Get the response cache key for a prompt.
+        
+        Args:
+            prompt (str): The complete prompt to send to the LLM
+            stream (bool): Whether the response is streamed (cached apart, as cut off)
+            
+        Returns:
+            Optional[str]: The key, or None when the cache is off or sampling is random
+        """
+        options = self._get_generation_options()
+        if self.response_cache is None or not is_deterministic(options):
+            return None
+        return response_cache_key(self.model, options, prompt, stream)
+    
+    def _stream_ollama(self, prompt: str) -> Iterator[str]:
+        """
+        Streaming counterpart of _call_ollama: yields tokens as Ollama produces them.
+        
+        Args:
+            prompt (str): The complete prompt to send to the LLM
+            
+        Yields:
+            str: Raw response fragments from the LLM
+            
+        Raises:
+            Exception: If the API call fails or returns an error
+        """
+        try:
+            yield from self.ollama.generate_stream(self.model, prompt, self._get_generation_options())
+        except requests.exceptions.Timeout:
+            raise Exception("Request timed out - Ollama is taking too long to respond")
+        except requests.exceptions.ConnectionError:
+            raise Exception("Cannot connect to Ollama - make sure it's running")
+        except Exception as e:
+            raise Exception(f"Error calling Ollama: {str(e)}")
+    
+    def _get_generation_options(self) -> Dict[str, Any]:
+        """
+        Get the model options sent with every generation request.
+        
+        The personality's length budget caps the generated tokens (num_predict),
+        leaving room to finish the sentence that crosses it, so the model does
+        not produce text that post-processing would throw away. Stop sequences
+        end the reply where the model starts writing the next turn.
+        generation_options given to the constructor override these defaults.
+        
+        Returns:
+            Dict[str, Any]: Ollama model options
+        """
+        budget = self._get_response_length_constraint()
+        return {
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "num_predict": math.ceil((budget + SENTENCE_OVERRUN_CHARS) / CHARS_PER_TOKEN),
+            "stop": ["\nUser:", f"\n{self.name}:"],
+            "repeat_penalty": 1.1,  # Prevent repetitive responses
+            "top_k": 40,  # Better response diversity
+            **self.generation_options
+        }
     
     def _get_response_length_constraint(self) -> int:
         """
         Get the maximum response length constraint based on personality preferences.
         
         This method reads the clone's communication style preferences to determine
-        how long responses should be. It's used as a fallback when the LLM doesn't
-        follow the prompt instructions.
+        how long responses should be. It sets the generation budget: num_predict
+        is derived from it and streamed responses stop at the end of the
+        sentence that crosses it.
         
         Returns:
             int: Maximum character length for responses
@@ -337,6 +517,25 @@ class AIClone:
         except:
             return 150
     
+    def _get_truncation_limit(self) -> Optional[int]:
+        """
+        Get the length past which post-processing shortens a response.
+        
+        Only the short response styles are enforced; longer styles rely on the
+        prompt instructions alone.
+        
+        Returns:
+            Optional[int]: Maximum character length, or None for no limit
+        """
+        comm_style = self.personality_data.get("communication_style", {})
+        response_length = comm_style.get("response_length", {}).get("choice", "")
+        
+        if "Very short" in response_length:
+            return 150
+        elif "Short and concise" in response_length:
+            return 250
+        return None
+    
     def _post_process_response(self, response: str) -> str:
         """
         Post-process the AI response to ensure it matches personality preferences.
@@ -359,15 +558,12 @@ class AIClone:
             
             # Only apply length constraints if the model didn't follow instructions
             # and the response is significantly longer than expected
-            comm_style = self.personality_data.get("communication_style", {})
-            response_length = comm_style.get("response_length", {}).get("choice", "")
+            limit = self._get_truncation_limit()
             age = int(self.personality_data["basic_info"].get("age", 25))
             
             # Only truncate if response is way too long (model didn't follow instructions)
-            if "Very short" in response_length and len(response) > 150:
-                response = self._intelligently_shorten_response(response, 150, age)
-            elif "Short and concise" in response_length and len(response) > 250:
-                response = self._intelligently_shorten_response(response, 250, age)
+            if limit and len(response) > limit:
+                response = self._intelligently_shorten_response(response, limit, age)
             
             # Remove any trailing incomplete sentences (but only if we have multiple sentences)
             if response and not response.endswith(('.', '!', '?', '...')):
@@ -580,7 +776,7 @@ def load_clone_from_file(personality_file: str) -> AIClone:
         print(f"Error loading clone from {personality_file}: {e}")
         return None
 
-def create_demo_clones(memory_type: str = "sqlite_vec") -> List[AIClone]:
+def create_demo_clones(memory_type: str = "sqlite_vec", **clone_options) -> List[AIClone]:
     """
     Create demo AI clones for testing and demonstration purposes.
     
@@ -589,6 +785,8 @@ def create_demo_clones(memory_type: str = "sqlite_vec") -> List[AIClone]:
     
     Args:
         memory_type (str): Type of memory system to use (default: "sqlite_vec")
+        **clone_options: Further AIClone arguments, e.g. response_cache=True with
+            generation_options={"seed": 42} to replay demo runs from the cache
         
     Returns:
         List[AIClone]: List of demo clone instances
@@ -600,7 +798,7 @@ def create_demo_clones(memory_type: str = "sqlite_vec") -> List[AIClone]:
     if demo_personalities:
         clones = []
         for personality in demo_personalities:
-            clone = AIClone(personality, memory_type=memory_type)
+            clone = AIClone(personality, memory_type=memory_type, **clone_options)
             clones.append(clone)
         return clones
     else:
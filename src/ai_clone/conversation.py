@@ -7,7 +7,7 @@ import time
 import random
 import sys
 import os
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Union
 from rich.console import Console
 from rich.panel import Panel
 from rich.live import Live
@@ -161,8 +161,7 @@ class CloneConversation:
         conversation_history = []
         
         # First message
-        response = current_speaker.respond(initial_prompt)
-        self._display_message(current_speaker.name, response)
+        response = self._display_message(current_speaker.name, current_speaker.respond_stream(initial_prompt))
         
         # Add to conversation history
         self.conversation_manager.add_message_to_conversation(conv_id, current_speaker.name, response)
@@ -178,12 +177,9 @@ class CloneConversation:
             # Get recent history for context
             recent_history = conversation_history[-3:] if len(conversation_history) >= 3 else conversation_history
             
-            # Generate response
+            # Generate and display the response as it streams in
             context_prompt = self._build_context_prompt(recent_history, conversation_history[0]["content"] if conversation_history else "")
-            response = current_speaker.respond(context_prompt)
-            
-            # Display response
-            self._display_message(current_speaker.name, response)
+            response = self._display_message(current_speaker.name, current_speaker.respond_stream(context_prompt))
             
             # Add to conversation
             self.conversation_manager.add_message_to_conversation(conv_id, current_speaker.name, response)
@@ -205,16 +201,21 @@ class CloneConversation:
         
         return conversation_history
     
-    def _display_message(self, speaker: str, message: str):
+    def _display_message(self, speaker: str, message: Union[str, Iterable[str]]) -> str:
         """
         Display a message with appropriate styling based on the speaker.
         
         This method formats and displays messages with color coding to distinguish
-        between different speakers in the conversation.
+        between different speakers in the conversation. A message given as an
+        iterable of chunks (see AIClone.respond_stream) is printed as it arrives.
         
         Args:
             speaker (str): The name of the person speaking
-            message (str): The message content to display
+            message (Union[str, Iterable[str]]): The message content, or its chunks
+            
+        Returns:
+            str: The displayed message, or the final text a stream returns
+            (the post-processed reply the clone keeps in its history)
         """
         if speaker == self.clone1.name:
             color = "blue"
@@ -224,7 +225,23 @@ class CloneConversation:
             color = "white"
         
         console.print(f"\n[bold {color}]{speaker}:[/bold {color}]")
-        console.print(f"[{color}]{message}[/{color}]")
+        if isinstance(message, str):
+            console.print(f"[{color}]{message}[/{color}]")
+            return message
+        
+        chunks = []
+        final = None
+        stream = iter(message)
+        while True:
+            try:
+                chunk = next(stream)
+            except StopIteration as end:
+                final = end.value
+                break
+            chunks.append(chunk)
+            console.print(chunk, style=color, end="", markup=False, highlight=False)
+        console.print()
+        return final if final is not None else "".join(chunks)
     
     def _build_context_prompt(self, recent_history: List[Dict], initial_context: str) -> str:
         """
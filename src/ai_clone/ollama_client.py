@@ -0,0 +1,321 @@
+"""
+Ollama Client
+HTTP access to the Ollama API through one pooled, keep-alive session per host,
+shared by every clone talking to that host
+AsyncOllamaClient does the same for asyncio code on top of httpx, which is
+only needed by async clones
+"""
+
+import asyncio
+import json
+import threading
+import weakref
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Connections kept open per host; a server hosting many clones needs at
+# least as many as it runs concurrent turns
+DEFAULT_POOL_SIZE = 16
+
+# Retries of failed connections and of "busy" responses, with exponential backoff
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF_FACTOR = 0.25
+RETRY_STATUSES = (429, 502, 503, 504)
+
+# Health checks fail fast instead of retrying: a stopped daemon should not slow down clone creation
+PROBE_PATHS = ("/api/tags", "/api/version")
+
+
+class OllamaError(Exception):
+    """The Ollama API answered with an error status"""
+
+
+_sessions: Dict[Tuple[str, int, int, float], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+# httpx clients are bound to the event loop that uses them: one set per loop
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, int], Any]]" = \
+    weakref.WeakKeyDictionary()
+
+
+def _base_url(host: str) -> str:
+    parts = urlsplit(host if "://" in host else f"http://{host}")
+    return f"{parts.scheme}://{parts.netloc}"
+
+
+def create_session(host: str, pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                   backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> requests.Session:
+    """
+    A session whose connections to host are pooled and kept alive
+
+    Args:
+        host: Base URL of the Ollama server
+        pool_size: Maximum connections kept open to the host
+        retries: Retries of refused connections and of 429/5xx answers (not of read timeouts)
+        backoff_factor: Exponential backoff between retries, in seconds
+
+    Returns:
+        requests.Session: The configured session
+    """
+    base_url = _base_url(host)
+    retry = Retry(total=retries, connect=retries, read=0, status=retries,
+                  backoff_factor=backoff_factor, status_forcelist=RETRY_STATUSES,
+                  allowed_methods=frozenset({"GET", "POST"}), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+    probe_adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+    probe_adapter.poolmanager = adapter.poolmanager  # Probes reuse the same kept-alive connections
+    session = requests.Session()
+    session.mount(f"{base_url}/", adapter)
+    for path in PROBE_PATHS:
+        session.mount(f"{base_url}{path}", probe_adapter)
+    return session
+
+
+def get_session(host: str, pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                backoff_factor: float = DEFAULT_BACKOFF_FACTOR) -> requests.Session:
+    """Process-wide session for a host, created on first use and shared by every client"""
+    key = (_base_url(host), pool_size, retries, backoff_factor)
+    with _sessions_lock:
+        if key not in _sessions:
+            _sessions[key] = create_session(*key)
+        return _sessions[key]
+
+
+def close_sessions():
+    """Close every shared session and its pooled connections"""
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+
+class OllamaClient:
+    """Calls to one Ollama server over the shared session of its host"""
+
+    def __init__(self, host: str = "http://localhost:11434", timeout: float = 30,
+                 pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR):
+        """
+        Initialize the client
+
+        Args:
+            host: Base URL of the Ollama server
+            timeout: Seconds to wait for a response
+            pool_size: Connections kept open to the host (see create_session)
+            retries: Retries of failed connections and busy answers
+            backoff_factor: Exponential backoff between retries, in seconds
+        """
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.session = get_session(self.host, pool_size, retries, backoff_factor)
+
+    def list_models(self, timeout: Optional[float] = None) -> List[str]:
+        """Names of the models available on the server"""
+        response = self.session.get(f"{self.host}/api/tags", timeout=timeout or self.timeout)
+        if response.status_code != 200:
+            raise OllamaError("Ollama server not responding")
+        return [model["name"] for model in response.json().get("models", [])]
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Complete a prompt with /api/generate
+
+        Args:
+            model: Model name
+            prompt: Full prompt
+            options: Model options (temperature, top_p, num_predict, ...)
+
+        Returns:
+            str: The generated text
+
+        Raises:
+            OllamaError: If the server answers with an error status
+            requests.exceptions.RequestException: If the server cannot be reached in time
+        """
+        response = self.session.post(f"{self.host}/api/generate", json={
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": options or {}
+        }, timeout=self.timeout)
+        if response.status_code != 200:
+            raise OllamaError(f"Ollama API error: {response.status_code}")
+        return response.json().get("response", "")
+
+    def generate_stream(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> Iterator[str]:
+        """
+        Complete a prompt with /api/generate, yielding text as the model produces it
+
+        The server answers with one JSON object per line (NDJSON); the timeout
+        applies between chunks rather than to the whole completion. Closing the
+        generator early closes the response, which stops the generation.
+
+        Args:
+            model: Model name
+            prompt: Full prompt
+            options: Model options (temperature, top_p, num_predict, ...)
+
+        Yields:
+            str: Text fragments (usually one token each)
+
+        Raises:
+            OllamaError: If the server answers with an error status or reports an error mid-stream
+            requests.exceptions.RequestException: If the server cannot be reached in time
+        """
+        response = self.session.post(f"{self.host}/api/generate", json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {}
+        }, timeout=self.timeout, stream=True)
+        with response:
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama API error: {response.status_code}")
+            # Read to the end of the body (past the "done" line) so the connection goes back to the pool
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(f"Ollama API error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+
+
+def get_async_http_client(host: str, pool_size: int = DEFAULT_POOL_SIZE) -> "httpx.AsyncClient":
+    """
+    httpx client for a host, shared by every async client on the running event loop
+
+    Requests beyond pool_size wait for a free connection instead of failing,
+    so many concurrent turns queue up on the pool; callers bound each turn
+    with their own timeout.
+
+    Raises:
+        ImportError: If httpx is not installed
+        RuntimeError: If called outside a running event loop
+    """
+    if httpx is None:
+        raise ImportError("Async clones require httpx: pip install httpx")
+    loop = asyncio.get_running_loop()
+    key = (_base_url(host), pool_size)
+    with _sessions_lock:
+        clients = _async_clients.setdefault(loop, {})
+        if key not in clients:
+            clients[key] = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+                timeout=httpx.Timeout(30, pool=None))
+        return clients[key]
+
+
+async def close_async_http_clients():
+    """Close the httpx clients of the running event loop and their pooled connections"""
+    with _sessions_lock:
+        clients = list(_async_clients.pop(asyncio.get_running_loop(), {}).values())
+    for client in clients:
+        await client.aclose()
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient, with the same retry policy: refused
+    connections and 429/5xx answers are retried with exponential backoff,
+    read timeouts and health checks are not
+    """
+
+    def __init__(self, host: str = "http://localhost:11434", timeout: float = 30,
+                 pool_size: int = DEFAULT_POOL_SIZE, retries: int = DEFAULT_RETRIES,
+                 backoff_factor: float = DEFAULT_BACKOFF_FACTOR):
+        """
+        Initialize the client (inside a running event loop)
+
+        Args:
+            host: Base URL of the Ollama server
+            timeout: Seconds to wait for a connection or for each read
+            pool_size: Connections kept open to the host (see get_async_http_client)
+            retries: Retries of failed connections and busy answers
+            backoff_factor: Exponential backoff between retries, in seconds
+        """
+        self.host = host.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.client = get_async_http_client(self.host, pool_size)
+
+    async def _send(self, method: str, path: str, retries: int, timeout: float, **kwargs) -> "httpx.Response":
+        """Send a request and return the response with its body unread (close it when done)"""
+        request = self.client.build_request(method, f"{self.host}{path}", timeout=httpx.Timeout(timeout, pool=None),
+                                            **kwargs)
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(self.backoff_factor * 2 ** (attempt - 1))
+            try:
+                response = await self.client.send(request, stream=True)
+            except httpx.ConnectError:
+                if attempt == retries:
+                    raise
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < retries:
+                await response.aclose()
+                continue
+            return response
+
+    async def list_models(self, timeout: Optional[float] = None) -> List[str]:
+        """Names of the models available on the server (not retried)"""
+        response = await self._send("GET", "/api/tags", 0, timeout or self.timeout)
+        try:
+            if response.status_code != 200:
+                raise OllamaError("Ollama server not responding")
+            return [model["name"] for model in json.loads(await response.aread()).get("models", [])]
+        finally:
+            await response.aclose()
+
+    async def generate(self, model: str, prompt: str, options: Optional[Dict[str, Any]] = None) -> str:
+        """Complete a prompt with /api/generate (see OllamaClient.generate)"""
+        response = await self._send("POST", "/api/generate", self.retries, self.timeout, json={
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "options": options or {}
+        })
+        try:
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama API error: {response.status_code}")
+            return json.loads(await response.aread()).get("response", "")
+        finally:
+            await response.aclose()
+
+    async def generate_stream(self, model: str, prompt: str,
+                              options: Optional[Dict[str, Any]] = None) -> AsyncIterator[str]:
+        """
+        Complete a prompt with /api/generate, yielding text as the model
+        produces it (see OllamaClient.generate_stream). Closing or cancelling
+        the generator closes the response, which stops the generation.
+        """
+        response = await self._send("POST", "/api/generate", self.retries, self.timeout, json={
+            "model": model,
+            "prompt": prompt,
+            "stream": True,
+            "options": options or {}
+        })
+        try:
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama API error: {response.status_code}")
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise OllamaError(f"Ollama API error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield chunk["response"]
+        finally:
+            await response.aclose()
@@ -0,0 +1,90 @@
+"""
+Response Cache
+Persistent cache of Ollama completions for deterministic prompts, shared by
+every clone in the process
+Entries are keyed by a hash of (model, options, full prompt) and stored in
+SQLite with a time-to-live and least recently used eviction
+"""
+
+import hashlib
+import json
+import os
+import sys
+from typing import Any, Dict, Optional
+
+# Handle imports for both package and direct execution
+try:
+    from ..memory.sqlite_cache import CacheRegistry, SqliteCacheStore
+except ImportError:
+    parent_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, parent_dir)
+    from memory.sqlite_cache import CacheRegistry, SqliteCacheStore
+
+DEFAULT_CACHE_FILE = "data/response_cache/responses.db"
+
+# Entries older than this are treated as missing (one week)
+DEFAULT_TTL = 7 * 24 * 3600
+
+# Temperature Ollama samples with when the options do not set one
+OLLAMA_DEFAULT_TEMPERATURE = 0.8
+
+
+def is_deterministic(options: Dict[str, Any]) -> bool:
+    """
+    Whether a generation with these options can be replayed from the cache:
+    greedy decoding (temperature 0) or sampling with a fixed seed
+    """
+    return options.get("seed") is not None or options.get("temperature", OLLAMA_DEFAULT_TEMPERATURE) == 0
+
+
+def response_cache_key(model: str, options: Dict[str, Any], prompt: str, stream: bool = False) -> str:
+    """
+    Cache key of a generation
+
+    Streamed responses are keyed apart because they are stored as cut off
+    by the client, not as the model's full completion.
+    """
+    payload = json.dumps([model, options, prompt, stream], sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResponseCache(SqliteCacheStore):
+    """
+    Completion cache stored in a SQLite file.
+    Expired entries read as missing and are removed with the next write or
+    when the cache is over capacity; beyond that the least recently used
+    entries are evicted.
+    """
+
+    TABLE = "response_cache"
+    KEY_COLUMN = "key"
+    VALUE_COLUMNS = (("model", "TEXT"), ("response", "TEXT"))
+
+    def __init__(self, db_file: str = DEFAULT_CACHE_FILE, ttl: Optional[float] = DEFAULT_TTL,
+                 max_entries: int = 50000):
+        """
+        Initialize the response cache
+
+        Args:
+            db_file: Path of the cache database
+            ttl: Seconds an entry stays valid (None: no expiry)
+            max_entries: Maximum number of cached responses before LRU eviction
+        """
+        super().__init__(db_file, max_entries, ttl)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached response for a key, or None if it is missing or expired"""
+        found = self._lookup((), [key])
+        return found[key][1] if key in found else None
+
+    def put(self, key: str, model: str, response: str):
+        """Store a response and evict expired, then least recently used, entries if over capacity"""
+        self._store((), {key: (model, response)})
+
+
+_response_caches = CacheRegistry(ResponseCache)
+
+
+def get_response_cache(db_file: str = DEFAULT_CACHE_FILE, **options) -> ResponseCache:
+    """Get the process-wide response cache for a cache file, creating it on first use"""
+    return _response_caches.get(db_file, **options)
@@ -217,8 +217,11 @@ class AICloneCLI:
                     if user_input.lower() in ['quit', 'bye', 'exit']:
                         break
                     
-                    response = clone.respond(user_input)
-                    console.print(f"{clone.name}: {response}")
+                    # Print tokens as they arrive instead of waiting for the whole reply
+                    console.print(f"{clone.name}: ", end="")
+                    for token in clone.respond_stream(user_input):
+                        console.print(token, end="", markup=False, highlight=False)
+                    console.print()
             else:
                 console.print("[red]Invalid selection[/red]")
         except ValueError:
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Approximate Nearest Neighbor Index
+An IVF-flat index built on NumPy that sits beside the vec0 table once a clone
+is too large for brute-force KNN scans
+Vectors are clustered around k-means centroids; a search only scans the
+lists of the nprobe centroids nearest to the query
+The index is saved as a snapshot (.ivf.npz) plus an append-only log
+(.ivf.log) of the vectors added since, so saving a growing index only
+writes what is new
+"""
+
+import json
+import math
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Training samples per list; k-means on more points barely moves the centroids
+TRAIN_SAMPLES_PER_LIST = 64
+KMEANS_ITERATIONS = 10
+
+# Rows per block when assigning vectors to centroids (bounds temporary memory)
+ASSIGN_BLOCK_ROWS = 16384
+
+
+LOG_SUFFIX = ".log"
+
+
+def index_files(path: str) -> Tuple[str, str]:
+    """Snapshot and append log files of an index saved at path (x.ivf.npz -> x.ivf.log)"""
+    return path, f"{os.path.splitext(path)[0]}{LOG_SUFFIX}"
+
+
+def remove_index_files(path: str) -> bool:
+    """Delete a saved index and its log; True if anything was removed"""
+    removed = False
+    for file in index_files(path):
+        if os.path.exists(file):
+            os.remove(file)
+            removed = True
+    return removed
+
+
+def default_nlist(num_vectors: int) -> int:
+    """Number of inverted lists for a collection of this size (about sqrt(n))"""
+    return max(1, int(math.sqrt(num_vectors)))
+
+
+def default_nprobe(nlist: int) -> int:
+    """Lists scanned per search: a tenth of them, at least 8"""
+    return min(nlist, max(8, nlist // 10))
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every vector"""
+    centroid_norms = np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), ASSIGN_BLOCK_ROWS):
+        block = vectors[start:start + ASSIGN_BLOCK_ROWS]
+        # ||x - c||^2 without the ||x||^2 term, which is the same for every centroid
+        distances = centroid_norms - 2.0 * block @ centroids.T
+        assignments[start:start + len(block)] = np.argmin(distances, axis=1)
+    return assignments
+
+
+def train_centroids(vectors: np.ndarray, nlist: int, iterations: int = KMEANS_ITERATIONS,
+                    seed: int = 0) -> np.ndarray:
+    """
+    k-means centroids of a sample of vectors
+
+    Args:
+        vectors: Training vectors (n, dim)
+        nlist: Number of centroids
+        iterations: Lloyd iterations
+        seed: Seed for sampling and initialization
+
+    Returns:
+        np.ndarray: Centroids (nlist, dim) as float32
+    """
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(vectors))
+    sample_size = min(len(vectors), nlist * TRAIN_SAMPLES_PER_LIST)
+    sample = vectors[np.sort(rng.choice(len(vectors), sample_size, replace=False))].astype(np.float32)
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assignments = _nearest_centroids(sample, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Empty lists restart from random sample points
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted file index with exact (flat) vectors in every list.
+    Distances are L2, the same as vec0 reports, so similarity scores match
+    the vec0 search. Lists grow in place as vectors are added; the centroids
+    stay fixed until the index is retrained.
+    Vectors added after the last save() are appended to the log by
+    save_appended(); ids are added in increasing order, as messages are written.
+    """
+
+    def __init__(self, centroids: np.ndarray, nprobe: Optional[int] = None):
+        """
+        Initialize an empty index
+
+        Args:
+            centroids: Trained centroids (nlist, dim), see train_centroids
+            nprobe: Lists scanned per search (default: default_nprobe(nlist))
+        """
+        self.centroids = np.ascontiguousarray(centroids, dtype=np.float32)
+        self.nprobe = nprobe or default_nprobe(self.nlist)
+        self.trained_size = 0
+        self.logged_vectors = 0  # Vectors in the append log, replayed on load
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._unsaved: List[Tuple[np.ndarray, np.ndarray]] = []
+        self._record_dtype = np.dtype([("id", "<i8"), ("vector", "<f4", (self.dim,))])
+        self._sizes = np.zeros(self.nlist, dtype=np.int64)
+        self._ids: List[np.ndarray] = [np.empty(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._vectors: List[np.ndarray] = [np.empty((0, self.dim), dtype=np.float32) for _ in range(self.nlist)]
+        self._norms: List[np.ndarray] = [np.empty(0, dtype=np.float32) for _ in range(self.nlist)]
+
+    @classmethod
+    def build(cls, ids: np.ndarray, vectors: np.ndarray, nlist: Optional[int] = None,
+              nprobe: Optional[int] = None) -> "IVFIndex":
+        """Train centroids on vectors and index all of them"""
+        index = cls(train_centroids(vectors, nlist or default_nlist(len(vectors))), nprobe)
+        index.trained_size = len(vectors)
+        index.add(ids, vectors)
+        return index
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        return self.centroids.shape[1]
+
+    def __len__(self) -> int:
+        return int(self._sizes.sum())
+
+    @property
+    def max_id(self) -> int:
+        """Largest indexed id (0 when empty)"""
+        return max((int(ids[:size].max()) for ids, size in zip(self._ids, self._sizes) if size), default=0)
+
+    def add(self, ids: np.ndarray, vectors: np.ndarray):
+        """
+        Add vectors to the lists of their nearest centroids
+
+        Args:
+            ids: Message ids (n,)
+            vectors: Embeddings (n, dim)
+        """
+        ids = np.asarray(ids, dtype=np.int64)
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(len(ids), self.dim)
+        if not len(ids):
+            return
+        assignments = _nearest_centroids(vectors, self.centroids)
+        order = np.argsort(assignments, kind="stable")
+        lists, starts = np.unique(assignments[order], return_index=True)
+        ends = np.append(starts[1:], len(order))
+
+        with self._lock:
+            for list_no, start, end in zip(lists, starts, ends):
+                rows = order[start:end]
+                size, needed = self._sizes[list_no], self._sizes[list_no] + len(rows)
+                if needed > len(self._ids[list_no]):
+                    # Grow by doubling so appending one batch at a time stays linear
+                    capacity = max(needed, 2 * len(self._ids[list_no]), 16)
+                    self._ids[list_no] = np.resize(self._ids[list_no], capacity)
+                    self._vectors[list_no] = np.resize(self._vectors[list_no], (capacity, self.dim))
+                    self._norms[list_no] = np.resize(self._norms[list_no], capacity)
+                self._ids[list_no][size:needed] = ids[rows]
+                self._vectors[list_no][size:needed] = vectors[rows]
+                self._norms[list_no][size:needed] = np.einsum("ij,ij->i", vectors[rows], vectors[rows])
+                self._sizes[list_no] = needed
+            self._unsaved.append((ids, vectors))
+
+    def search(self, query: np.ndarray, k: int, nprobe: Optional[int] = None,
+               before_id: Optional[int] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate k nearest neighbors
+
+        Args:
+            query: Query vector
+            k: Neighbors to return
+            nprobe: Lists to scan (default self.nprobe)
+            before_id: Only return ids below this one
+
+        Returns:
+            List[Tuple[int, float]]: (id, L2 distance) pairs, nearest first
+        """
+        if k <= 0:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+        centroid_distances = np.linalg.norm(self.centroids - query, axis=1)
+        probed = np.argpartition(centroid_distances, nprobe - 1)[:nprobe]
+
+        with self._lock:
+            candidate_ids, candidate_vectors, scores = [], [], []
+            for list_no in probed:
+                size = self._sizes[list_no]
+                if not size:
+                    continue
+                ids = self._ids[list_no][:size]
+                vectors = self._vectors[list_no][:size]
+                # ||v||^2 - 2 v.q ranks rows by distance to q
+                list_scores = self._norms[list_no][:size] - 2.0 * (vectors @ query)
+                if before_id is not None:
+                    keep = ids < before_id
+                    ids, vectors, list_scores = ids[keep], vectors[keep], list_scores[keep]
+                if len(ids) > k:
+                    best = np.argpartition(list_scores, k - 1)[:k]
+                    ids, vectors, list_scores = ids[best], vectors[best], list_scores[best]
+                candidate_ids.append(ids)
+                candidate_vectors.append(vectors)
+                scores.append(list_scores)
+
+        if not candidate_ids:
+            return []
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(scores)
+        best = np.argpartition(scores, k - 1)[:k] if len(ids) > k else np.arange(len(ids))
+        # Exact distances for the survivors (the expanded form loses precision near 0)
+        distances = np.linalg.norm(np.concatenate(candidate_vectors)[best] - query, axis=1)
+        order = np.argsort(distances, kind="stable")
+        return [(int(ids[best[i]]), float(distances[i])) for i in order]
+
+    @property
+    def unsaved_vectors(self) -> int:
+        """Vectors added since the index was last saved or appended to its log"""
+        return sum(len(ids) for ids, _ in self._unsaved)
+
+    def save(self, path: str, metadata: Optional[Dict[str, Any]] = None):
+        """Write a snapshot of the index (and caller metadata) to path, replacing it and its log"""
+        with self._file_lock:
+            with self._lock:
+                arrays = {
+                    "centroids": self.centroids,
+                    "sizes": self._sizes,
+                    "ids": np.concatenate([ids[:size] for ids, size in zip(self._ids, self._sizes)]),
+                    "vectors": np.concatenate([vectors[:size] for vectors, size in zip(self._vectors, self._sizes)]),
+                    "info": np.array(json.dumps({"nprobe": self.nprobe, "trained_size": self.trained_size,
+                                                 "metadata": metadata or {}}))
+                }
+                self._unsaved = []
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(temp_path, path)
+            # A log left behind by a crash here only holds ids the snapshot has; load() skips them
+            log_path = index_files(path)[1]
+            if os.path.exists(log_path):
+                os.remove(log_path)
+            self.logged_vectors = 0
+
+    def save_appended(self, path: str) -> int:
+        """
+        Append the vectors added since the last save to the log of the index
+        saved at path, leaving the snapshot untouched
+
+        Returns:
+            int: Vectors appended
+        """
+        with self._file_lock:
+            with self._lock:
+                pending, self._unsaved = self._unsaved, []
+            if not pending:
+                return 0
+            records = np.empty(sum(len(ids) for ids, _ in pending), dtype=self._record_dtype)
+            records["id"] = np.concatenate([ids for ids, _ in pending])
+            records["vector"] = np.concatenate([vectors for _, vectors in pending])
+            try:
+                with open(index_files(path)[1], "ab") as f:
+                    f.write(records.tobytes())
+            except Exception:
+                with self._lock:
+                    self._unsaved[:0] = pending
+                raise
+            self.logged_vectors += len(records)
+            return len(records)
+
+    @classmethod
+    def load(cls, path: str) -> Tuple["IVFIndex", Dict[str, Any]]:
+        """
+        Read an index written by save() and replay its append log
+
+        A torn record at the end of the log (an interrupted append) is cut off.
+
+        Returns:
+            Tuple[IVFIndex, Dict]: The index and the metadata saved with it
+        """
+        with np.load(path) as data:
+            info = json.loads(str(data["info"]))
+            index = cls(data["centroids"], info["nprobe"])
+            index.trained_size = info["trained_size"]
+            sizes, ids, vectors = data["sizes"].astype(np.int64), data["ids"], data["vectors"]
+        bounds = np.cumsum(sizes)[:-1]
+        index._sizes = sizes
+        index._ids = np.split(ids, bounds)
+        index._vectors = np.split(vectors, bounds)
+        index._norms = [np.einsum("ij,ij->i", v, v) for v in index._vectors]
+
+        log_path = index_files(path)[1]
+        if os.path.exists(log_path):
+            record_bytes = index._record_dtype.itemsize
+            complete = os.path.getsize(log_path) // record_bytes * record_bytes
+            if os.path.getsize(log_path) != complete:
+                os.truncate(log_path, complete)
+            records = np.fromfile(log_path, dtype=index._record_dtype)
+            index.logged_vectors = len(records)
+            records = records[records["id"] > index.max_id]
+            index.add(records["id"], records["vector"])
+        index._unsaved = []
+        return index, info["metadata"]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """List layout and footprint"""
+        return {
+            "vectors": len(self),
+            "lists": self.nlist,
+            "nprobe": self.nprobe,
+            "trained_size": self.trained_size,
+            "largest_list": int(self._sizes.max()),
+            "vector_bytes": int(len(self) * self.dim * 4)
+        }
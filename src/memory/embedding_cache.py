@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Embedding Caches
+Bounded in-process LRU cache for a single clone, plus a persistent,
+content-addressed cache shared by every clone on the host
+Shared embeddings are keyed by (backend, model, dimension, text hash) and stored in SQLite
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional
+
+import numpy as np
+
+try:
+    from .sqlite_cache import CacheRegistry, SqliteCacheStore
+except ImportError:
+    from src.memory.sqlite_cache import CacheRegistry, SqliteCacheStore
+
+DEFAULT_CACHE_FILE = "data/vector_memory/embedding_cache.db"
+
+
+def text_hash(text: str) -> str:
+    """Content address used as the cache key for a text"""
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class LRUEmbeddingCache:
+    """
+    In-process embedding cache bounded by entry count and total bytes.
+    Vectors are stored as float32 arrays; the least recently used entries
+    are evicted when either limit is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 8 * 1024 * 1024):
+        """
+        Initialize the LRU cache
+
+        Args:
+            max_entries: Maximum number of cached embeddings
+            max_bytes: Maximum total size of the cached vectors in bytes
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Lookups run from the flush timer and from worker threads concurrently
+        self.lock = threading.Lock()
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Return the cached vector and mark it as recently used"""
+        with self.lock:
+            vector = self.entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key: str, vector: np.ndarray):
+        """Cache a vector, evicting least recently used entries if over a limit"""
+        # Copy so a row of a batch matrix does not keep the whole matrix alive
+        vector = np.array(vector, dtype=np.float32, copy=True)
+        if vector.nbytes > self.max_bytes:
+            return
+
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous.nbytes
+            self.entries[key] = vector
+            self.total_bytes += vector.nbytes
+
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self):
+        """Drop all cached vectors"""
+        with self.lock:
+            self.entries.clear()
+            self.total_bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and current size"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self.entries),
+                "bytes": self.total_bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes
+            }
+
+
+class SharedEmbeddingCache(SqliteCacheStore):
+    """
+    Embedding cache stored in a SQLite file and shared across clones.
+    Least recently used entries are evicted once max_entries is exceeded.
+    """
+
+    TABLE = "embedding_cache"
+    SCOPE_COLUMNS = (("backend", "TEXT"), ("model", "TEXT"), ("dim", "INTEGER"))
+    KEY_COLUMN = "text_hash"
+    VALUE_COLUMNS = (("vector", "BLOB"),)
+
+    def __init__(self, db_file: str = DEFAULT_CACHE_FILE, max_entries: int = 200000):
+        """
+        Initialize the shared embedding cache
+
+        Args:
+            db_file: Path of the cache database
+            max_entries: Maximum number of cached embeddings before LRU eviction
+        """
+        super().__init__(db_file, max_entries)
+
+    def get_many(self, backend: str, model: str, dim: int, hashes: List[str]) -> Dict[str, np.ndarray]:
+        """Look up cached embeddings, returning only the hashes that were found"""
+        found = self._lookup((backend, model, dim), hashes)
+        return {key: np.frombuffer(blob, dtype=np.float32) for key, (blob,) in found.items()}
+
+    def put_many(self, backend: str, model: str, dim: int, embeddings: Dict[str, np.ndarray]):
+        """Store embeddings and evict least recently used entries if over capacity"""
+        self._store((backend, model, dim), {
+            key: (np.ascontiguousarray(vector, dtype=np.float32).tobytes(),)
+            for key, vector in embeddings.items()
+        })
+
+
+_shared_caches = CacheRegistry(SharedEmbeddingCache)
+
+
+def get_shared_embedding_cache(db_file: str = DEFAULT_CACHE_FILE, **options) -> SharedEmbeddingCache:
+    """Get the process-wide embedding cache for a cache file, creating it on first use"""
+    return _shared_caches.get(db_file, **options)
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Embedding Backends
+Pluggable embedding generation for the vector memory system
+Every backend produces float32 NumPy arrays and supports batch encoding,
+so sqlite-vec can store vectors without list conversion or per-message calls
+"""
+
+import hashlib
+from typing import Dict, List, Optional, Type, Union
+
+import numpy as np
+import requests
+
+# Lookup table mapping every byte value to its scaled float in [-1, 1].
+# Computed in float64 and cast once so results match the original per-byte loop.
+_BYTE_TO_FLOAT = ((np.arange(256, dtype=np.float64) / 255.0) * 2.0 - 1.0).astype(np.float32)
+
+
+class EmbeddingBackend:
+    """
+    Base class for embedding backends.
+    Subclasses implement embed_many(); embed() is derived from it.
+    """
+
+    name = "base"
+    # Whether embeddings are expensive enough to be worth a shared on-disk cache
+    cacheable = True
+
+    def __init__(self, embedding_dim: int = 384, model: Optional[str] = None):
+        """
+        Initialize the embedding backend
+
+        Args:
+            embedding_dim: Dimension of the generated embeddings
+            model: Model identifier (backend specific)
+        """
+        self.embedding_dim = embedding_dim
+        self.model = model
+
+    def embed(self, text: str) -> np.ndarray:
+        """Embed a single text into a float32 vector"""
+        return self.embed_many([text])[0]
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), embedding_dim) float32 matrix"""
+        raise NotImplementedError
+
+    def _check_dimension(self, matrix: np.ndarray) -> np.ndarray:
+        """Make sure a backend returned vectors of the configured dimension"""
+        if matrix.ndim != 2 or matrix.shape[1] != self.embedding_dim:
+            raise ValueError(
+                f"{self.name} embeddings have dimension {matrix.shape[-1]}, "
+                f"expected {self.embedding_dim}"
+            )
+        return matrix
+
+
+class HashEmbeddingBackend(EmbeddingBackend):
+    """
+    Deterministic hash-based embeddings for testing and offline use.
+    Each text is hashed once with MD5 and the digest bytes are tiled across
+    the embedding dimension in a single vectorized step.
+    """
+
+    name = "hash"
+    cacheable = False  # Recomputing is cheaper than a cache lookup
+
+    def __init__(self, embedding_dim: int = 384, model: Optional[str] = None):
+        super().__init__(embedding_dim, model or "md5")
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), embedding_dim) float32 matrix"""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+
+        digests = b"".join(hashlib.md5(text.encode()).digest() for text in texts)
+        digest_bytes = np.frombuffer(digests, dtype=np.uint8).reshape(len(texts), -1)
+
+        # Repeat the digest until it covers the embedding dimension
+        repeats = -(-self.embedding_dim // digest_bytes.shape[1])
+        tiled = np.tile(digest_bytes, (1, repeats))[:, :self.embedding_dim]
+
+        return _BYTE_TO_FLOAT[tiled]
+
+
+class LocalModelEmbeddingBackend(EmbeddingBackend):
+    """
+    Local embedding model via sentence-transformers.
+    The model is loaded lazily on first use and encodes whole batches at once.
+    """
+
+    name = "local"
+
+    def __init__(self, embedding_dim: int = 384, model: Optional[str] = None,
+                 batch_size: int = 64, device: Optional[str] = None):
+        super().__init__(embedding_dim, model or "all-MiniLM-L6-v2")
+        self.batch_size = batch_size
+        self.device = device
+        self._model = None
+
+    def _load_model(self):
+        """Load the sentence-transformers model on first use"""
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError:
+                raise ImportError(
+                    "The 'local' embedding backend needs sentence-transformers: "
+                    "pip install sentence-transformers"
+                )
+            self._model = SentenceTransformer(self.model, device=self.device)
+        return self._model
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), embedding_dim) float32 matrix"""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+
+        vectors = self._load_model().encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return self._check_dimension(np.asarray(vectors, dtype=np.float32))
+
+
+class OllamaEmbeddingBackend(EmbeddingBackend):
+    """
+    Embeddings from an Ollama-compatible HTTP server.
+    Uses the batched /api/embed endpoint and falls back to one
+    /api/embeddings request per text for older servers.
+    """
+
+    name = "ollama"
+
+    def __init__(self, embedding_dim: int = 384, model: Optional[str] = None,
+                 host: str = "http://localhost:11434", batch_size: int = 64,
+                 timeout: float = 30):
+        super().__init__(embedding_dim, model or "all-minilm")
+        self.host = host.rstrip("/")
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.supports_batch = True
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        """Embed a batch of texts into a (len(texts), embedding_dim) float32 matrix"""
+        if not texts:
+            return np.empty((0, self.embedding_dim), dtype=np.float32)
+
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            chunk = texts[start:start + self.batch_size]
+            if self.supports_batch:
+                try:
+                    vectors.extend(self._embed_batch(chunk))
+                    continue
+                except NotImplementedError:
+                    self.supports_batch = False
+            vectors.extend(self._embed_single(text) for text in chunk)
+
+        return self._check_dimension(np.asarray(vectors, dtype=np.float32))
+
+    def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        """Embed a chunk of texts with a single /api/embed request"""
+        response = self.session.post(
+            f"{self.host}/api/embed",
+            json={"model": self.model, "input": texts},
+            timeout=self.timeout
+        )
+        if response.status_code == 404:
+            raise NotImplementedError("Server does not support /api/embed")
+        response.raise_for_status()
+        return response.json()["embeddings"]
+
+    def _embed_single(self, text: str) -> List[float]:
+        """Embed one text with the legacy /api/embeddings endpoint"""
+        response = self.session.post(
+            f"{self.host}/api/embeddings",
+            json={"model": self.model, "prompt": text},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()["embedding"]
+
+
+# Registry of available embedding backends, keyed by name
+EMBEDDING_BACKENDS: Dict[str, Type[EmbeddingBackend]] = {
+    HashEmbeddingBackend.name: HashEmbeddingBackend,
+    LocalModelEmbeddingBackend.name: LocalModelEmbeddingBackend,
+    OllamaEmbeddingBackend.name: OllamaEmbeddingBackend,
+}
+
+
+def register_embedding_backend(name: str, backend_class: Type[EmbeddingBackend]):
+    """Register a custom embedding backend under a name"""
+    EMBEDDING_BACKENDS[name] = backend_class
+
+
+def create_embedding_backend(backend: Union[str, EmbeddingBackend] = "hash",
+                             embedding_dim: int = 384, **options) -> EmbeddingBackend:
+    """
+    Create an embedding backend by name
+
+    Args:
+        backend: Registered backend name, or an already constructed backend
+        embedding_dim: Dimension of the generated embeddings
+        **options: Backend specific options (model, host, batch_size, ...)
+
+    Returns:
+        EmbeddingBackend: The backend instance
+
+    Raises:
+        ValueError: If the backend name is not registered
+    """
+    if isinstance(backend, EmbeddingBackend):
+        return backend
+
+    if backend not in EMBEDDING_BACKENDS:
+        raise ValueError(
+            f"Unknown embedding backend: {backend} "
+            f"(available: {', '.join(sorted(EMBEDDING_BACKENDS))})"
+        )
+    return EMBEDDING_BACKENDS[backend](embedding_dim=embedding_dim, **options)
+
+
+def serialize_embedding(embedding: np.ndarray) -> bytes:
+    """Serialize an embedding to the float32 BLOB format used by vec0"""
+    return np.ascontiguousarray(embedding, dtype=np.float32).tobytes()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Hot Memory Tier
+Keeps the most recent messages of a clone, with their embeddings, in process
+memory so that most context lookups never touch the database
+Older messages are only reached through the cold tier (the on-disk indexes)
+"""
+
+import threading
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+class HotTier:
+    """
+    Ring buffer of the newest messages and a matrix of their embeddings.
+    Searches are a brute-force L2 scan, the same distance vec0 reports, so
+    similarity scores are comparable between the tiers.
+    """
+
+    def __init__(self, capacity: int, embedding_dim: int):
+        """
+        Initialize the tier
+
+        Args:
+            capacity: Number of most recent messages kept
+            embedding_dim: Dimension of the stored embeddings
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.embedding_dim = embedding_dim
+        self._lock = threading.Lock()
+        self._reset()
+
+    def clear(self):
+        """Drop every message held by the tier"""
+        with self._lock:
+            self._reset()
+
+    def _reset(self):
+        self._vectors = np.zeros((self.capacity, self.embedding_dim), dtype=np.float32)
+        self._ids = np.zeros(self.capacity, dtype=np.int64)  # 0 marks an empty slot
+        self._epochs = np.zeros(self.capacity, dtype=np.float64)
+        self._speakers = np.empty(self.capacity, dtype=object)
+        self._conversations = np.empty(self.capacity, dtype=object)
+        self._messages: List[Optional[Dict[str, Any]]] = [None] * self.capacity
+        self._next = 0
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self._ids))
+
+    @property
+    def oldest_id(self) -> Optional[int]:
+        """Smallest message id in the tier (older messages are only in the cold tier)"""
+        ids = self._ids[self._ids > 0]
+        return int(ids.min()) if len(ids) else None
+
+    def add(self, rows: Sequence[Dict[str, Any]]):
+        """
+        Add messages in id order, evicting the oldest ones
+
+        Args:
+            rows: Dicts with id, speaker, content, timestamp, epoch,
+                conversation_id and embedding (messages without one are skipped)
+        """
+        with self._lock:
+            for row in rows:
+                embedding = row.get("embedding")
+                if embedding is None or len(embedding) != self.embedding_dim:
+                    continue
+                slot = self._next
+                self._vectors[slot] = embedding
+                self._ids[slot] = row["id"]
+                self._epochs[slot] = row.get("epoch") or 0.0
+                self._speakers[slot] = row["speaker"]
+                self._conversations[slot] = row.get("conversation_id") or ""
+                self._messages[slot] = {
+                    "speaker": row["speaker"],
+                    "content": row["content"],
+                    "timestamp": row["timestamp"]
+                }
+                self._next = (slot + 1) % self.capacity
+
+    def search(self, query_embedding: np.ndarray, limit: int,
+               filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """
+        Nearest messages in the tier
+
+        Args:
+            query_embedding: Query vector
+            limit: Number of messages to return
+            filters: speaker, conversation_id, since/until (Unix time) and before_id,
+                with the same meaning as the cold tier search filters
+
+        Returns:
+            List[Dict]: Messages ordered by similarity, best first
+        """
+        filters = filters or {}
+        with self._lock:
+            mask = self._ids > 0
+            speaker = filters.get("speaker")
+            if speaker is not None:
+                speakers = [speaker] if isinstance(speaker, str) else list(speaker)
+                mask &= np.isin(self._speakers, speakers)
+            if filters.get("conversation_id") is not None:
+                mask &= self._conversations == filters["conversation_id"]
+            if filters.get("since") is not None:
+                mask &= self._epochs >= filters["since"]
+            if filters.get("until") is not None:
+                mask &= self._epochs < filters["until"]
+            if filters.get("before_id") is not None:
+                mask &= self._ids < filters["before_id"]
+
+            slots = np.flatnonzero(mask)
+            if len(slots) == 0 or limit <= 0:
+                return []
+            distances = np.linalg.norm(self._vectors[slots] - query_embedding, axis=1)
+            if len(slots) > limit:
+                nearest = np.argpartition(distances, limit)[:limit]
+            else:
+                nearest = np.arange(len(slots))
+            nearest = nearest[np.argsort(distances[nearest], kind="stable")]
+
+            return [
+                {
+                    **self._messages[slots[i]],
+                    "similarity_score": 1.0 - float(distances[i]),
+                    "source": "hot_tier"
+                }
+                for i in nearest
+            ]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Tier size and footprint"""
+        return {
+            "capacity": self.capacity,
+            "messages": len(self),
+            "oldest_id": self.oldest_id,
+            "vector_bytes": self._vectors.nbytes
+        }
@@ -255,6 +255,24 @@ class MemoryManager:
             return self.memory.search_messages(query, limit)
         return []
     
+    def search_many(self, queries: List[str], limit: int = 10) -> List[List[Dict]]:
+        """
+        Search messages for several queries at once.
+        
+        Memory systems with a batched search embed and search all queries
+        together; others are searched one query at a time.
+        
+        Args:
+            queries (List[str]): Search queries
+            limit (int): Maximum number of results per query
+            
+        Returns:
+            List[List[Dict]]: Matching messages for each query, in query order
+        """
+        if self.memory and hasattr(self.memory, 'search_many'):
+            return self.memory.search_many(queries, limit)
+        return [self.search_messages(query, limit) for query in queries]
+    
     def get_memory_stats(self) -> Dict[str, Any]:
         """
         Get statistics from the current memory system.
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+"""
+Schema Migrations
+Versioned, resumable migrations for the vector memory databases
+The schema version lives in PRAGMA user_version; long backfills run in
+chunked transactions so a clone's database is never locked for long
+"""
+
+import sqlite3
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+# Rows touched per transaction by backfills. With WAL, readers are never
+# blocked and writers only wait for one chunk.
+DEFAULT_CHUNK_SIZE = 5000
+
+# Seconds since the Unix epoch of a stored (naive local time) ISO timestamp
+EPOCH_FROM_TIMESTAMP = "(julianday(timestamp, 'utc') - 2440587.5) * 86400.0"
+
+
+class Migration:
+    """
+    A single schema migration.
+    Transactional migrations run in one transaction together with the version
+    bump. Non-transactional ones commit their own chunks and must be safe to
+    re-run, since an interrupted run is resumed from the start on next open.
+    """
+
+    def __init__(self, version: int, description: str,
+                 apply: Callable[[sqlite3.Connection, int], None],
+                 transactional: bool = True):
+        """
+        Initialize the migration
+
+        Args:
+            version: Schema version the database is at after this migration
+            description: Short human readable summary
+            apply: Callable taking (connection, chunk_size)
+            transactional: Run apply and the version bump in a single transaction
+        """
+        self.version = version
+        self.description = description
+        self.apply = apply
+        self.transactional = transactional
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """Schema version stored in the database header"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def table_exists(conn: sqlite3.Connection, name: str) -> bool:
+    """Whether a table (or virtual table) exists"""
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone() is not None
+
+
+def column_names(conn: sqlite3.Connection, table: str) -> List[str]:
+    """Column names of a table"""
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def get_meta(conn: sqlite3.Connection, key: str, default: Optional[str] = None) -> Optional[str]:
+    """Read a value from the schema_meta table"""
+    if not table_exists(conn, "schema_meta"):
+        return default
+    row = conn.execute("SELECT value FROM schema_meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(conn: sqlite3.Connection, key: str, value: Any):
+    """Write a value to the schema_meta table (in the caller's transaction)"""
+    conn.execute(
+        "INSERT OR REPLACE INTO schema_meta (key, value) VALUES (?, ?)", (key, str(value))
+    )
+
+
+def delete_meta(conn: sqlite3.Connection, *keys: str):
+    """Remove values from the schema_meta table (in the caller's transaction)"""
+    conn.executemany("DELETE FROM schema_meta WHERE key = ?", [(key,) for key in keys])
+
+
+def run_chunked_update(conn: sqlite3.Connection, sql: str, params: Sequence = (),
+                       chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Repeat an UPDATE/DELETE until it touches no rows, one transaction per chunk
+
+    The statement must limit itself to chunk_size rows through a final
+    "LIMIT ?" placeholder and must stop matching rows it already handled,
+    e.g. "UPDATE t SET c = ... WHERE id IN (SELECT id FROM t WHERE c IS NULL LIMIT ?)".
+
+    Returns:
+        int: Total rows changed
+    """
+    total = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            changed = conn.execute(sql, (*params, chunk_size)).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        total += changed
+        if changed < chunk_size:
+            return total
+
+
+def write_in_chunks(conn: sqlite3.Connection, rows: Iterable[Tuple], sql: str,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                    on_chunk: Optional[Callable[[List[Tuple]], None]] = None) -> int:
+    """
+    executemany() a stream of rows, committing every chunk_size rows
+
+    Args:
+        conn: The SQLite connection
+        rows: Row tuples, typically a lazily evaluated cursor
+        sql: Parameterized statement executed for every row
+        chunk_size: Rows per transaction
+        on_chunk: Called inside each transaction with the chunk, e.g. to record progress
+
+    Returns:
+        int: Rows written
+    """
+    total = 0
+    chunk = []
+
+    def write(chunk_rows):
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(sql, chunk_rows)
+            if on_chunk:
+                on_chunk(chunk_rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            write(chunk)
+            total += len(chunk)
+            chunk = []
+    if chunk:
+        write(chunk)
+        total += len(chunk)
+    return total
+
+
+def check_messages_layout(conn: sqlite3.Connection):
+    """
+    Refuse a messages table the migrations cannot upgrade, before any of them
+    runs, so the file is left untouched at its current version
+
+    Raises:
+        RuntimeError: If messages lacks a column every layout had, or has no
+            rowid to number its messages by
+    """
+    if not table_exists(conn, "messages"):
+        return
+    columns = column_names(conn, "messages")
+    missing = [name for name in ("id", "speaker", "content", "timestamp") if name not in columns]
+    if missing:
+        raise RuntimeError(f"Cannot migrate messages table without column(s): {', '.join(missing)}")
+    try:
+        conn.execute("SELECT rowid FROM messages LIMIT 1").fetchall()
+    except sqlite3.OperationalError:
+        raise RuntimeError("Cannot migrate a WITHOUT ROWID messages table")
+
+
+def rebuild_legacy_messages(conn: sqlite3.Connection) -> bool:
+    """
+    Rebuild a messages table in the layout of the first releases (TEXT UUID
+    ids, many of them NULL, and vectors stored only in message_vectors) with
+    integer ids and an embedding column, in one transaction
+
+    Rows keep their insertion order: the old rowid becomes the new id. Other
+    columns are kept as they are. Vectors are copied onto their messages when
+    message_vectors is readable; the rest stay NULL until the clone embeds
+    them on open. Missing epochs are filled in. The layout, not the schema
+    version, is checked, so files left half-migrated by earlier releases are
+    repaired as well.
+
+    Returns:
+        bool: Whether the table was rebuilt
+    """
+    if not table_exists(conn, "messages"):
+        return False
+    columns = conn.execute("PRAGMA table_info(messages)").fetchall()
+    names = [column[1] for column in columns]
+    integer_ids = any(name == "id" and primary_key == 1 and column_type.upper() == "INTEGER"
+                      for _, name, column_type, _, _, primary_key in columns)
+    if integer_ids and "embedding" in names:
+        return False
+
+    kept = [column for column in columns if column[1] not in ("id", "embedding")]
+    definitions = "".join(f",\n                {name} {column_type}{' NOT NULL' if not_null else ''}"
+                          for _, name, column_type, not_null, _, _ in kept)
+    copied = [column[1] for column in kept]
+    selected = [f"COALESCE(epoch, {EPOCH_FROM_TIMESTAMP})" if name == "epoch" else name for name in copied]
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(f'''
+            CREATE TABLE messages_rebuilt (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                embedding BLOB{definitions}
+            )
+        ''')
+        conn.execute(f"""
+            INSERT INTO messages_rebuilt (id, {', '.join(copied)})
+            SELECT rowid, {', '.join(selected)} FROM messages ORDER BY rowid
+        """)
+
+        if table_exists(conn, "message_vectors") and "embedding" not in names:
+            try:
+                vectors = conn.execute("SELECT message_id, embedding FROM message_vectors").fetchall()
+            except sqlite3.OperationalError as e:
+                # vec0 is not loaded; the index is rebuilt once the messages are embedded
+                print(f"Info: Legacy vectors unreadable, messages will be re-embedded: {e}")
+                vectors = []
+            conn.executemany(
+                "UPDATE messages_rebuilt SET embedding = ? WHERE id = (SELECT rowid FROM messages WHERE id = ?)",
+                ((blob, message_id) for message_id, blob in vectors)
+            )
+
+        # Indexes and FTS triggers go with the old table; an FTS index left by an
+        # interrupted migration is recreated when that migration is re-run
+        conn.execute("DROP TABLE messages")
+        conn.execute("DROP TABLE IF EXISTS messages_fts")
+        conn.execute("ALTER TABLE messages_rebuilt RENAME TO messages")
+        if "epoch" in copied:
+            conn.execute("CREATE INDEX idx_messages_epoch ON messages (epoch)")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return True
+
+
+def _create_schema_meta(conn: sqlite3.Connection, chunk_size: int):
+    """Key/value table for facts about the stored data (embedding signature, index layout)"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+
+def _add_message_epoch(conn: sqlite3.Connection, chunk_size: int):
+    """Indexed epoch column for time range queries, backfilled from the ISO timestamps"""
+    if "epoch" not in column_names(conn, "messages"):
+        conn.execute("ALTER TABLE messages ADD COLUMN epoch REAL")
+        conn.commit()
+
+    # Stored timestamps are naive local time, the same convention add_messages uses
+    run_chunked_update(conn, f"""
+        UPDATE messages
+        SET epoch = {EPOCH_FROM_TIMESTAMP}
+        WHERE id IN (SELECT id FROM messages WHERE epoch IS NULL LIMIT ?)
+    """, chunk_size=chunk_size)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_epoch ON messages (epoch)")
+    conn.commit()
+
+
+def _drop_embeddings_table(conn: sqlite3.Connection, chunk_size: int):
+    """The embeddings table was created by every version but never written to"""
+    conn.execute("DROP TABLE IF EXISTS embeddings")
+
+
+def _backfill_message_embeddings(conn: sqlite3.Connection, chunk_size: int):
+    """
+    Copy vectors from message_vectors into messages.embedding, making the
+    messages table the source of truth and vec0 a rebuildable index
+    """
+    if not table_exists(conn, "message_vectors"):
+        return
+    try:
+        vectors = conn.execute("SELECT message_id, embedding FROM message_vectors")
+    except sqlite3.OperationalError as e:
+        # vec0 is not loaded; rows stay NULL and are re-embedded on demand
+        print(f"Info: Skipping embedding backfill, vector index unreadable: {e}")
+        return
+
+    write_in_chunks(
+        conn,
+        ((blob, message_id) for message_id, blob in vectors),
+        "UPDATE messages SET embedding = ? WHERE id = ? AND embedding IS NULL",
+        chunk_size
+    )
+
+
+def _create_message_fts(conn: sqlite3.Connection, chunk_size: int):
+    """
+    FTS5 index over message content, kept in sync with messages by triggers.
+    Restarts from scratch if an earlier run was interrupted.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute("DROP TABLE IF EXISTS messages_fts")
+        conn.execute('''
+            CREATE VIRTUAL TABLE messages_fts USING fts5(
+                content,
+                content='messages',
+                content_rowid='id',
+                tokenize='porter unicode61'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        conn.execute("ROLLBACK")
+        # SQLite built without FTS5; text search keeps using LIKE
+        print(f"Info: Full-text index not available: {e}")
+        return
+
+    triggers = {
+        "messages_fts_insert": """
+            AFTER INSERT ON messages BEGIN
+                INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+            END""",
+        "messages_fts_delete": """
+            AFTER DELETE ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+            END""",
+        "messages_fts_update": """
+            AFTER UPDATE OF content ON messages BEGIN
+                INSERT INTO messages_fts (messages_fts, rowid, content) VALUES ('delete', old.id, old.content);
+                INSERT INTO messages_fts (rowid, content) VALUES (new.id, new.content);
+            END""",
+    }
+    for name, body in triggers.items():
+        conn.execute(f"DROP TRIGGER IF EXISTS {name}")
+        conn.execute(f"CREATE TRIGGER {name} {body}")
+
+    # Rows written after this commit are indexed by the triggers; index the rest in chunks
+    high_water = conn.execute("SELECT COALESCE(MAX(id), 0) FROM messages").fetchone()[0]
+    conn.execute("COMMIT")
+
+    write_in_chunks(
+        conn,
+        conn.execute("SELECT id, content FROM messages WHERE id <= ? ORDER BY id", (high_water,)),
+        "INSERT INTO messages_fts (rowid, content) VALUES (?, ?)",
+        chunk_size
+    )
+
+
+def _add_message_conversation_id(conn: sqlite3.Connection, chunk_size: int):
+    """Conversation a message belongs to, used to filter searches"""
+    if "conversation_id" not in column_names(conn, "messages"):
+        conn.execute("ALTER TABLE messages ADD COLUMN conversation_id TEXT")
+
+
+def _add_message_clone_id(conn: sqlite3.Connection, chunk_size: int):
+    """Owning clone of a message in shared multi-clone stores (NULL in per-clone files)"""
+    if "clone_id" not in column_names(conn, "messages"):
+        conn.execute("ALTER TABLE messages ADD COLUMN clone_id TEXT")
+
+
+# Every migration, in order. Append new migrations; never renumber released ones.
+MIGRATIONS: List[Migration] = [
+    Migration(1, "create schema_meta", _create_schema_meta),
+    Migration(2, "add indexed messages.epoch", _add_message_epoch, transactional=False),
+    Migration(3, "drop unused embeddings table", _drop_embeddings_table),
+    Migration(4, "store embeddings on messages", _backfill_message_embeddings, transactional=False),
+    Migration(5, "full-text index on message content", _create_message_fts, transactional=False),
+    Migration(6, "add messages.conversation_id", _add_message_conversation_id),
+    Migration(7, "add messages.clone_id", _add_message_clone_id),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version
+
+
+def migrate(conn: sqlite3.Connection, migrations: List[Migration] = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[int]:
+    """
+    Apply all migrations newer than the database's schema version
+
+    Args:
+        conn: The SQLite connection (must not be inside a transaction)
+        migrations: Migrations to consider (defaults to MIGRATIONS)
+        chunk_size: Rows per transaction for chunked backfills
+
+    Returns:
+        List[int]: Versions that were applied
+
+    Raises:
+        RuntimeError: If the database was written by a newer version or its
+            messages table has a layout that cannot be migrated
+    """
+    migrations = MIGRATIONS if migrations is None else migrations
+    current = get_schema_version(conn)
+    latest = migrations[-1].version if migrations else 0
+    if current > latest:
+        raise RuntimeError(
+            f"Database schema version {current} is newer than this code supports ({latest})"
+        )
+
+    # Legacy layouts are rebuilt first: every migration after this reads integer ids
+    check_messages_layout(conn)
+    rebuild_legacy_messages(conn)
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+
+        if migration.transactional:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                migration.apply(conn, chunk_size)
+                conn.execute(f"PRAGMA user_version = {migration.version}")
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        else:
+            migration.apply(conn, chunk_size)
+            conn.execute(f"PRAGMA user_version = {migration.version}")
+            conn.commit()
+
+        applied.append(migration.version)
+        current = migration.version
+    return applied
+
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Shared Vector Store
+Lets many clones keep their memory in one SQLite database (or a small, fixed
+number of shard files) instead of one file per clone
+Clones are mapped to shards by a stable hash of their name, and every clone
+on a shard uses the same pooled connection
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Tuple
+
+DEFAULT_SHARED_STORE_DIR = "data/vector_memory/shared"
+
+
+def shard_for_clone(clone_name: str, num_shards: int = 1) -> int:
+    """Shard index for a clone, stable across processes and Python versions"""
+    if num_shards < 1:
+        raise ValueError("num_shards must be at least 1")
+    digest = hashlib.sha256(clone_name.encode()).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_path(clone_name: str, store_dir: str = DEFAULT_SHARED_STORE_DIR, num_shards: int = 1) -> str:
+    """Database file holding a clone's messages in a shared store"""
+    return os.path.join(store_dir, f"shard_{shard_for_clone(clone_name, num_shards):03d}.db")
+
+
+class PooledConnection:
+    """
+    A connection shared by every clone on one store file.
+    Writers serialize on lock so transactions of different clones never interleave;
+    state holds facts about the connection that every user needs (e.g. whether
+    sqlite-vec loaded).
+    """
+
+    def __init__(self, db_file: str, conn: sqlite3.Connection, state: Dict[str, Any]):
+        self.db_file = db_file
+        self.conn = conn
+        self.state = state
+        self.lock = threading.RLock()
+        self.users = 0
+
+
+class ConnectionPool:
+    """Reference counted, one-connection-per-file pool for shared stores"""
+
+    def __init__(self):
+        self._connections: Dict[str, PooledConnection] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def acquire(self, db_file: str,
+                opener: Callable[[], Tuple[sqlite3.Connection, Dict[str, Any]]]) -> PooledConnection:
+        """
+        Get the pooled connection for a file, opening it on first use
+
+        Args:
+            db_file: Store database file
+            opener: Opens and initializes a connection, returning (connection, state)
+
+        Returns:
+            PooledConnection: The shared connection (release it when done)
+        """
+        key = os.path.abspath(db_file)
+        with self._lock:
+            pooled = self._connections.get(key)
+            if pooled is None:
+                conn, state = opener()
+                pooled = PooledConnection(db_file, conn, state)
+                self._connections[key] = pooled
+                self.opened += 1
+            pooled.users += 1
+            return pooled
+
+    def release(self, pooled: PooledConnection,
+                closer: Callable[[sqlite3.Connection], None] = None) -> bool:
+        """
+        Give back a connection; the last user closes it
+
+        Returns:
+            bool: True if the connection was closed
+        """
+        with self._lock:
+            pooled.users -= 1
+            if pooled.users > 0:
+                return False
+            self._connections.pop(os.path.abspath(pooled.db_file), None)
+
+        with pooled.lock:
+            if closer:
+                closer(pooled.conn)
+            pooled.conn.close()
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Open connections and how many clones use each"""
+        with self._lock:
+            return {
+                "open_connections": len(self._connections),
+                "connections_opened": self.opened,
+                "users": {pooled.db_file: pooled.users for pooled in self._connections.values()}
+            }
+
+
+# Process-wide pool used by SqliteVecMemory in shared-store mode
+_pool = ConnectionPool()
+
+
+def get_connection_pool() -> ConnectionPool:
+    """The process-wide shared-store connection pool"""
+    return _pool
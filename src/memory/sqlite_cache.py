@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+SQLite Cache Store
+Bounded cache table in a SQLite file that several processes can share
+Entries expire after an optional time-to-live and the least recently used are
+evicted past max_entries; recency updates are written in batches
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+class SqliteCacheStore:
+    """
+    Base class of the on-disk caches.
+
+    Subclasses describe their table: SCOPE_COLUMNS (e.g. backend and model)
+    and KEY_COLUMN address an entry, VALUE_COLUMNS hold its payload. Every
+    table also gets created and last_used times for expiry and eviction.
+    """
+
+    TABLE = ""
+    SCOPE_COLUMNS: Tuple[Tuple[str, str], ...] = ()
+    KEY_COLUMN = "key"
+    VALUE_COLUMNS: Tuple[Tuple[str, str], ...] = ()
+
+    # SQLite limits the number of bound parameters per statement
+    LOOKUP_CHUNK = 500
+
+    # Pending recency updates are written once this many accumulate, or after this many seconds
+    TOUCH_BATCH = 256
+    TOUCH_INTERVAL = 60.0
+
+    def __init__(self, db_file: str, max_entries: int, ttl: Optional[float] = None):
+        """
+        Open (and create if needed) the cache table
+
+        Args:
+            db_file: Path of the cache database
+            max_entries: Maximum number of entries before LRU eviction
+            ttl: Seconds an entry stays valid (None: no expiry)
+        """
+        self.db_file = db_file
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+        self._touched: Dict[tuple, float] = {}
+        self._expired: set = set()
+        self._touches_written = time.time()
+
+        scope = [name for name, _ in self.SCOPE_COLUMNS]
+        self._address = scope + [self.KEY_COLUMN]
+        self._values = [name for name, _ in self.VALUE_COLUMNS]
+        self._match = " AND ".join(f"{name} = ?" for name in self._address)
+
+        os.makedirs(os.path.dirname(db_file) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(db_file, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_table()
+        self._entry_count = self.conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+
+    def _create_table(self):
+        columns = [*self.SCOPE_COLUMNS, (self.KEY_COLUMN, "TEXT"), *self.VALUE_COLUMNS,
+                   ("created", "REAL"), ("last_used", "REAL")]
+        existing = [row[1] for row in self.conn.execute(f"PRAGMA table_info({self.TABLE})")]
+        if existing and existing != [name for name, _ in columns]:
+            # Cached entries are disposable: a table from an older layout starts over
+            self.conn.execute(f"DROP TABLE {self.TABLE}")
+
+        definitions = ", ".join(f"{name} {sql_type} NOT NULL" for name, sql_type in columns)
+        self.conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {self.TABLE} (
+                {definitions},
+                PRIMARY KEY ({", ".join(self._address)})
+            ) WITHOUT ROWID
+        ''')
+        self.conn.execute(f'''
+            CREATE INDEX IF NOT EXISTS idx_{self.TABLE}_last_used
+            ON {self.TABLE} (last_used)
+        ''')
+        self.conn.commit()
+
+    @property
+    def closed(self) -> bool:
+        return self.conn is None
+
+    def _expired_at(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _lookup(self, scope: tuple, keys: List[str]) -> Dict[str, tuple]:
+        """Look up entries of a scope, returning the values of the keys that were found"""
+        found = {}
+        if not keys:
+            return found
+
+        scope_match = "".join(f"{name} = ? AND " for name, _ in self.SCOPE_COLUMNS)
+        selected = ", ".join([self.KEY_COLUMN, "created", *self._values])
+        with self.lock:
+            now = time.time()
+            for start in range(0, len(keys), self.LOOKUP_CHUNK):
+                chunk = keys[start:start + self.LOOKUP_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self.conn.execute(f'''
+                    SELECT {selected} FROM {self.TABLE}
+                    WHERE {scope_match}{self.KEY_COLUMN} IN ({placeholders})
+                ''', [*scope, *chunk]).fetchall()
+                for key, created, *values in rows:
+                    address = (*scope, key)
+                    if self._expired_at(created, now):
+                        # Deleted with the next write instead of writing during a read
+                        if address not in self._expired:
+                            self._expired.add(address)
+                            self.expirations += 1
+                        continue
+                    found[key] = tuple(values)
+                    self._touched[address] = now
+
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+
+            # Recency is refreshed in batches: a write per lookup would make every
+            # reader of the shared file compete for its write lock
+            if len(self._touched) >= self.TOUCH_BATCH or now - self._touches_written >= self.TOUCH_INTERVAL:
+                self._write_pending()
+                self.conn.commit()
+
+        return found
+
+    def _store(self, scope: tuple, entries: Dict[str, tuple]):
+        """Store entries of a scope and evict expired, then least recently used, ones if over capacity"""
+        if not entries:
+            return
+
+        columns = ", ".join([*self._address, *self._values, "created", "last_used"])
+        placeholders = ",".join("?" * (len(self._address) + len(self._values) + 2))
+        assignments = ", ".join(f"{name} = ?" for name in [*self._values, "created", "last_used"])
+        with self.lock:
+            # Written first so eviction sees the latest recency
+            self._write_pending()
+            now = time.time()
+            for key, values in entries.items():
+                before = self.conn.total_changes
+                self.conn.execute(f'''
+                    INSERT OR IGNORE INTO {self.TABLE} ({columns}) VALUES ({placeholders})
+                ''', (*scope, key, *values, now, now))
+                if self.conn.total_changes == before:
+                    # Replacing an entry (e.g. an expired one another process still had) keeps the count
+                    self.conn.execute(f"UPDATE {self.TABLE} SET {assignments} WHERE {self._match}",
+                                      (*values, now, now, *scope, key))
+                else:
+                    self._entry_count += 1
+
+            if self._entry_count > self.max_entries:
+                self._evict(now)
+            self.conn.commit()
+
+    def _write_pending(self):
+        """Write the pending recency updates and deletions of expired entries (the caller commits)"""
+        if self._expired:
+            before = self.conn.total_changes
+            self.conn.executemany(f"DELETE FROM {self.TABLE} WHERE {self._match}", self._expired)
+            self._entry_count -= self.conn.total_changes - before
+            self._expired.clear()
+        if self._touched:
+            self.conn.executemany(f'''
+                UPDATE {self.TABLE} SET last_used = MAX(last_used, ?) WHERE {self._match}
+            ''', [(used, *address) for address, used in self._touched.items()])
+            self._touched.clear()
+        self._touches_written = time.time()
+
+    def _evict(self, now: float):
+        """Delete expired entries, then the least recently used ones down to max_entries"""
+        if self.ttl is not None:
+            self.expirations += self.conn.execute(
+                f"DELETE FROM {self.TABLE} WHERE created < ?", (now - self.ttl,)).rowcount
+
+        # Other processes share the file, so recount before deleting
+        self._entry_count = self.conn.execute(f"SELECT COUNT(*) FROM {self.TABLE}").fetchone()[0]
+        excess = self._entry_count - self.max_entries
+        if excess <= 0:
+            return
+
+        address = ", ".join(self._address)
+        self.conn.execute(f'''
+            DELETE FROM {self.TABLE}
+            WHERE ({address}) IN (SELECT {address} FROM {self.TABLE} ORDER BY last_used LIMIT ?)
+        ''', (excess,))
+        self.evictions += excess
+        self._entry_count -= excess
+
+    def clear(self):
+        """Delete every cached entry"""
+        with self.lock:
+            self.conn.execute(f"DELETE FROM {self.TABLE}")
+            self.conn.commit()
+            self._touched.clear()
+            self._expired.clear()
+            self._entry_count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and size of the cache"""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expirations": self.expirations,
+            "evictions": self.evictions,
+            "entries": self._entry_count,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "cache_file": self.db_file
+        }
+
+    def close(self):
+        """Write pending updates and close the cache database"""
+        with self.lock:
+            if self.conn:
+                self._write_pending()
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+
+class CacheRegistry:
+    """One cache instance per file, shared by all clones in this process"""
+
+    def __init__(self, factory: Callable[..., SqliteCacheStore]):
+        self.factory = factory
+        self.caches: Dict[str, SqliteCacheStore] = {}
+        self.lock = threading.Lock()
+
+    def get(self, db_file: str, **options) -> SqliteCacheStore:
+        """Get the cache for a file, creating it on first use or after it was closed"""
+        key = os.path.abspath(db_file)
+        with self.lock:
+            cache = self.caches.get(key)
+            if cache is None or cache.closed:
+                cache = self.factory(db_file, **options)
+                self.caches[key] = cache
+            return cache
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+SQLite Tuning
+Connection profiles and incremental maintenance for the vector memory databases
+A profile is a set of PRAGMAs applied when a database connection is opened;
+maintenance reclaims free pages a bounded step at a time instead of a full VACUUM
+"""
+
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional, Union
+
+# Named connection profiles. Values are PRAGMA settings; sizes follow SQLite
+# conventions (negative cache_size is KiB, mmap_size is bytes).
+CONNECTION_PROFILES: Dict[str, Dict[str, Any]] = {
+    # SQLite defaults: rollback journal, synchronous=FULL
+    "legacy": {},
+    # WAL lets readers run during writes; NORMAL only fsyncs at checkpoints
+    "balanced": {
+        "page_size": 4096,
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -16384,        # 16 MiB page cache
+        "mmap_size": 64 * 1024 * 1024,
+    },
+    # Bigger pages and caches for large clones and bulk imports
+    "throughput": {
+        "page_size": 8192,
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "temp_store": "MEMORY",
+        "cache_size": -65536,        # 64 MiB page cache
+        "mmap_size": 256 * 1024 * 1024,
+        "wal_autocheckpoint": 4000,
+    },
+    # Many clones on one host: keep per-connection memory small
+    "low_memory": {
+        "auto_vacuum": "INCREMENTAL",
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -2048,         # 2 MiB page cache
+        "mmap_size": 0,
+    },
+}
+
+# page_size and auto_vacuum only take effect on a new database, before tables
+# exist, and page_size cannot change once WAL is enabled
+_PRAGMA_ORDER = ["page_size", "auto_vacuum", "journal_mode"]
+
+
+def resolve_connection_profile(profile: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+    """
+    Turn a profile name or dict of PRAGMAs into a dict of PRAGMAs
+
+    Raises:
+        ValueError: If the profile name is unknown
+    """
+    if profile is None:
+        return {}
+    if isinstance(profile, dict):
+        return dict(profile)
+    if profile not in CONNECTION_PROFILES:
+        raise ValueError(
+            f"Unknown connection profile: {profile} "
+            f"(available: {', '.join(sorted(CONNECTION_PROFILES))})"
+        )
+    return dict(CONNECTION_PROFILES[profile])
+
+
+def apply_connection_profile(conn: sqlite3.Connection,
+                             profile: Union[str, Dict[str, Any], None]) -> Dict[str, Any]:
+    """
+    Apply a connection profile to an open connection
+
+    Args:
+        conn: The SQLite connection
+        profile: Profile name from CONNECTION_PROFILES or a dict of PRAGMAs
+
+    Returns:
+        Dict[str, Any]: The effective value of every PRAGMA that was set
+    """
+    pragmas = resolve_connection_profile(profile)
+    ordered = [name for name in _PRAGMA_ORDER if name in pragmas]
+    ordered += [name for name in pragmas if name not in _PRAGMA_ORDER]
+
+    effective = {}
+    for name in ordered:
+        conn.execute(f"PRAGMA {name} = {pragmas[name]}")
+        row = conn.execute(f"PRAGMA {name}").fetchone()
+        effective[name] = row[0] if row else None
+    return effective
+
+
+def run_incremental_maintenance(conn: sqlite3.Connection, max_free_pages: int = 256,
+                                pages_per_step: int = 1024) -> Dict[str, Any]:
+    """
+    Cheap, bounded maintenance step to run instead of a full VACUUM
+
+    Refreshes query planner statistics with PRAGMA optimize, releases free pages
+    with incremental_vacuum when the freelist grows past max_free_pages, and
+    checkpoints the WAL without blocking readers.
+
+    Args:
+        conn: The SQLite connection (must not be inside a transaction)
+        max_free_pages: Freelist size that triggers an incremental vacuum
+        pages_per_step: Maximum pages released per call
+
+    Returns:
+        Dict[str, Any]: What the maintenance step found and did
+    """
+    report = {
+        "auto_vacuum": conn.execute("PRAGMA auto_vacuum").fetchone()[0],
+        "freelist_pages": conn.execute("PRAGMA freelist_count").fetchone()[0],
+        "pages_released": 0,
+        "wal_checkpointed": False
+    }
+
+    conn.execute("PRAGMA optimize")
+
+    # auto_vacuum 2 is INCREMENTAL; other modes cannot release pages this way
+    if report["auto_vacuum"] == 2 and report["freelist_pages"] > max_free_pages:
+        # incremental_vacuum frees one page per step; executescript runs it to completion
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages_per_step)});")
+        remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        report["pages_released"] = report["freelist_pages"] - remaining
+        report["freelist_pages"] = remaining
+
+    if conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal":
+        conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+        report["wal_checkpointed"] = True
+
+    return report
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """
+    Convert an existing database to auto_vacuum=INCREMENTAL
+
+    This needs one full VACUUM, so it is an explicit, one-off operation for
+    databases created before incremental maintenance existed.
+
+    Returns:
+        bool: True if the database was converted, False if it already was
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+class MaintenanceScheduler:
+    """
+    Runs a maintenance task periodically on a background daemon thread, and
+    on demand when run_soon() is called.
+    Errors are reported and the schedule keeps running.
+    """
+
+    def __init__(self, task: Callable[[], Any], interval: Optional[float] = 300.0,
+                 name: str = "sqlite-maintenance"):
+        """
+        Initialize the scheduler
+
+        Args:
+            task: Callable to run on every tick
+            interval: Seconds between runs (None: only run when requested)
+            name: Thread name, useful when debugging
+        """
+        self.task = task
+        self.interval = interval
+        self.name = name
+        self.runs = 0
+        self._stop_event = threading.Event()
+        self._wake_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the background thread (no-op if already running)"""
+        if self.running:
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+        self._thread.start()
+
+    def run_soon(self):
+        """Run the task on the background thread as soon as it is idle, starting it if needed"""
+        self._wake_event.set()
+        self.start()
+
+    def stop(self, timeout: float = 5.0):
+        """Stop the background thread and wait for the current run to finish"""
+        self._stop_event.set()
+        self._wake_event.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+        self._thread = None
+
+    def _run(self):
+        while True:
+            self._wake_event.wait(self.interval)
+            if self._stop_event.is_set():
+                return
+            self._wake_event.clear()
+            try:
+                self.task()
+                self.runs += 1
+            except Exception as e:
+                print(f"⚠️ Background maintenance failed: {e}")
@@ -6,16 +6,104 @@ Uses vec0 virtual tables for efficient vector similarity search
 Now self-contained without dependencies on other memory systems.
 """
 
+import atexit
 import json
 import os
+import re
 import sqlite3
 import sqlite_vec
+import threading
 import time
-import uuid
-import hashlib
-from typing import Dict, List, Any, Optional, Tuple
-from datetime import datetime, timedelta
-from collections import defaultdict
+import weakref
+import numpy as np
+from typing import Dict, Iterable, List, Any, Optional, Tuple, Union
+from datetime import datetime
+
+try:
+    from .embeddings import EmbeddingBackend, create_embedding_backend, serialize_embedding
+    from .embedding_cache import DEFAULT_CACHE_FILE, LRUEmbeddingCache, get_shared_embedding_cache, text_hash
+    from .sqlite_tuning import (
+        MaintenanceScheduler, apply_connection_profile, enable_incremental_vacuum,
+        run_incremental_maintenance
+    )
+    from .shared_store import DEFAULT_SHARED_STORE_DIR, get_connection_pool, shard_path
+    from .vector_shards import SHARD_KEYS, VectorShardSet, remove_shard_files
+    from .hot_tier import HotTier
+    from .ann_index import IVFIndex, remove_index_files
+    from .vector_matrix import VectorMatrix, remove_matrix_files
+    from .schema_migrations import (
+        DEFAULT_CHUNK_SIZE, delete_meta, get_meta, get_schema_version, migrate, set_meta,
+        table_exists, write_in_chunks
+    )
+except ImportError:
+    # For direct execution
+    import sys
+    sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+    from src.memory.embeddings import EmbeddingBackend, create_embedding_backend, serialize_embedding
+    from src.memory.embedding_cache import DEFAULT_CACHE_FILE, LRUEmbeddingCache, get_shared_embedding_cache, text_hash
+    from src.memory.sqlite_tuning import (
+        MaintenanceScheduler, apply_connection_profile, enable_incremental_vacuum,
+        run_incremental_maintenance
+    )
+    from src.memory.shared_store import DEFAULT_SHARED_STORE_DIR, get_connection_pool, shard_path
+    from src.memory.vector_shards import SHARD_KEYS, VectorShardSet, remove_shard_files
+    from src.memory.hot_tier import HotTier
+    from src.memory.ann_index import IVFIndex, remove_index_files
+    from src.memory.vector_matrix import VectorMatrix, remove_matrix_files
+    from src.memory.schema_migrations import (
+        DEFAULT_CHUNK_SIZE, delete_meta, get_meta, get_schema_version, migrate, set_meta,
+        table_exists, write_in_chunks
+    )
+
+# Metadata stored next to each vector so searches filter inside the KNN query
+# (vec0 metadata columns cannot hold NULL; a missing conversation id is '')
+VECTOR_METADATA_COLUMNS = ["speaker text", "conversation_id text", "epoch float"]
+
+
+# How vectors are stored in the vec0 index: the column type and the SQL that
+# turns a float32 blob into it. Quantized indexes are only scanned for
+# candidates; results are re-ranked by exact distance to messages.embedding.
+VECTOR_QUANTIZATIONS = {
+    "float32": ("float32", "{}"),
+    "int8": ("int8", "vec_quantize_int8({}, 'unit')"),  # Components in [-1, 1]
+    "bit": ("bit", "vec_quantize_binary({})"),          # Sign bits, Hamming distance
+}
+
+
+# Where vectors are searched: the sqlite-vec vec0 table, or a memory-mapped
+# float32 matrix scanned with NumPy (no SQLite extension needed)
+VECTOR_ENGINES = ("vec0", "mmap")
+
+
+def _as_epoch(value: Union[datetime, float, int]) -> float:
+    """Accept datetimes or Unix timestamps for time range filters"""
+    return value.timestamp() if isinstance(value, datetime) else float(value)
+
+
+SEARCH_FILTERS = ("speaker", "conversation_id", "since", "until", "before_id")
+
+# KNN subqueries combined into one statement by search_many (SQLite allows 500 compound terms)
+MAX_QUERIES_PER_STATEMENT = 100
+
+
+def _check_search_filters(filters: Dict[str, Any]):
+    """Reject misspelled filter arguments instead of silently ignoring them"""
+    unknown = set(filters) - set(SEARCH_FILTERS)
+    if unknown:
+        raise TypeError(f"Unknown search filters: {', '.join(sorted(unknown))}")
+
+
+def build_fts_query(text: str) -> str:
+    """
+    Turn free text into an FTS5 MATCH expression
+    
+    Every word is quoted (so punctuation and keywords like NOT are literal)
+    and words are OR-ed, leaving BM25 to rank messages matching more of them.
+    Returns an empty string if the text has no searchable words.
+    """
+    words = re.findall(r"\w+", text.lower())
+    return " OR ".join(f'"{word}"' for word in dict.fromkeys(words))
+
 
 class SqliteVecMemory:
     """
@@ -24,66 +112,259 @@ class SqliteVecMemory:
     Now self-contained without dependencies on other memory systems.
     """
     
-    def __init__(self, clone_name: str, embedding_dim: int = 384):
+    def __init__(self, clone_name: str, embedding_dim: int = 384,
+                 embedding_backend: Union[str, EmbeddingBackend] = "hash",
+                 embedding_options: Dict = None,
+                 shared_embedding_cache: Union[bool, str, None] = None,
+                 embedding_cache_size: int = 4096,
+                 embedding_cache_bytes: int = 8 * 1024 * 1024,
+                 batch_size: int = 32,
+                 flush_interval: float = 1.0,
+                 connection_profile: Union[str, Dict] = "balanced",
+                 maintenance_interval: Optional[float] = None,
+                 shared_store: Union[bool, str, None] = None,
+                 store_shards: int = 1,
+                 vector_shards: int = 1,
+                 shard_key: str = "hash",
+                 hot_tier_size: int = 0,
+                 vector_quantization: str = "float32",
+                 truncate_dim: Optional[int] = None,
+                 ann_threshold: Optional[int] = None,
+                 vector_engine: str = "vec0"):
         """
         Initialize SqliteVec memory system
         
         Args:
             clone_name: Name of the AI clone
             embedding_dim: Dimension of embeddings (default 384 for sentence-transformers)
+            embedding_backend: Backend name ("hash", "local", "ollama") or backend instance
+            embedding_options: Extra backend options (model, host, batch_size, ...)
+            shared_embedding_cache: Use the host-wide on-disk embedding cache. None enables it
+                for backends worth caching, True/False force it, a string selects the cache file
+            embedding_cache_size: Maximum entries in the in-process embedding cache
+            embedding_cache_bytes: Maximum bytes held by the in-process embedding cache
+            batch_size: Pending messages that trigger a write to the database
+            flush_interval: Seconds a message may wait in the write queue before it is flushed
+            connection_profile: Name from CONNECTION_PROFILES ("legacy", "balanced",
+                "throughput", "low_memory") or a dict of PRAGMAs applied when opening
+            maintenance_interval: Seconds between background maintenance runs (None disables)
+            shared_store: Keep this clone's messages in a store shared with other clones
+                instead of its own file. True uses the default store directory, a string
+                selects the directory. All clones in a store must use the same embeddings.
+            store_shards: Number of database files the shared store is split across
+            vector_shards: Split this clone's vector index across this many files, searched
+                in parallel. Messages stay in the clone's database. Changing the count
+                later moves only the vectors whose shard changed.
+            shard_key: How vectors are assigned to shards: "hash" (message id) or
+                "time" (30 day buckets, so time filtered searches skip other shards)
+            hot_tier_size: Keep this many of the newest messages and their embeddings in
+                process memory. get_smart_context searches them first and only queries
+                the database (the cold tier) when they are not similar enough. 0 disables.
+            vector_quantization: Storage of the vector index: "float32", "int8" (4x smaller)
+                or "bit" (32x smaller). Quantized searches over-fetch candidates and
+                re-rank them with the float embeddings kept on messages.
+            truncate_dim: Index only the first truncate_dim components of each embedding
+                (e.g. 64/128/256 for Matryoshka models). The index is scanned for
+                candidates which are re-ranked with the full embeddings.
+            ann_threshold: Once the clone has this many vectors, answer vector searches
+                from an in-process IVF index (approximate, NumPy) instead of the vec0
+                scan. The index is updated with every written batch and saved next to
+                the database; training runs on the maintenance scheduler. None disables it.
+            vector_engine: "vec0" (sqlite-vec index) or "mmap": embeddings are appended to a
+                memory-mapped float32 matrix next to the database and searched with one
+                NumPy matrix-vector product. Works without sqlite-vec; cannot be combined
+                with vector shards, quantization, truncation or a shared store.
         """
         self.clone_name = clone_name
-        self.embedding_dim = embedding_dim
+        self.embedder = create_embedding_backend(embedding_backend, embedding_dim,
+                                                 **(embedding_options or {}))
+        self.embedding_dim = self.embedder.embedding_dim
+        
+        # Host-wide embedding cache shared by all clones
+        if shared_embedding_cache is None:
+            shared_embedding_cache = self.embedder.cacheable
+        if shared_embedding_cache:
+            cache_file = shared_embedding_cache if isinstance(shared_embedding_cache, str) else DEFAULT_CACHE_FILE
+            self.shared_cache = get_shared_embedding_cache(cache_file)
+        else:
+            self.shared_cache = None
         
-        # Database setup
-        self.db_file = f"data/vector_memory/{clone_name}_vectors.db"
+        # Database setup: one file per clone, or a shard of a shared multi-clone store
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key: {shard_key} (available: {', '.join(SHARD_KEYS)})")
+        if vector_shards < 1:
+            raise ValueError("vector_shards must be at least 1")
+        if shared_store and vector_shards > 1:
+            raise ValueError("A clone in a shared store cannot shard its vector index")
+        if vector_quantization not in VECTOR_QUANTIZATIONS:
+            raise ValueError(f"Unknown vector quantization: {vector_quantization} "
+                             f"(available: {', '.join(VECTOR_QUANTIZATIONS)})")
+        if truncate_dim is not None and not 0 < truncate_dim < self.embedding_dim:
+            raise ValueError(f"truncate_dim must be between 1 and {self.embedding_dim - 1}")
+        self.index_dim = truncate_dim or self.embedding_dim
+        if vector_quantization == "bit" and self.index_dim % 8:
+            raise ValueError("Bit quantization needs an index dimension divisible by 8")
+        if vector_engine not in VECTOR_ENGINES:
+            raise ValueError(f"Unknown vector engine: {vector_engine} (available: {', '.join(VECTOR_ENGINES)})")
+        if vector_engine == "mmap" and (shared_store or vector_shards > 1 or truncate_dim
+                                        or vector_quantization != "float32"):
+            raise ValueError("The mmap vector engine holds full float32 vectors of a single clone "
+                             "and cannot be sharded, quantized, truncated or shared")
+        self.vector_engine = vector_engine
+        self.vector_quantization = vector_quantization
+        self.shared_store = bool(shared_store)
+        self.vector_shards = vector_shards
+        self.shard_key = shard_key
+        if self.shared_store:
+            store_dir = shared_store if isinstance(shared_store, str) else DEFAULT_SHARED_STORE_DIR
+            self.db_file = shard_path(clone_name, store_dir, store_shards)
+            self.clone_id = clone_name
+        else:
+            self.db_file = f"data/vector_memory/{clone_name}_vectors.db"
+            self.clone_id = None
         os.makedirs(os.path.dirname(self.db_file), exist_ok=True)
         
         # Initialize database connection with sqlite-vec
         self.conn = None
+        self._pooled = None
+        self.vector_shard_set = None
+        self.vector_matrix = None
+        self.ann_threshold = ann_threshold
+        self.ann_index = None
+        self._unindexed_vectors = 0
+        self._ann_build_due = False
+        self._ann_build_lock = threading.Lock()
+        self.fts_available = False
+        self.connection_profile = connection_profile
+        self.connection_settings = {}
+        self.migration_chunk_size = DEFAULT_CHUNK_SIZE
         self._initialize_database()
         
         # Configuration
         self.max_context_messages = 20
         self.similarity_threshold = 0.3
         self.conversation_window = 50  # Messages in recent context
+        self.conversation_id = None  # Tagged onto new messages unless given per message
+        
+        # Hot tier results are used when the best of them reaches this similarity
+        self.hot_similarity_threshold = 0.5
+        
+        # Candidates read from a quantized or truncated index per result, before exact re-ranking
+        self.rerank_oversample = 8
+        
+        # IVF lists scanned per search (None: a tenth of the lists) and growth that triggers retraining
+        self.ann_nprobe = None
+        self.ann_retrain_factor = 4
+        
+        # Hybrid retrieval: candidates per signal and reciprocal rank fusion weights
+        self.hybrid_candidate_depth = 40
+        self.hybrid_vector_weight = 1.0
+        self.hybrid_text_weight = 1.0
+        self.rrf_k = 60
         
         # Performance optimizations
-        self.embedding_cache = {}  # Cache embeddings to avoid recomputation
-        self.batch_size = 1  # Batch size 1 for immediate processing (better for testing)
+        self.embedding_cache = LRUEmbeddingCache(embedding_cache_size, embedding_cache_bytes)
+        
+        # Write-behind queue, flushed on size, elapsed time or explicit flush()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
         self.pending_messages = []  # Queue for batch inserts
+        # Clones sharing a pooled connection must not interleave transactions
+        self._write_lock = self._pooled.lock if self._pooled else threading.RLock()
+        self._flush_timer = None
+        _open_memories.add(self)
+        
+        # Incremental maintenance instead of full VACUUMs
+        self.max_free_pages = 256  # Freelist size that triggers an incremental vacuum
+        self.vacuum_pages_per_step = 1024
+        self.maintenance_scheduler = None
+        if maintenance_interval:
+            self.start_background_maintenance(maintenance_interval)
         
         # Memory stats
         self.stats = {
             "total_messages": 0,
             "vector_searches": 0,
             "cache_hits": 0,
+            "hot_tier_hits": 0,
+            "cold_tier_searches": 0,
+            "ann_searches": 0,
             "last_updated": datetime.now().isoformat()
         }
+        
+        # Stored vectors must come from the configured backend, model and dimension
+        if self.conn:
+            self._reconcile_embeddings()
+        
+        # Newest messages served from memory
+        self.hot_tier = HotTier(hot_tier_size, self.embedding_dim) if hot_tier_size > 0 else None
+        self._load_hot_tier()
+        
+        # Approximate index for large clones (already built if messages were just re-embedded)
+        if self.ann_index is None:
+            self._load_ann_index()
     
     def _initialize_database(self):
+        """Open this clone's database, or join the pooled connection of its shared store"""
+        if self.shared_store:
+            self._pooled = get_connection_pool().acquire(self.db_file, self._open_database)
+            self.conn = self._pooled.conn
+            state = self._pooled.state
+        else:
+            self.conn, state = self._open_database()
+        
+        self.vector_extension_available = state["vector_extension_available"]
+        self.connection_settings = state["connection_settings"]
+        self.fts_available = table_exists(self.conn, "messages_fts")
+        
+        if self.vector_engine == "mmap":
+            self.vector_matrix = VectorMatrix(os.path.splitext(self.db_file)[0], self.embedding_dim)
+        elif self.vector_extension_available and self.vector_shards > 1:
+            self.vector_shard_set = VectorShardSet(
+                self.db_file, self.vector_shards, self.shard_key,
+                self._open_vector_shard, lambda conn: self._create_vector_index(conn.cursor()),
+                self._vector_insert_sql()
+            )
+    
+    def _open_vector_shard(self, shard_file: str) -> sqlite3.Connection:
+        """Open a vector shard file with the clone's connection profile and sqlite-vec"""
+        conn = sqlite3.connect(shard_file, check_same_thread=False)
+        apply_connection_profile(conn, self.connection_profile)
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        conn.enable_load_extension(False)
+        return conn
+    
+    def _open_database(self) -> Tuple[sqlite3.Connection, Dict[str, Any]]:
         """Initialize SQLite database with sqlite-vec extension"""
         try:
-            self.conn = sqlite3.connect(self.db_file)
+            # The flush timer writes from a background thread (guarded by _write_lock)
+            conn = sqlite3.connect(self.db_file, check_same_thread=False)
+            
+            # Journal mode, page size and cache settings must be set before tables are created
+            connection_settings = apply_connection_profile(conn, self.connection_profile)
             
             # Try to enable extension loading and load sqlite-vec
             try:
-                if hasattr(self.conn, 'enable_load_extension'):
-                    self.conn.enable_load_extension(True)
-                    sqlite_vec.load(self.conn)
-                    self.conn.enable_load_extension(False)
-                    self.vector_extension_available = True
+                if hasattr(conn, 'enable_load_extension'):
+                    conn.enable_load_extension(True)
+                    sqlite_vec.load(conn)
+                    conn.enable_load_extension(False)
+                    vector_extension_available = True
                 else:
                     # Fallback for systems without extension support
-                    self.vector_extension_available = False
+                    vector_extension_available = False
                     print("Info: SQLite extension loading not supported on this system - using basic mode")
             except Exception as ext_error:
-                self.vector_extension_available = False
+                vector_extension_available = False
                 print(f"Info: Could not load sqlite-vec extension: {ext_error} - using basic mode")
             
-            cursor = self.conn.cursor()
+            cursor = conn.cursor()
+            existing_database = cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'messages'"
+            ).fetchone() is not None
             
-            # Create tables
+            # Create tables (current schema; older databases are upgraded by migrate())
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS messages (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -91,240 +372,1323 @@ class SqliteVecMemory:
                     content TEXT NOT NULL,
                     timestamp TEXT NOT NULL,
                     embedding BLOB,
-                    metadata TEXT
+                    metadata TEXT,
+                    epoch REAL,
+                    conversation_id TEXT,
+                    clone_id TEXT
                 )
             ''')
             
-            cursor.execute('''
-                CREATE TABLE IF NOT EXISTS embeddings (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    message_id INTEGER,
-                    vector_data BLOB,
-                    FOREIGN KEY (message_id) REFERENCES messages (id)
-                )
-            ''')
+            # Create message_vectors table for sqlite-vec (sharded indexes live in their own files)
+            if vector_extension_available and self.vector_shards == 1 and self.vector_engine == "vec0":
+                self._create_vector_index(cursor)
             
-            # Create message_vectors table for sqlite-vec
-            if self.vector_extension_available:
-                cursor.execute('''
-                    CREATE VIRTUAL TABLE IF NOT EXISTS message_vectors 
-                    USING vec0(
-                        message_id INTEGER,
-                        embedding float32[384]
-                    )
-                ''')
+            conn.commit()
+            applied = migrate(conn, chunk_size=self.migration_chunk_size)
+            if applied and existing_database:
+                print(f"Migrated {self.db_file} to schema version {applied[-1]}")
             
-            self.conn.commit()
-            if self.vector_extension_available:
+            if self.shared_store:
+                # Per-clone recency and counts in a store holding many clones
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_clone ON messages (clone_id, id)")
+                conn.commit()
+            
+            if vector_extension_available:
                 print(f"SqliteVec database initialized with vector support: {self.db_file}")
             else:
                 print(f"SqliteVec database initialized (basic mode): {self.db_file}")
             
+            return conn, {
+                "vector_extension_available": vector_extension_available,
+                "connection_settings": connection_settings
+            }
+            
         except Exception as e:
             print(f"SqliteVec initialization failed: {e}")
             raise
     
-    def _generate_embedding(self, text: str) -> Optional[List[float]]:
+    def _create_vector_index(self, cursor: sqlite3.Cursor):
+        """Create the vec0 index over message embeddings"""
+        metadata_columns = "".join(f",\n                {column}" for column in self._vector_columns())
+        cursor.execute(f'''
+            CREATE VIRTUAL TABLE IF NOT EXISTS message_vectors 
+            USING vec0(
+                message_id INTEGER,
+                embedding {VECTOR_QUANTIZATIONS[self.vector_quantization][0]}[{self.index_dim}]{metadata_columns}
+            )
+        ''')
+    
+    def _vector_index_layout(self) -> str:
+        """Identifies the vec0 column layout; a change triggers an index rebuild"""
+        if self.vector_matrix is not None:
+            return f"mmap float32[{self.embedding_dim}]"
+        column_type = VECTOR_QUANTIZATIONS[self.vector_quantization][0]
+        layout = f"{column_type}[{self.index_dim}];" + ",".join(self._vector_columns())
+        if self.vector_shards > 1:
+            # The shard count is not part of the layout: changing it only rebalances
+            layout += f";sharded by {self.shard_key}"
+        return layout
+    
+    def _vector_columns(self) -> List[str]:
+        """Columns stored next to each vector; a shared store partitions the index by clone"""
+        if self.shared_store:
+            return ["clone_id text partition key"] + VECTOR_METADATA_COLUMNS
+        return list(VECTOR_METADATA_COLUMNS)
+    
+    def _vector_insert_sql(self) -> str:
+        """INSERT for message_vectors rows: (rowid, message_id, embedding, *columns)"""
+        names = [column.split()[0] for column in self._vector_columns()]
+        placeholders = ", ".join(["?", "?", self._index_vector("?")] + ["?"] * len(names))
+        return f"INSERT INTO message_vectors (rowid, message_id, embedding, {', '.join(names)}) VALUES ({placeholders})"
+    
+    def _index_vector(self, expression: str) -> str:
+        """SQL converting a full float32 embedding expression to what the index stores"""
+        if self.index_dim < self.embedding_dim:
+            expression = f"vec_slice({expression}, 0, {self.index_dim})"
+        return VECTOR_QUANTIZATIONS[self.vector_quantization][1].format(expression)
+    
+    def _index_is_exact(self) -> bool:
+        """Whether index distances are the exact full-embedding distances"""
+        return self.vector_quantization == "float32" and self.index_dim == self.embedding_dim
+    
+    def _nearest_vectors_sql(self, conditions: str, embedding: str = ":embedding") -> str:
         """
-        Generate embeddings for text using a simple approach
-        In production, this would use OpenAI API or local embedding model
-        For testing, we'll use a simple hash-based approach
+        Query for the :k nearest (message_id, distance) rows to :embedding
+        (or the named parameter given as embedding).
+        On a quantized or truncated index :candidates rows are fetched and
+        re-ranked by exact full-embedding distance; the KNN runs on its own so filter columns are not
+        ambiguous with those of messages.
         """
-        # Simple hash-based embedding for testing (deterministic)
-        import hashlib
+        def knn(k: str) -> str:
+            return f"""
+                SELECT message_id, distance
+                FROM message_vectors
+                WHERE embedding MATCH {self._index_vector(embedding)} AND k = {k}{conditions}"""
+        
+        if self._index_is_exact():
+            return knn(":k")
+        return f"""
+                SELECT candidates.message_id,
+                       vec_distance_l2(m.embedding, {embedding}) AS distance
+                FROM ({knn(":candidates")}) candidates
+                JOIN messages m ON m.id = candidates.message_id
+                ORDER BY distance
+                LIMIT :k"""
+    
+    def _knn_params(self, query_embedding: np.ndarray, k: int) -> Dict[str, Any]:
+        return {"embedding": serialize_embedding(query_embedding), "k": k,
+                "candidates": k * self.rerank_oversample}
+    
+    def _clone_scope(self, keyword: str = "WHERE") -> str:
+        """Condition restricting a messages query to this clone (empty for per-clone files)"""
+        return f" {keyword} clone_id = :clone_id" if self.shared_store else ""
+    
+    def _embedding_signature(self) -> str:
+        """Identifies vectors produced by the configured backend, model and dimension"""
+        return f"{self.embedder.name}:{self.embedder.model}:{self.embedding_dim}"
+    
+    def _reconcile_embeddings(self):
+        """Re-embed stored messages and rebuild the index if the embedding configuration changed"""
+        signature = self._embedding_signature()
+        stored = get_meta(self.conn, "embedding_signature")
+        if stored is None:
+            # Databases from before signatures were recorded: trust vectors of the right size
+            mismatched = self.conn.execute("""
+                SELECT 1 FROM messages
+                WHERE embedding IS NOT NULL AND length(embedding) != ?
+                LIMIT 1
+            """, (self.embedding_dim * 4,)).fetchone()
+            stored = "unknown" if mismatched else signature
         
-        # Create a deterministic "embedding" from text hash
-        hash_bytes = hashlib.md5(text.encode()).digest()
+        if self.shared_store and stored != signature:
+            # Re-embedding would rewrite every other clone's vectors in the store
+            self.close()
+            raise ValueError(
+                f"Shared store {self.db_file} holds {stored} embeddings; "
+                f"{self.clone_name} is configured for {signature}"
+            )
         
-        # Convert to float array of desired dimension
-        embedding = []
-        for i in range(self.embedding_dim):
-            byte_idx = i % len(hash_bytes)
-            embedding.append((hash_bytes[byte_idx] / 255.0) * 2.0 - 1.0)  # Scale to [-1, 1]
+        stored_layout = get_meta(self.conn, "vector_index_layout")
+        if self.shared_store and stored_layout is not None:
+            # The vec0 table is store-wide: rebuilding it would break every other clone's searches
+            stored_column = stored_layout.split(";")[0]
+            column = self._vector_index_layout().split(";")[0]
+            if stored_column != column:
+                self.close()
+                raise ValueError(
+                    f"Shared store {self.db_file} has a {stored_column} vector index; "
+                    f"{self.clone_name} is configured for {column} "
+                    f"(vector_quantization and truncate_dim must match)"
+                )
         
-        return embedding
+        try:
+            if stored != signature or get_meta(self.conn, "reembed_signature") is not None:
+                print(f"Re-embedding {self.clone_name} messages with {signature} (was {stored})")
+                self.reembed_messages()
+            elif (self._vector_search_available() and
+                  get_meta(self.conn, "vector_index_layout") != self._vector_index_layout()):
+                self.rebuild_vector_index()
+            elif (self.vector_shard_set and
+                  get_meta(self.conn, "vector_shards") != str(self.vector_shards)):
+                moved = self.rebalance_vector_shards()
+                print(f"Rebalanced {self.clone_name} vector shards: {moved} vectors moved")
+            elif self.vector_matrix is not None:
+                self._sync_vector_matrix()
+            
+            # Messages stored without a vector (legacy databases, failed embedding calls)
+            missing = self.conn.execute(f"""
+                SELECT COUNT(*) FROM messages WHERE embedding IS NULL{self._clone_scope("AND")}
+            """, {"clone_id": self.clone_id}).fetchone()[0]
+            if missing and stored == signature:
+                print(f"Embedding {missing} {self.clone_name} messages stored without a vector")
+                self.reembed_messages(missing_only=True)
+            
+            with self._write_lock:
+                set_meta(self.conn, "embedding_signature", signature)
+                self.conn.commit()
+        except Exception as e:
+            print(f"⚠️ Error reconciling stored embeddings: {e}")
     
-    def _generate_real_embedding(self, text: str) -> Optional[List[float]]:
+    def reembed_messages(self, missing_only: bool = False) -> int:
         """
-        Generate real semantic embeddings using OpenAI API or local models
-        This is where the true semantic power comes from!
+        Recompute stored embeddings with the current backend, in chunked transactions
+        
+        An interrupted run resumes after the last committed chunk the next time
+        the clone is opened. The vector index is rebuilt afterwards; with
+        missing_only the new vectors are added to it chunk by chunk instead.
+        
+        Args:
+            missing_only: Only embed messages that have no stored embedding
+        
+        Returns:
+            int: Number of messages re-embedded
         """
-        try:
-            # Option 1: OpenAI API (requires API key)
-            # import openai
-            # response = openai.Embedding.create(
-            #     input=text,
-            #     model="text-embedding-ada-002"
-            # )
-            # return response['data'][0]['embedding']
-            
-            # Option 2: Local embedding model (sentence-transformers)
-            # from sentence_transformers import SentenceTransformer
-            # model = SentenceTransformer('all-MiniLM-L6-v2')  # 384 dimensions
-            # embedding = model.encode(text).tolist()
-            # return embedding
-            
-            # Option 3: Ollama embeddings (if available)
-            # import requests
-            # response = requests.post(
-            #     "http://localhost:11434/api/embeddings",
-            #     json={"model": "llama3.2:3b", "prompt": text}
-            # )
-            # return response.json()["embedding"]
-            
-            # For now, fall back to hash-based
-            return self._generate_embedding(text)
+        if not self.conn:
+            return 0
+        self.flush()
+        
+        signature = self._embedding_signature()
+        with self._write_lock:
+            last_id = 0
+            if missing_only:
+                resumable = False
+            elif get_meta(self.conn, "reembed_signature") == signature:
+                resumable = True
+                last_id = int(get_meta(self.conn, "reembed_last_id", "0"))
+            else:
+                resumable = True
+                set_meta(self.conn, "reembed_signature", signature)
+                set_meta(self.conn, "reembed_last_id", 0)
+                self.conn.commit()
+            
+            condition = "AND embedding IS NULL" if missing_only else ""
+            total = 0
+            while True:
+                rows = self.conn.execute(f"""
+                    SELECT id, content FROM messages
+                    WHERE id > :last_id {condition}{self._clone_scope("AND")}
+                    ORDER BY id LIMIT :limit
+                """, {"last_id": last_id, "limit": self.migration_chunk_size,
+                      "clone_id": self.clone_id}).fetchall()
+                if not rows:
+                    break
+                
+                embeddings = self._embed_contents([content for _, content in rows])
+                vector_rows = []
+                self.conn.execute("BEGIN IMMEDIATE")
+                try:
+                    self.conn.executemany("UPDATE messages SET embedding = ? WHERE id = ?", [
+                        (serialize_embedding(embedding) if embedding is not None else None, message_id)
+                        for (message_id, _), embedding in zip(rows, embeddings)
+                    ])
+                    if missing_only:
+                        vector_rows = self._index_vectors([message_id for message_id, _ in rows])
+                    last_id = rows[-1][0]
+                    if resumable:
+                        set_meta(self.conn, "reembed_last_id", last_id)
+                    self.conn.execute("COMMIT")
+                except Exception:
+                    self.conn.execute("ROLLBACK")
+                    raise
+                if self.vector_shard_set and vector_rows:
+                    self.vector_shard_set.insert(vector_rows, replace=True)
+                total += len(rows)
+            
+            if not missing_only or self.vector_matrix is not None:
+                # The matrix is append-only by id, so vectors of older messages need a rebuild
+                self.rebuild_vector_index()
+            if resumable:
+                delete_meta(self.conn, "reembed_signature", "reembed_last_id")
+                set_meta(self.conn, "embedding_signature", signature)
+                self.conn.commit()
+            self._load_hot_tier()
+            self._load_ann_index(rebuild=True)
+            return total
+    
+    def rebuild_vector_index(self) -> int:
+        """
+        Recreate the vec0 index from the embeddings stored on messages
+        
+        Rows are copied in chunked transactions, so searches keep working
+        (on a partially filled index) while a large clone is rebuilt.
+        
+        Returns:
+            int: Number of vectors indexed
+        """
+        if not self.conn or not self._vector_search_available():
+            return 0
+        self.flush()
+        
+        with self._write_lock:
+            if self.vector_extension_available:
+                self.conn.execute("DROP TABLE IF EXISTS message_vectors")
+            if self.vector_matrix is not None:
+                self.conn.commit()
+                rows = self.conn.execute("""
+                    SELECT id, embedding FROM messages
+                    WHERE embedding IS NOT NULL AND length(embedding) = ?
+                    ORDER BY id
+                """, (self.embedding_dim * 4,))
+                indexed = self.vector_matrix.rebuild(rows, self.migration_chunk_size)
+            elif self.vector_shard_set:
+                self.conn.commit()
+                rows = self.conn.execute(f"""
+                    SELECT {self._vector_row_columns()} FROM messages
+                    WHERE embedding IS NOT NULL AND length(embedding) = ?
+                    ORDER BY id
+                """, (self.embedding_dim * 4,))
+                indexed = self.vector_shard_set.rebuild(rows, self.migration_chunk_size)
+                set_meta(self.conn, "vector_shards", self.vector_shards)
+            else:
+                remove_shard_files(self.db_file)
+                remove_matrix_files(os.path.splitext(self.db_file)[0])
+                self._create_vector_index(self.conn.cursor())
+                self.conn.commit()
+                
+                rows = self.conn.execute(f"""
+                    SELECT {self._vector_row_columns()} FROM messages
+                    WHERE embedding IS NOT NULL AND length(embedding) = ?
+                    ORDER BY id
+                """, (self.embedding_dim * 4,))
+                indexed = write_in_chunks(self.conn, rows, self._vector_insert_sql(),
+                                          self.migration_chunk_size)
             
+            set_meta(self.conn, "vector_index_layout", self._vector_index_layout())
+            self.conn.commit()
+            return indexed
+    
+    def _load_hot_tier(self):
+        """Fill the hot tier with the newest stored messages"""
+        if getattr(self, "hot_tier", None) is None or not self.conn:
+            return
+        rows = self.conn.execute(f"""
+            SELECT id, speaker, content, timestamp, epoch, conversation_id, embedding
+            FROM messages{self._clone_scope()}
+            ORDER BY id DESC
+            LIMIT :limit
+        """, {"limit": self.hot_tier.capacity, "clone_id": self.clone_id}).fetchall()
+        
+        self.hot_tier.clear()
+        self.hot_tier.add([
+            {
+                "id": row[0], "speaker": row[1], "content": row[2], "timestamp": row[3],
+                "epoch": row[4], "conversation_id": row[5],
+                "embedding": np.frombuffer(row[6], dtype=np.float32) if row[6] else None
+            }
+            for row in reversed(rows)
+        ])
+    
+    def _vector_row_columns(self) -> str:
+        """messages columns forming a message_vectors row (see _vector_insert_sql)"""
+        clone_column = "clone_id, " if self.shared_store else ""
+        return (f"id, id, embedding, {clone_column}speaker, COALESCE(conversation_id, ''), "
+                f"COALESCE(epoch, 0)")
+    
+    def _vector_rows(self, message_ids: List[int]) -> List[Tuple]:
+        """message_vectors rows of the given messages that have an embedding"""
+        return self.conn.execute(f"""
+            SELECT {self._vector_row_columns()} FROM messages
+            WHERE id IN (SELECT value FROM json_each(?)) AND embedding IS NOT NULL
+        """, (json.dumps(message_ids),)).fetchall()
+    
+    def _index_vectors(self, message_ids: List[int]) -> List[Tuple]:
+        """
+        Write the vectors of the given messages to the vec0 table, replacing
+        existing ones (in the caller's transaction). Returns the vector rows
+        so sharded indexes, which commit separately, can be written by the caller.
+        """
+        if not self._vector_search_available() or self.vector_matrix is not None:
+            return []
+        rows = self._vector_rows(message_ids)
+        if not self.vector_shard_set:
+            self.conn.executemany("DELETE FROM message_vectors WHERE rowid = ?", [(row[0],) for row in rows])
+            self.conn.executemany(self._vector_insert_sql(), rows)
+        return rows
+    
+    def rebalance_vector_shards(self) -> int:
+        """
+        Move vectors to the shard that owns them under the current shard count
+        
+        Runs automatically when a clone is opened with a different vector_shards
+        value. With consistent hashing, going from n to n + 1 shards moves about
+        1 / (n + 1) of the vectors; shard files beyond the new count are removed.
+        
+        Returns:
+            int: Number of vectors moved
+        """
+        if not self.conn or not self.vector_shard_set:
+            return 0
+        self.flush()
+        
+        with self._write_lock:
+            moved = self.vector_shard_set.rebalance(self._vector_rows, self.migration_chunk_size)
+            set_meta(self.conn, "vector_shards", self.vector_shards)
+            self.conn.commit()
+            return moved
+    
+    def _sync_vector_matrix(self) -> int:
+        """Append messages stored after the matrix's last row (e.g. lost to a crash before the append)"""
+        ids, vectors = self._stored_embeddings(self.vector_matrix.max_id)
+        return self.vector_matrix.append(ids, vectors)
+    
+    def _vector_search_available(self) -> bool:
+        """Whether an engine can answer vector searches (vec0 needs the sqlite-vec extension)"""
+        return self.vector_matrix is not None or getattr(self, 'vector_extension_available', False)
+    
+    def _ann_enabled(self) -> bool:
+        return self.ann_threshold is not None and bool(self.conn) and self._vector_search_available()
+    
+    def _ann_index_file(self) -> str:
+        """IVF index file next to the clone's database (one per clone in a shared store)"""
+        base = os.path.splitext(self.db_file)[0]
+        if self.shared_store:
+            base += "." + re.sub(r"\W", "_", self.clone_id)
+        return f"{base}.ivf.npz"
+    
+    def _stored_embeddings(self, after_id: int = 0,
+                           conn: Optional[sqlite3.Connection] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Ids and full embeddings of this clone's messages with id > after_id (read through conn)"""
+        cursor = (conn or self.conn).execute(f"""
+            SELECT id, embedding FROM messages
+            WHERE id > :after_id AND embedding IS NOT NULL AND length(embedding) = :size{self._clone_scope("AND")}
+            ORDER BY id
+        """, {"after_id": after_id, "size": self.embedding_dim * 4, "clone_id": self.clone_id})
+        ids, blobs = [], []
+        for rows in iter(lambda: cursor.fetchmany(self.migration_chunk_size), []):
+            ids.extend(row[0] for row in rows)
+            blobs.extend(row[1] for row in rows)
+        vectors = np.frombuffer(b"".join(blobs), dtype=np.float32).reshape(len(ids), self.embedding_dim)
+        return np.array(ids, dtype=np.int64), vectors
+    
+    def _load_ann_index(self, rebuild: bool = False):
+        """
+        Load the saved IVF index and add the messages written since it was saved,
+        or schedule a build if the clone has reached ann_threshold vectors
+        """
+        self.ann_index = None
+        if not self._ann_enabled():
+            return
+        path = self._ann_index_file()
+        if os.path.exists(path) and not rebuild:
+            try:
+                index, metadata = IVFIndex.load(path)
+                if metadata.get("embedding_signature") == self._embedding_signature():
+                    ids, vectors = self._stored_embeddings(index.max_id)
+                    index.add(ids, vectors)
+                    self.ann_index = index
+                    if len(index) > self.ann_retrain_factor * index.trained_size:
+                        self._request_ann_build()
+                    return
+            except Exception as e:
+                print(f"⚠️ Discarding unreadable ANN index {path}: {e}")
+        
+        self._unindexed_vectors = self.conn.execute(f"""
+            SELECT COUNT(*) FROM messages WHERE embedding IS NOT NULL{self._clone_scope("AND")}
+        """, {"clone_id": self.clone_id}).fetchone()[0]
+        if self._unindexed_vectors >= self.ann_threshold:
+            self._request_ann_build()
+        else:
+            remove_index_files(path)
+    
+    def build_ann_index(self) -> int:
+        """
+        Train the IVF index on all stored embeddings and save it
+        
+        Runs on the maintenance scheduler when the clone reaches ann_threshold
+        vectors and again whenever it has grown ann_retrain_factor times past
+        the size the centroids were trained on; searches use the exact index
+        (or the old centroids) meanwhile. Calling it builds synchronously.
+        
+        Returns:
+            int: Number of vectors indexed
+        """
+        if not self._ann_enabled():
+            return 0
+        self.flush()
+        return self._build_ann_index()
+    
+    def _request_ann_build(self):
+        """Have the maintenance scheduler (re)train the IVF index, off the write path"""
+        if self._ann_build_due:
+            return
+        self._ann_build_due = True
+        if self.maintenance_scheduler is None:
+            # Without periodic maintenance the scheduler only runs when work is requested
+            self.maintenance_scheduler = MaintenanceScheduler(
+                self._run_scheduled_maintenance, None, name=f"{self.clone_name}-maintenance")
+        self.maintenance_scheduler.run_soon()
+    
+    def _build_ann_index(self) -> int:
+        """
+        Train centroids on a snapshot of the stored embeddings without holding
+        the write lock, then add what was written meanwhile and swap the index in
+        """
+        with self._ann_build_lock:
+            self._ann_build_due = False
+            # A connection of its own reads a consistent snapshot while batches keep committing
+            reader = sqlite3.connect(self.db_file, timeout=30)
+            try:
+                ids, vectors = self._stored_embeddings(conn=reader)
+            finally:
+                reader.close()
+            index = IVFIndex.build(ids, vectors) if len(ids) else None
+            
+            with self._write_lock:
+                if not self.conn or self._ann_build_due:
+                    # Closed, or invalidated (e.g. re-embedded) while training: the queued build replaces it
+                    return 0
+                if index is not None:
+                    index.add(*self._stored_embeddings(index.max_id))
+                self.ann_index = index
+                self._unindexed_vectors = 0
+            if index is None:
+                return 0
+            self._save_ann_index()
+            return len(index)
+    
+    def _save_ann_index(self):
+        """Write a snapshot of the IVF index next to the database"""
+        self.ann_index.save(self._ann_index_file(), {"embedding_signature": self._embedding_signature()})
+    
+    def _persist_ann_index(self):
+        """Append the vectors added to the IVF index since it was last written to its log"""
+        index = self.ann_index
+        if index is not None and index.unsaved_vectors:
+            try:
+                index.save_appended(self._ann_index_file())
+            except Exception as e:
+                print(f"⚠️ Error saving ANN index: {e}")
+    
+    def _maintain_ann_index(self):
+        """Scheduled IVF work: train the index when due, and compact a log grown past half the index"""
+        if not self._ann_enabled():
+            return
+        if self._ann_build_due:
+            self._build_ann_index()
+        elif self.ann_index is not None and self.ann_index.logged_vectors > len(self.ann_index) // 2:
+            self._save_ann_index()
+    
+    def _update_ann_index(self, ids: List[int], embeddings: List[np.ndarray]):
+        """Add newly written vectors to the IVF index, scheduling a build or retraining when due"""
+        if not self._ann_enabled() or not ids:
+            return
+        if self.ann_index is None:
+            self._unindexed_vectors += len(ids)
+            due = self._unindexed_vectors >= self.ann_threshold
+        else:
+            self.ann_index.add(ids, np.stack(embeddings))
+            # The centroids no longer describe the collection: lists get long and unbalanced
+            due = len(self.ann_index) > self.ann_retrain_factor * self.ann_index.trained_size
+        # A build in progress adds everything committed before it swaps the index in
+        if due and not self._ann_build_lock.locked():
+            self._request_ann_build()
+    
+    def _generate_embedding(self, text: str) -> Optional[np.ndarray]:
+        """Generate a float32 embedding for text using the configured backend"""
+        try:
+            return self.embedder.embed(text)
         except Exception as e:
-            print(f"⚠️ Real embedding failed: {e}, using hash-based fallback")
-            return self._generate_embedding(text)
+            print(f"⚠️ Embedding failed ({self.embedder.name}): {e}")
+            return None
     
-    def add_message(self, speaker: str, content: str, metadata: Dict = None):
+    def _embed_contents(self, contents: List[str]) -> List[np.ndarray]:
+        """
+        Embed message contents, checking the in-process cache, then the shared
+        on-disk cache, and computing the remaining misses in one batched call
+        """
+        embeddings = [None] * len(contents)
+        missing = {}  # content_hash -> positions that need this embedding
+        
+        for i, content in enumerate(contents):
+            content_hash = text_hash(content)
+            cached = self.embedding_cache.get(content_hash)
+            if cached is not None:
+                embeddings[i] = cached
+                self.stats["cache_hits"] += 1
+            else:
+                missing.setdefault(content_hash, []).append(i)
+        
+        if not missing:
+            return embeddings
+        
+        found = {}
+        if self.shared_cache:
+            try:
+                found = self.shared_cache.get_many(self.embedder.name, self.embedder.model,
+                                                   self.embedding_dim, list(missing.keys()))
+            except Exception as e:
+                print(f"⚠️ Shared embedding cache lookup failed: {e}")
+        
+        to_compute = [h for h in missing if h not in found]
+        if to_compute:
+            try:
+                vectors = self.embedder.embed_many([contents[missing[h][0]] for h in to_compute])
+            except Exception as e:
+                # Store the messages without vectors rather than losing them
+                print(f"⚠️ Embedding failed ({self.embedder.name}): {e}")
+                vectors = []
+                to_compute = []
+            computed = dict(zip(to_compute, vectors))
+            
+            if self.shared_cache and computed:
+                try:
+                    self.shared_cache.put_many(self.embedder.name, self.embedder.model,
+                                               self.embedding_dim, computed)
+                except Exception as e:
+                    print(f"⚠️ Shared embedding cache update failed: {e}")
+            found.update(computed)
+        
+        for content_hash, vector in found.items():
+            self.embedding_cache.put(content_hash, vector)
+            for i in missing[content_hash]:
+                embeddings[i] = vector
+        
+        return embeddings
+    
+    def add_message(self, speaker: str, content: str, metadata: Dict = None,
+                    conversation_id: Optional[str] = None):
         """Add a message with vector embedding (with performance optimizations)"""
+        self.add_messages([{"speaker": speaker, "content": content, "metadata": metadata,
+                            "conversation_id": conversation_id}])
+    
+    def add_messages(self, messages: List[Dict]):
+        """
+        Add several messages at once, embedding them in a single batch
         
+        Args:
+            messages: Dicts with "speaker", "content" and optional "metadata" and
+                "conversation_id" (defaults to the memory's conversation_id)
+        """
         if not self.conn:
             return  # Fallback mode
         
         try:
-            timestamp = datetime.now().isoformat()
-            
-            # Check cache first for performance
-            content_hash = hashlib.md5(content.encode()).hexdigest()
-            if content_hash in self.embedding_cache:
-                embedding = self.embedding_cache[content_hash]
-                self.stats["cache_hits"] += 1
-            else:
-                embedding = self._generate_embedding(content)
-                if embedding:
-                    self.embedding_cache[content_hash] = embedding
+            epoch = time.time()
+            timestamp = datetime.fromtimestamp(epoch).isoformat()
+            embeddings = self._embed_contents([msg["content"] for msg in messages])
             
             # Always add message to database, even without embedding in basic mode
-            # Add to batch queue for better performance
-            self.pending_messages.append({
-                "speaker": speaker,
-                "content": content,
-                "timestamp": timestamp,
-                "metadata": metadata,
-                "embedding": embedding
-            })
-            
-            # Process batch if full
-            if len(self.pending_messages) >= self.batch_size:
-                self._process_batch()
-            
-            self.stats["total_messages"] += 1
+            # Add to the write-behind queue; the database is written in batches
+            with self._write_lock:
+                for msg, embedding in zip(messages, embeddings):
+                    self.pending_messages.append({
+                        "speaker": msg["speaker"],
+                        "content": msg["content"],
+                        "timestamp": timestamp,
+                        "epoch": epoch,
+                        "conversation_id": msg.get("conversation_id") or self.conversation_id,
+                        "metadata": msg.get("metadata"),
+                        "embedding": embedding
+                    })
+                    self.stats["total_messages"] += 1
+                
+                # Process batch if full, otherwise make sure it is flushed in time
+                if len(self.pending_messages) >= self.batch_size:
+                    self._process_batch()
+                else:
+                    self._schedule_flush()
             
         except Exception as e:
             print(f"Error adding message to vector memory: {e}")
     
-    def _process_batch(self):
-        """Process pending messages in batch for better performance"""
-        if not self.pending_messages:
+    def _schedule_flush(self):
+        """Start the flush timer for the oldest pending message"""
+        if self._flush_timer is not None or not self.pending_messages:
+            return
+        if self.flush_interval <= 0:
+            self._process_batch()
             return
         
-        try:
-            cursor = self.conn.cursor()
+        self._flush_timer = threading.Timer(self.flush_interval, self._flush_from_timer)
+        self._flush_timer.daemon = True
+        self._flush_timer.start()
+    
+    def _flush_from_timer(self):
+        """Timer callback: flush whatever is still queued"""
+        with self._write_lock:
+            if self._flush_timer is threading.current_thread():
+                self._flush_timer = None
+            if self.conn:
+                self._process_batch()
+    
+    def flush(self):
+        """Write all pending messages to the database"""
+        with self._write_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if self.conn:
+                self._process_batch()
+    
+    def _process_batch(self):
+        """Write pending messages and their vectors in a single transaction"""
+        with self._write_lock:
+            if not self.pending_messages:
+                return
             
-            # Use transaction for batch insert
-            cursor.execute("BEGIN TRANSACTION")
+            batch = self.pending_messages
+            self.pending_messages = []
+            cursor = self.conn.cursor()
+            vector_rows = []
+            # Full embeddings are kept on messages so the vec0 index can be rebuilt
+            blobs = [
+                serialize_embedding(msg["embedding"]) if msg["embedding"] is not None else None
+                for msg in batch
+            ]
             
-            for msg in self.pending_messages:
-                # Insert message
+            try:
+                # Take the write lock up front so the ids reserved below stay ours
+                cursor.execute("BEGIN IMMEDIATE")
+                
+                # Assign ids explicitly so both tables can be filled with executemany
                 cursor.execute("""
-                    INSERT INTO messages (speaker, content, timestamp, metadata)
-                    VALUES (?, ?, ?, ?)
-                """, (msg["speaker"], msg["content"], 
-                      msg["timestamp"], json.dumps(msg["metadata"]) if msg["metadata"] else None))
+                    SELECT MAX(COALESCE((SELECT MAX(id) FROM messages), 0),
+                               COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'messages'), 0))
+                """)
+                first_id = cursor.fetchone()[0] + 1
+                
+                cursor.executemany("""
+                    INSERT INTO messages (id, speaker, content, timestamp, epoch, conversation_id,
+                                          clone_id, metadata, embedding)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, [
+                    (first_id + i, msg["speaker"], msg["content"], msg["timestamp"], msg["epoch"],
+                     msg["conversation_id"], self.clone_id,
+                     json.dumps(msg["metadata"]) if msg["metadata"] else None, blobs[i])
+                    for i, msg in enumerate(batch)
+                ])
+                
+                # Only insert vectors if extension is available and embedding exists
+                if getattr(self, 'vector_extension_available', False):
+                    clone_column = (self.clone_id,) if self.shared_store else ()
+                    vector_rows = [
+                        (first_id + i, first_id + i, blob, *clone_column, msg["speaker"],
+                         msg["conversation_id"] or "", msg["epoch"])
+                        for i, (msg, blob) in enumerate(zip(batch, blobs)) if blob is not None
+                    ]
+                    if not self.vector_shard_set and self.vector_matrix is None:
+                        try:
+                            cursor.executemany(self._vector_insert_sql(), vector_rows)
+                        except Exception as vec_error:
+                            print(f"Info: Vector insertion skipped: {vec_error}")
+                
+                cursor.execute("COMMIT")
                 
-                # Get the auto-generated message ID
-                message_id = cursor.lastrowid
+                if self.hot_tier is not None:
+                    self.hot_tier.add([
+                        {**msg, "id": first_id + i} for i, msg in enumerate(batch)
+                    ])
                 
-                # Only insert vector if extension is available and embedding exists
-                if getattr(self, 'vector_extension_available', False) and msg["embedding"]:
+                if self.vector_shard_set and vector_rows:
+                    # Shards commit separately; messages keep the embeddings, so
+                    # rebuild_vector_index() recovers any vectors lost here
                     try:
-                        embedding_bytes = sqlite_vec.serialize_float32(msg["embedding"])
-                        cursor.execute("""
-                            INSERT INTO message_vectors (message_id, embedding)
-                            VALUES (?, ?)
-                        """, (message_id, embedding_bytes))
+                        self.vector_shard_set.insert(vector_rows)
                     except Exception as vec_error:
                         print(f"Info: Vector insertion skipped: {vec_error}")
-            
-            cursor.execute("COMMIT")
-            self.pending_messages.clear()
-            
-        except Exception as e:
-            print(f"Error processing batch: {e}")
-            cursor.execute("ROLLBACK")
+                
+                embedded = [(first_id + i, msg["embedding"]) for i, msg in enumerate(batch)
+                            if msg["embedding"] is not None]
+                if self.vector_matrix is not None and embedded:
+                    # Appended rows are only visible once complete; missing ones are
+                    # appended from messages when the clone is next opened
+                    try:
+                        self.vector_matrix.append([row[0] for row in embedded], [row[1] for row in embedded])
+                    except Exception as vec_error:
+                        print(f"Info: Vector matrix append skipped: {vec_error}")
+                
+                if self.ann_threshold is not None:
+                    # Like the shards, the index is rebuilt from messages if this fails
+                    try:
+                        self._update_ann_index([row[0] for row in embedded], [row[1] for row in embedded])
+                    except Exception as ann_error:
+                        print(f"Info: ANN index update skipped: {ann_error}")
+                        self.ann_index = None
+                
+            except Exception as e:
+                print(f"Error processing batch: {e}")
+                if self.conn.in_transaction:
+                    cursor.execute("ROLLBACK")
+                # Keep the messages queued so the next flush retries them
+                self.pending_messages[:0] = batch
     
-    def search_messages(self, query: str, max_results: int = 5) -> List[Dict]:
-        """Search for messages (alias for compatibility)"""
-        return self.search_similar_messages(query, max_results)
+    def _pending_as_results(self) -> List[Dict]:
+        """Pending messages in the same shape as rows read from the database"""
+        return [
+            {"speaker": msg["speaker"], "content": msg["content"], "timestamp": msg["timestamp"]}
+            for msg in self.pending_messages
+        ]
     
-    def search_similar_messages(self, query: str, limit: int = 10) -> List[Dict]:
-        """Search for semantically similar messages using vector similarity"""
+    def _pending_snapshot(self) -> List[Dict]:
+        """
+        Copy of the write queue for a read. Taken before the database is read,
+        so a flush running in between cannot hide a message from the read.
+        """
+        with self._write_lock:
+            return list(self.pending_messages)
+    
+    def _pending_matches(self, pending: List[Dict], filters: Dict[str, Any], source: str,
+                         query_embedding: Optional[np.ndarray] = None, query: str = "",
+                         fusion_weights: Optional[Tuple[float, float]] = None,
+                         substring: bool = False) -> List[Dict]:
+        """
+        Queued messages matching the search filters, scored on the scale of the
+        stored results they are merged with: 1 - L2 distance to query_embedding,
+        else relevance / (1 + relevance) with the number of query words a message
+        contains as its relevance, or 0.5 for containing the query with substring
+        (like the LIKE fallback). Given (vector, text) fusion_weights, both are
+        fused like hybrid_search does, ranking among the queued messages.
+        """
+        if filters.get("before_id") is not None:
+            return []  # Queued messages get ids after every stored one
+        speaker = filters.get("speaker")
+        speakers = None if speaker is None else ({speaker} if isinstance(speaker, str) else set(speaker))
+        since = _as_epoch(filters["since"]) if filters.get("since") is not None else None
+        until = _as_epoch(filters["until"]) if filters.get("until") is not None else None
+        words = set(re.findall(r"\w+", query.lower()))
+        
+        candidates = []
+        for msg in pending:
+            if speakers is not None and msg["speaker"] not in speakers:
+                continue
+            if filters.get("conversation_id") is not None and msg["conversation_id"] != filters["conversation_id"]:
+                continue
+            if (since is not None and msg["epoch"] < since) or (until is not None and msg["epoch"] >= until):
+                continue
+            distance = None
+            if query_embedding is not None and msg["embedding"] is not None:
+                distance = float(np.linalg.norm(msg["embedding"] - query_embedding))
+            matched = len(words & set(re.findall(r"\w+", msg["content"].lower())))
+            candidates.append((msg, distance, matched))
+        
+        results = []
+        if fusion_weights is not None:
+            vector_weight, text_weight = fusion_weights
+            best_score = (vector_weight + text_weight) / (self.rrf_k + 1) or 1.0
+            scores = [0.0] * len(candidates)
+            by_distance = sorted((i for i, c in enumerate(candidates) if c[1] is not None),
+                                 key=lambda i: candidates[i][1])
+            by_words = sorted((i for i, c in enumerate(candidates) if c[2]), key=lambda i: -candidates[i][2])
+            for position, i in enumerate(by_distance, 1):
+                scores[i] += vector_weight / (self.rrf_k + position)
+            for position, i in enumerate(by_words, 1):
+                scores[i] += text_weight / (self.rrf_k + position)
+            for (msg, distance, _), score in zip(candidates, scores):
+                if score > 0:
+                    results.append({
+                        "speaker": msg["speaker"],
+                        "content": msg["content"],
+                        "timestamp": msg["timestamp"],
+                        "similarity_score": score / best_score,
+                        "rrf_score": score,
+                        "vector_distance": distance,
+                        "bm25": None,
+                        "source": source
+                    })
+            return results
+        
+        for msg, distance, matched in candidates:
+            if query_embedding is not None:
+                if distance is None:
+                    continue
+                score = 1.0 - distance
+            elif substring:
+                if query.lower() not in msg["content"].lower():
+                    continue
+                score = 0.5
+            elif matched:
+                score = matched / (1.0 + matched)
+            else:
+                continue
+            results.append({
+                "speaker": msg["speaker"],
+                "content": msg["content"],
+                "timestamp": msg["timestamp"],
+                "similarity_score": score,
+                "source": source
+            })
+        return results
+    
+    @staticmethod
+    def _merge_pending(results: List[Dict], pending_results: List[Dict], limit: int) -> List[Dict]:
+        """Rank queued matches among the stored results, skipping any a concurrent flush already stored"""
+        if not pending_results:
+            return results
+        stored = {(r["speaker"], r["content"], r["timestamp"]) for r in results}
+        merged = results + [
+            r for r in pending_results if (r["speaker"], r["content"], r["timestamp"]) not in stored
+        ]
+        merged.sort(key=lambda r: r["similarity_score"], reverse=True)
+        return merged[:limit]
+    
+    def search_messages(self, query: str, max_results: int = 5, **filters) -> List[Dict]:
+        """Search for messages combining vector and full-text relevance"""
+        return self.hybrid_search(query, max_results, **filters)
+    
+    def search_similar_messages(self, query: str, limit: int = 10, **filters) -> List[Dict]:
+        """
+        Search for semantically similar messages using vector similarity
+        
+        Args:
+            query: Free text query
+            limit: Number of messages to return
+            **filters: speaker (name or list of names), conversation_id, since/until
+                (datetime or Unix time; until is exclusive) and before_id (only
+                messages older than this id). Filters are applied inside the KNN
+                query, so all limit results satisfy them.
+        """
+        _check_search_filters(filters)
         if not self.conn:
             # Fallback to simple memory
-            return self._basic_text_search(query, limit)
+            return self._basic_text_search(query, limit, **filters)
         
-        # Check if vector extension is available
-        if not getattr(self, 'vector_extension_available', False):
+        # Check if a vector engine is available
+        if not self._vector_search_available():
             # Fallback to basic text search
-            return self._basic_text_search(query, limit)
+            return self._basic_text_search(query, limit, **filters)
+        
+        # Queued messages are searched in memory instead of flushing them first
+        pending = self._pending_snapshot()
         
         try:
             # Generate query embedding
             query_embedding = self._generate_embedding(query)
-            if not query_embedding:
-                return []
-            
-            query_bytes = sqlite_vec.serialize_float32(query_embedding)
-            
-            cursor = self.conn.cursor()
-            
-            # Vector similarity search using sqlite-vec (with k constraint)
-            cursor.execute("""
-                SELECT 
-                    m.speaker,
-                    m.content,
-                    m.timestamp,
-                    v.distance
-                FROM message_vectors v
-                JOIN messages m ON v.message_id = m.id
-                WHERE v.embedding MATCH ? AND k = ?
-                ORDER BY v.distance
-            """, (query_bytes, limit))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    "speaker": row[0],
-                    "content": row[1],
-                    "timestamp": row[2],
-                    "similarity_score": 1.0 - row[3],  # Convert distance to similarity
-                    "source": "vector_search"
-                })
+            if query_embedding is None:
+                return self._basic_text_search(query, limit, **filters)
             
+            results = self._vector_search(query_embedding, limit, filters)
             self.stats["vector_searches"] += 1
-            return results
+            return self._merge_pending(
+                results, self._pending_matches(pending, filters, "vector_search", query_embedding), limit)
             
         except Exception as e:
             print(f"⚠️ Vector search failed: {e}")
             # Fallback to basic text search
-            return self._basic_text_search(query, limit)
+            return self._basic_text_search(query, limit, **filters)
+    
+    def _filter_conditions(self, filters: Dict[str, Any], id_column: str) -> Tuple[str, Dict[str, Any]]:
+        """
+        SQL conditions (each prefixed with AND) and named parameters for search filters.
+        The column names are shared by messages and the vec0 metadata columns.
+        """
+        _check_search_filters(filters)
+        conditions, params = [], {}
+        if self.shared_store:
+            # The partition key in vec0, the (clone_id, id) index in messages
+            conditions.append("clone_id = :clone_id")
+            params["clone_id"] = self.clone_id
+        speaker = filters.get("speaker")
+        if speaker is not None:
+            speakers = [speaker] if isinstance(speaker, str) else list(speaker)
+            names = [f"filter_speaker_{i}" for i in range(len(speakers))]
+            conditions.append(f"speaker IN ({', '.join(':' + name for name in names)})")
+            params.update(zip(names, speakers))
+        if filters.get("conversation_id") is not None:
+            conditions.append("conversation_id = :filter_conversation_id")
+            params["filter_conversation_id"] = filters["conversation_id"]
+        if filters.get("since") is not None:
+            conditions.append("epoch >= :filter_since")
+            params["filter_since"] = _as_epoch(filters["since"])
+        if filters.get("until") is not None:
+            conditions.append("epoch < :filter_until")
+            params["filter_until"] = _as_epoch(filters["until"])
+        if filters.get("before_id") is not None:
+            conditions.append(f"{id_column} < :filter_before_id")
+            params["filter_before_id"] = int(filters["before_id"])
+        
+        return "".join(f" AND {condition}" for condition in conditions), params
+    
+    def _vector_search(self, query_embedding: np.ndarray, limit: int,
+                       filters: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """KNN lookup in the vec0 index (or the index replacing it), with filters on the metadata columns"""
+        neighbors = self._external_knn(query_embedding, limit, filters or {})
+        if neighbors is not None:
+            return self._neighbor_messages(neighbors)
+        
+        conditions, params = self._filter_conditions(filters or {}, "message_id")
+        cursor = self.conn.cursor()
+        
+        # Vector similarity search using sqlite-vec (with k constraint)
+        cursor.execute(f"""
+            WITH knn AS ({self._nearest_vectors_sql(conditions)}
+            )
+            SELECT 
+                m.speaker,
+                m.content,
+                m.timestamp,
+                knn.distance
+            FROM knn
+            JOIN messages m ON knn.message_id = m.id
+            ORDER BY knn.distance
+        """, {**self._knn_params(query_embedding, limit), **params})
+        
+        results = []
+        for row in cursor.fetchall():
+            results.append({
+                "speaker": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "similarity_score": 1.0 - row[3],  # Convert distance to similarity
+                "source": "vector_search"
+            })
+        return results
+    
+    def _sharded_knn(self, query_embedding: np.ndarray, k: int,
+                     filters: Dict[str, Any]) -> List[Tuple[int, float]]:
+        """k nearest (message_id, distance) pairs, searched on all shards in parallel"""
+        conditions, params = self._filter_conditions(filters, "message_id")
+        since, until = filters.get("since"), filters.get("until")
+        shard_indexes = self.vector_shard_set.shards_for_range(
+            _as_epoch(since) if since is not None else None,
+            _as_epoch(until) if until is not None else None
+        )
+        knn_params = self._knn_params(query_embedding, k)
+        if self._index_is_exact():
+            return self.vector_shard_set.knn(self._nearest_vectors_sql(conditions),
+                                             {**knn_params, **params}, k, shard_indexes)
+        
+        # Shards only hold the reduced vectors: merge their candidates, then
+        # re-rank them against the float embeddings in the clone's database
+        candidates = self.vector_shard_set.knn(f"""
+            SELECT message_id, distance
+            FROM message_vectors
+            WHERE embedding MATCH {self._index_vector(":embedding")} AND k = :candidates{conditions}
+        """, {**knn_params, **params}, knn_params["candidates"], shard_indexes)
+        return self.conn.execute("""
+            SELECT id, vec_distance_l2(embedding, :embedding) AS distance
+            FROM messages
+            WHERE id IN (SELECT value FROM json_each(:ids))
+            ORDER BY distance
+            LIMIT :k
+        """, {**knn_params, "ids": json.dumps([message_id for message_id, _ in candidates])}).fetchall()
+    
+    def _external_knn(self, query_embedding: np.ndarray, k: int,
+                      filters: Dict[str, Any]) -> Optional[List[Tuple[int, float]]]:
+        """
+        k nearest (message_id, distance) pairs from an index outside the clone's
+        vec0 table: the IVF index, the vector matrix or the vector shards.
+        None when the search should run on the vec0 table.
+        """
+        neighbors = self._ann_knn(query_embedding, k, filters)
+        if neighbors is None and self.vector_matrix is not None:
+            neighbors = self._matrix_knn(query_embedding[None, :], k, filters)[0]
+        if neighbors is None and self.vector_shard_set:
+            neighbors = self._sharded_knn(query_embedding, k, filters)
+        return neighbors
+    
+    def _matrix_knn(self, query_embeddings: np.ndarray, k: int,
+                    filters: Dict[str, Any]) -> List[List[Tuple[int, float]]]:
+        """
+        Exact k nearest (message_id, distance) pairs from the vector matrix,
+        for each row of query_embeddings. The matrix holds no metadata: speaker,
+        conversation and time filters become an allow-list of ids read from messages.
+        """
+        before_id = filters.get("before_id")
+        allowed_ids = None
+        metadata_filters = {name: value for name, value in filters.items() if name != "before_id"}
+        if any(value is not None for value in metadata_filters.values()):
+            conditions, params = self._filter_conditions(metadata_filters, "id")
+            allowed_ids = np.array([row[0] for row in self.conn.execute(
+                f"SELECT id FROM messages WHERE embedding IS NOT NULL{conditions}", params)], dtype=np.int64)
+        return self.vector_matrix.search_many(query_embeddings, k,
+                                              int(before_id) if before_id is not None else None, allowed_ids)
+    
+    def _ann_knn(self, query_embedding: np.ndarray, k: int,
+                 filters: Dict[str, Any]) -> Optional[List[Tuple[int, float]]]:
+        """
+        Approximate k nearest (message_id, distance) pairs from the IVF index,
+        or None when there is no index or the search filters on metadata it
+        does not hold (only before_id is supported)
+        """
+        if not self._ann_can_answer(filters):
+            return None
+        before_id = filters.get("before_id")
+        self.stats["ann_searches"] += 1
+        return self.ann_index.search(query_embedding, k, self.ann_nprobe,
+                                     int(before_id) if before_id is not None else None)
+    
+    def _ann_can_answer(self, filters: Dict[str, Any]) -> bool:
+        """Whether the IVF index exists and holds what the filters need (only before_id)"""
+        return self.ann_index is not None and not any(
+            filters.get(name) is not None for name in SEARCH_FILTERS if name != "before_id")
+    
+    def _messages_by_id(self, message_ids: Iterable[int]) -> Dict[int, Tuple]:
+        """(speaker, content, timestamp) of messages, by id"""
+        return {row[0]: row[1:] for row in self.conn.execute("""
+            SELECT id, speaker, content, timestamp FROM messages
+            WHERE id IN (SELECT value FROM json_each(?))
+        """, (json.dumps(list(message_ids)),))}
+    
+    def _neighbor_messages(self, neighbors: List[Tuple[int, float]],
+                           rows: Optional[Dict[int, Tuple]] = None) -> List[Dict]:
+        """Read the messages of (message_id, distance) pairs from the clone's database"""
+        if rows is None:
+            rows = self._messages_by_id(message_id for message_id, _ in neighbors)
+        
+        return [
+            {
+                "speaker": rows[message_id][0],
+                "content": rows[message_id][1],
+                "timestamp": rows[message_id][2],
+                "similarity_score": 1.0 - distance,
+                "source": "vector_search"
+            }
+            for message_id, distance in neighbors if message_id in rows
+        ]
+    
+    def search_many(self, queries: List[str], limit: int = 10, **filters) -> List[List[Dict]]:
+        """
+        Vector search for several queries at once
+        
+        All queries are embedded in one batch and searched together: one
+        matrix-matrix product on the mmap engine, one SQL statement (a KNN
+        subquery per query) on vec0. The IVF index and vector shards are
+        searched per query. Messages are read once for all results.
+        
+        Args:
+            queries: Free text queries
+            limit: Number of messages per query
+            **filters: Same filters as search_similar_messages, applied to every query
+        
+        Returns:
+            List[List[Dict]]: Results of each query, in query order, shaped like
+                those of search_similar_messages
+        """
+        _check_search_filters(filters)
+        if not queries:
+            return []
+        if not self.conn or not self._vector_search_available():
+            return [self._basic_text_search(query, limit, **filters) for query in queries]
+        
+        pending = self._pending_snapshot()
+        try:
+            embeddings = self._embed_contents(list(queries))
+            embedded = [i for i, embedding in enumerate(embeddings) if embedding is not None]
+            neighbors = self._knn_many([embeddings[i] for i in embedded], limit, filters) if embedded else []
+            rows = self._messages_by_id({message_id for pairs in neighbors for message_id, _ in pairs})
+            
+            results = [None] * len(queries)
+            for i, pairs in zip(embedded, neighbors):
+                results[i] = self._merge_pending(
+                    self._neighbor_messages(pairs, rows),
+                    self._pending_matches(pending, filters, "vector_search", embeddings[i]), limit)
+            self.stats["vector_searches"] += len(embedded)
+            return [
+                found if found is not None else self._basic_text_search(query, limit, **filters)
+                for query, found in zip(queries, results)
+            ]
+        except Exception as e:
+            print(f"⚠️ Batched vector search failed: {e}")
+            return [self._basic_text_search(query, limit, **filters) for query in queries]
+    
+    def _knn_many(self, query_embeddings: List[np.ndarray], k: int,
+                  filters: Dict[str, Any]) -> List[List[Tuple[int, float]]]:
+        """k nearest (message_id, distance) pairs for each query, batched where the index allows"""
+        if self._ann_can_answer(filters) or (self.vector_matrix is None and self.vector_shard_set):
+            # IVF probes and shard fan-outs are chosen per query
+            return [self._external_knn(embedding, k, filters) for embedding in query_embeddings]
+        if self.vector_matrix is not None:
+            return self._matrix_knn(np.stack(query_embeddings), k, filters)
+        
+        conditions, params = self._filter_conditions(filters, "message_id")
+        params.update(self._knn_params(query_embeddings[0], k))
+        results: List[List[Tuple[int, float]]] = [[] for _ in query_embeddings]
+        for start in range(0, len(query_embeddings), MAX_QUERIES_PER_STATEMENT):
+            chunk = query_embeddings[start:start + MAX_QUERIES_PER_STATEMENT]
+            subqueries = " UNION ALL ".join(
+                f"SELECT {i} AS query, message_id, distance "
+                f"FROM ({self._nearest_vectors_sql(conditions, f':embedding_{i}')})"
+                for i in range(len(chunk))
+            )
+            params.update({f"embedding_{i}": serialize_embedding(embedding) for i, embedding in enumerate(chunk)})
+            for query, message_id, distance in self.conn.execute(
+                    f"{subqueries} ORDER BY query, distance", params):
+                results[start + query].append((message_id, distance))
+        return results
+    
+    def hybrid_search(self, query: str, limit: int = 10, candidate_depth: Optional[int] = None,
+                      vector_weight: Optional[float] = None,
+                      text_weight: Optional[float] = None,
+                      query_embedding: Optional[np.ndarray] = None, **filters) -> List[Dict]:
+        """
+        Retrieve messages by fusing vector KNN and BM25 full-text rankings
+        
+        Both candidate lists are generated and fused with weighted reciprocal rank
+        fusion, score = sum(weight / (rrf_k + rank)), in a single SQL statement.
+        When only one signal is available (basic mode, no embedding, or no
+        searchable words) its ranking is returned directly.
+        
+        Args:
+            query: Free text query
+            limit: Number of messages to return
+            candidate_depth: Candidates taken from each signal (default hybrid_candidate_depth)
+            vector_weight: Weight of the vector ranking (default hybrid_vector_weight)
+            text_weight: Weight of the full-text ranking (default hybrid_text_weight)
+            query_embedding: Embedding of query, if the caller already computed it
+            **filters: Same filters as search_similar_messages, applied to both signals
+        
+        Returns:
+            List[Dict]: Messages ordered by fused relevance
+        """
+        _check_search_filters(filters)
+        if not self.conn:
+            return []
+        
+        pending = self._pending_snapshot()
+        
+        match_expression = build_fts_query(query) if self.fts_available else ""
+        if not self._vector_search_available():
+            query_embedding = None
+        elif query_embedding is None:
+            query_embedding = self._generate_embedding(query)
+        
+        try:
+            if query_embedding is None:
+                return self._basic_text_search(query, limit, **filters)
+            if not match_expression:
+                results = self._vector_search(query_embedding, limit, filters)
+                self.stats["vector_searches"] += 1
+                return self._merge_pending(
+                    results, self._pending_matches(pending, filters, "vector_search", query_embedding), limit)
+            weights = (self.hybrid_vector_weight if vector_weight is None else vector_weight,
+                       self.hybrid_text_weight if text_weight is None else text_weight)
+            results = self._fused_search(
+                query_embedding, match_expression, limit,
+                candidate_depth or max(self.hybrid_candidate_depth, limit),
+                *weights, filters
+            )
+            self.stats["vector_searches"] += 1
+            return self._merge_pending(results, self._pending_matches(
+                pending, filters, "hybrid_search", query_embedding, query, fusion_weights=weights), limit)
+        except Exception as e:
+            print(f"⚠️ Hybrid search failed: {e}")
+            return self._basic_text_search(query, limit, **filters)
+    
+    def _fused_search(self, query_embedding: np.ndarray, match_expression: str, limit: int,
+                      depth: int, vector_weight: float, text_weight: float,
+                      filters: Dict[str, Any]) -> List[Dict]:
+        """Reciprocal rank fusion of vec0 and FTS5 candidates in one round-trip"""
+        vector_conditions, params = self._filter_conditions(filters, "message_id")
+        text_conditions, _ = self._filter_conditions(filters, "id")
+        neighbors = self._external_knn(query_embedding, depth, filters)
+        if neighbors is not None:
+            # Candidates found outside the vec0 table are passed in as a JSON array
+            params["vector_candidates"] = json.dumps(neighbors)
+            vector_candidates = """
+                SELECT json_extract(value, '$[0]') AS message_id,
+                       key + 1 AS position,
+                       json_extract(value, '$[1]') AS distance
+                FROM json_each(:vector_candidates)"""
+        else:
+            params.update(self._knn_params(query_embedding, depth))
+            vector_candidates = f"""
+                SELECT message_id,
+                       row_number() OVER (ORDER BY distance) AS position,
+                       distance
+                FROM ({self._nearest_vectors_sql(vector_conditions)})"""
+        cursor = self.conn.cursor()
+        cursor.execute(f"""
+            WITH vector_candidates AS MATERIALIZED ({vector_candidates}
+            ),
+            text_candidates AS MATERIALIZED (
+                SELECT messages_fts.rowid AS message_id,
+                       row_number() OVER (ORDER BY messages_fts.rank) AS position,
+                       messages_fts.rank AS bm25
+                FROM messages_fts
+                JOIN messages ON messages.id = messages_fts.rowid
+                WHERE messages_fts MATCH :match{text_conditions}
+                ORDER BY messages_fts.rank
+                LIMIT :depth
+            ),
+            fused AS (
+                SELECT message_id,
+                       SUM(score) AS score,
+                       MIN(distance) AS distance,
+                       MIN(bm25) AS bm25
+                FROM (
+                    SELECT message_id, :vector_weight / (:rrf_k + position) AS score,
+                           distance, NULL AS bm25
+                    FROM vector_candidates
+                    UNION ALL
+                    SELECT message_id, :text_weight / (:rrf_k + position) AS score,
+                           NULL AS distance, bm25
+                    FROM text_candidates
+                )
+                GROUP BY message_id
+                HAVING SUM(score) > 0
+            )
+            SELECT m.speaker, m.content, m.timestamp, f.score, f.distance, f.bm25
+            FROM fused f
+            JOIN messages m ON m.id = f.message_id
+            ORDER BY f.score DESC, m.id DESC
+            LIMIT :limit
+        """, {
+            "match": match_expression,
+            "depth": depth,
+            "limit": limit,
+            "rrf_k": float(self.rrf_k),
+            "vector_weight": float(vector_weight),
+            "text_weight": float(text_weight),
+            **params
+        })
+        
+        # Best possible score: ranked first by every signal
+        best_score = (vector_weight + text_weight) / (self.rrf_k + 1) or 1.0
+        results = []
+        for row in cursor.fetchall():
+            results.append({
+                "speaker": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "similarity_score": row[3] / best_score,
+                "rrf_score": row[3],
+                "vector_distance": row[4],
+                "bm25": row[5],
+                "source": "hybrid_search"
+            })
+        return results
     
     def get_smart_context(self, message: str, max_total: int = 8) -> str:
         """Get intelligent context combining recent messages and semantically similar past messages"""
         try:
             # Get recent messages first
-            recent_messages = self._get_recent_messages(min(5, max_total))
+            recent_messages, window_start = self._recent_window(min(5, max_total))
             
-            # Get semantically similar messages for the remaining slots
+            # Get semantically similar messages for the remaining slots. Only messages
+            # older than the recent window are searched, so no slot repeats one of them.
             remaining_slots = max_total - len(recent_messages)
             similar_messages = []
             
-            if remaining_slots > 0:
-                similar_messages = self.search_similar_messages(message, remaining_slots)
+            if remaining_slots > 0 and recent_messages:
+                if window_start is not None:
+                    similar_messages = self._tiered_search(message, remaining_slots, before_id=window_start)
+                else:
+                    # The whole window is still queued, so it has no id to search before
+                    window = {(m["speaker"], m["content"], m["timestamp"]) for m in recent_messages}
+                    similar_messages = [
+                        m for m in self._tiered_search(message, remaining_slots + len(recent_messages))
+                        if (m["speaker"], m["content"], m["timestamp"]) not in window
+                    ][:remaining_slots]
             
             # Combine and format
             all_messages = similar_messages + recent_messages
@@ -344,54 +1708,101 @@ class SqliteVecMemory:
             # Fallback to basic text search
             return self._get_recent_messages(max_total)
     
+    def _tiered_search(self, query: str, limit: int, **filters) -> List[Dict]:
+        """
+        Search the hot tier first; fall back to the cold tier (hybrid search over
+        the whole database) unless the best hot match reaches hot_similarity_threshold
+        and the hot tier fills every slot
+        """
+        query_embedding = None
+        if self.hot_tier is not None:
+            query_embedding = self._generate_embedding(query)
+        if query_embedding is not None:
+            hot_filters = dict(filters)
+            for key in ("since", "until"):
+                if hot_filters.get(key) is not None:
+                    hot_filters[key] = _as_epoch(hot_filters[key])
+            results = self.hot_tier.search(query_embedding, limit, hot_filters)
+            if len(results) == limit and results[0]["similarity_score"] >= self.hot_similarity_threshold:
+                self.stats["hot_tier_hits"] += 1
+                return results
+        
+        self.stats["cold_tier_searches"] += 1
+        return self.hybrid_search(query, limit, query_embedding=query_embedding, **filters)
+    
     def get_context(self, max_messages: int = 10) -> str:
         """Get recent conversation context (alias for compatibility)"""
         return self._get_recent_messages(max_messages)
     
     def _get_recent_messages(self, limit: int = 10) -> List[Dict]:
-        """Get recent messages from database"""
+        """Get recent messages from database, including ones still in the write queue"""
+        return self._recent_window(limit)[0]
+    
+    def _recent_window(self, limit: int) -> Tuple[List[Dict], Optional[int]]:
+        """
+        The newest messages in chronological order, including ones still in the
+        write queue, and the id of the oldest stored one among them (None if
+        all of them are queued)
+        """
         if not self.conn:
-            return []
+            return [], None
         
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT speaker, content, timestamp
-                FROM messages
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (limit,))
-            
-            results = []
-            for row in cursor.fetchall():
-                results.append({
-                    "speaker": row[0],
-                    "content": row[1],
-                    "timestamp": row[2]
-                })
+            # Held across the read so a flush cannot move messages between queue and table
+            with self._write_lock:
+                pending = self._pending_as_results()[-limit:] if limit > 0 else []
+                remaining = limit - len(pending)
+                
+                rows = []
+                if remaining > 0:
+                    # Ids are assigned in insertion order, so the primary key b-tree
+                    # yields the newest rows directly without scanning or sorting
+                    rows = self.conn.execute(f"""
+                        SELECT id, speaker, content, timestamp
+                        FROM messages{self._clone_scope()}
+                        ORDER BY id DESC
+                        LIMIT :limit
+                    """, {"limit": remaining, "clone_id": self.clone_id}).fetchall()
             
-            return list(reversed(results))  # Return in chronological order
+            results = [
+                {"speaker": row[1], "content": row[2], "timestamp": row[3]}
+                for row in reversed(rows)
+            ]
+            window_start = rows[-1][0] if rows else None
+            return results + pending, window_start  # Return in chronological order
             
         except Exception as e:
             print(f"⚠️ Error getting recent messages: {e}")
-            return []
+            return [], None
     
-    def _basic_text_search(self, query: str, limit: int = 10) -> List[Dict]:
-        """Basic text search fallback when vector search is not available"""
+    def _basic_text_search(self, query: str, limit: int = 10, **filters) -> List[Dict]:
+        """Text search fallback when vector search is not available (BM25 ranked when possible)"""
         if not self.conn:
             return []
         
+        pending = self._pending_snapshot()
+        conditions, params = self._filter_conditions(filters, "id")
+        
+        match_expression = build_fts_query(query)
+        if self.fts_available and match_expression:
+            try:
+                return self._merge_pending(
+                    self._fts_search(match_expression, limit, conditions, params),
+                    self._pending_matches(pending, filters, "fts_search", query=query), limit)
+            except Exception as e:
+                print(f"⚠️ Full-text search failed: {e}")
+        
         try:
             cursor = self.conn.cursor()
             
             # Simple text search using LIKE operator
-            cursor.execute("""
+            cursor.execute(f"""
                 SELECT speaker, content, timestamp
                 FROM messages
-                WHERE content LIKE ?
-                ORDER BY timestamp DESC
-                LIMIT ?
-            """, (f"%{query}%", limit))
+                WHERE content LIKE :pattern{conditions}
+                ORDER BY id DESC
+                LIMIT :limit
+            """, {"pattern": f"%{query}%", "limit": limit, **params})
             
             results = []
             for row in cursor.fetchall():
@@ -403,29 +1814,62 @@ class SqliteVecMemory:
                     "source": "text_search"
                 })
             
-            return results
+            return self._merge_pending(
+                results, self._pending_matches(pending, filters, "text_search", query=query, substring=True), limit)
             
         except Exception as e:
             print(f"Error in basic text search: {e}")
             return []
     
+    def _fts_search(self, match_expression: str, limit: int, conditions: str = "",
+                    params: Optional[Dict[str, Any]] = None) -> List[Dict]:
+        """BM25-ranked lookup in the FTS5 index"""
+        cursor = self.conn.cursor()
+        # ORDER BY rank lets FTS5 rank with bm25 without sorting every match
+        cursor.execute(f"""
+            SELECT messages.speaker, messages.content, messages.timestamp, messages_fts.rank
+            FROM messages_fts
+            JOIN messages ON messages.id = messages_fts.rowid
+            WHERE messages_fts MATCH :match{conditions}
+            ORDER BY messages_fts.rank
+            LIMIT :limit
+        """, {"match": match_expression, "limit": limit, **(params or {})})
+        
+        results = []
+        for row in cursor.fetchall():
+            relevance = -row[3]  # bm25 is negative; more negative is better
+            results.append({
+                "speaker": row[0],
+                "content": row[1],
+                "timestamp": row[2],
+                "similarity_score": relevance / (1.0 + relevance),
+                "bm25": row[3],
+                "source": "fts_search"
+            })
+        return results
+    
     def get_conversation_summary(self) -> str:
         """Get a summary of the conversation"""
         if not self.conn:
             return "Vector memory not available"
         
         try:
-            cursor = self.conn.cursor()
-            cursor.execute("""
-                SELECT COUNT(*) as total,
-                       MIN(timestamp) as first_message,
-                       MAX(timestamp) as last_message
-                FROM messages
-            """)
+            with self._write_lock:
+                pending = [msg["timestamp"] for msg in self.pending_messages]
+                cursor = self.conn.cursor()
+                cursor.execute(f"""
+                    SELECT COUNT(*) as total,
+                           MIN(timestamp) as first_message,
+                           MAX(timestamp) as last_message
+                    FROM messages{self._clone_scope()}
+                """, {"clone_id": self.clone_id})
+                row = cursor.fetchone()
             
-            row = cursor.fetchone()
-            if row and row[0] > 0:
-                total, first, last = row
+            total = (row[0] if row else 0) + len(pending)
+            if total > 0:
+                # Queued messages are newer than every stored one
+                first = row[1] if row and row[0] else pending[0]
+                last = pending[-1] if pending else row[2]
                 first_time = datetime.fromisoformat(first).strftime("%Y-%m-%d %H:%M")
                 last_time = datetime.fromisoformat(last).strftime("%Y-%m-%d %H:%M")
                 
@@ -439,18 +1883,34 @@ class SqliteVecMemory:
     def get_memory_stats(self) -> Dict[str, Any]:
         """Get memory system statistics"""
         base_stats = self.stats.copy()
+        base_stats["embedding_cache"] = self.embedding_cache.get_stats()
         
         if self.conn:
             try:
-                cursor = self.conn.cursor()
-                
-                # Get message count
-                cursor.execute("SELECT COUNT(*) FROM messages")
-                base_stats["total_messages"] = cursor.fetchone()[0]
-                
-                # Get vector count
-                cursor.execute("SELECT COUNT(*) FROM message_vectors")
-                base_stats["vector_embeddings"] = cursor.fetchone()[0]
+                # Queued messages are counted rather than written first; the lock keeps
+                # a flush from moving them between queue and table while counting
+                with self._write_lock:
+                    pending = len(self.pending_messages)
+                    queued_vectors = sum(msg["embedding"] is not None for msg in self.pending_messages)
+                    cursor = self.conn.cursor()
+                    
+                    # Get message count
+                    scope = {"clone_id": self.clone_id}
+                    cursor.execute(f"SELECT COUNT(*) FROM messages{self._clone_scope()}", scope)
+                    base_stats["total_messages"] = cursor.fetchone()[0] + pending
+                    base_stats["pending_messages"] = pending
+                    
+                    # Get vector count
+                    if self.vector_matrix is not None:
+                        base_stats["vector_matrix"] = self.vector_matrix.get_stats()
+                        vectors = len(self.vector_matrix)
+                    elif self.vector_shard_set:
+                        base_stats["vector_shards"] = self.vector_shard_set.get_stats()
+                        vectors = sum(base_stats["vector_shards"]["vectors_per_shard"])
+                    else:
+                        cursor.execute(f"SELECT COUNT(*) FROM message_vectors{self._clone_scope()}", scope)
+                        vectors = cursor.fetchone()[0]
+                    base_stats["vector_embeddings"] = vectors + queued_vectors
                 
                 # Get database size
                 cursor.execute("SELECT page_count * page_size FROM pragma_page_count(), pragma_page_size()")
@@ -461,25 +1921,119 @@ class SqliteVecMemory:
         
         base_stats["memory_type"] = "sqlite_vec"
         base_stats["embedding_dimension"] = self.embedding_dim
+        base_stats["vector_engine"] = self.vector_engine
+        base_stats["vector_quantization"] = self.vector_quantization
+        base_stats["index_dimension"] = self.index_dim
+        base_stats["embedding_backend"] = self.embedder.name
+        base_stats["embedding_model"] = self.embedder.model
+        if self.shared_cache:
+            base_stats["shared_embedding_cache"] = self.shared_cache.get_stats()
         base_stats["database_file"] = self.db_file
+        if self.hot_tier is not None:
+            base_stats["hot_tier"] = self.hot_tier.get_stats()
+        if self.ann_index is not None:
+            base_stats["ann_index"] = self.ann_index.get_stats()
+        if self.shared_store:
+            base_stats["shared_store"] = get_connection_pool().get_stats()
+        if self.conn:
+            base_stats["schema_version"] = get_schema_version(self.conn)
+        base_stats["connection_profile"] = self.connection_profile
+        base_stats["connection_settings"] = self.connection_settings
         
         return base_stats
     
     def save_memory(self):
-        """Save memory data (SQLite auto-saves, but we can optimize/vacuum)"""
+        """Save memory data: write pending messages and run a bounded maintenance step"""
         # Process any pending batch operations
-        if self.pending_messages:
-            self._process_batch()
+        self.flush()
+        self._persist_ann_index()
+        self.run_maintenance()
+    
+    def run_maintenance(self) -> Dict[str, Any]:
+        """Refresh planner statistics and release free pages incrementally"""
+        if not self.conn:
+            return {}
         
-        if self.conn:
-            try:
-                self.conn.execute("VACUUM")
-                self.conn.commit()
-            except Exception as e:
-                print(f"⚠️ Error optimizing database: {e}")
+        try:
+            with self._write_lock:
+                report = run_incremental_maintenance(self.conn, self.max_free_pages,
+                                                     self.vacuum_pages_per_step)
+            self.stats["last_maintenance"] = datetime.now().isoformat()
+            return report
+        except Exception as e:
+            print(f"⚠️ Error optimizing database: {e}")
+            return {}
+    
+    def enable_incremental_vacuum(self) -> bool:
+        """One-off conversion of an older database to auto_vacuum=INCREMENTAL (runs one VACUUM)"""
+        if not self.conn:
+            return False
+        self.flush()
+        with self._write_lock:
+            return enable_incremental_vacuum(self.conn)
+    
+    def start_background_maintenance(self, interval: float = 300.0):
+        """Run maintenance every interval seconds on a background thread"""
+        if self.maintenance_scheduler is None:
+            self.maintenance_scheduler = MaintenanceScheduler(
+                self._run_scheduled_maintenance, interval, name=f"{self.clone_name}-maintenance")
+        self.maintenance_scheduler.interval = interval
+        if self.maintenance_scheduler.running:
+            # Wake the thread so it waits with the new interval
+            self.maintenance_scheduler.run_soon()
+        else:
+            self.maintenance_scheduler.start()
+    
+    def _run_scheduled_maintenance(self):
+        """Background maintenance: IVF index training, then the database steps of run_maintenance()"""
+        self._maintain_ann_index()
+        self.run_maintenance()
+    
+    def stop_background_maintenance(self):
+        """Stop the background maintenance thread"""
+        if self.maintenance_scheduler is not None:
+            self.maintenance_scheduler.stop()
     
     def close(self):
-        """Close database connection"""
+        """Flush queued messages and close database connection"""
         if self.conn:
-            self.conn.close()
-            self.conn = None 
\ No newline at end of file
+            self.flush()
+        # After the last flush, which may have requested an index build
+        self.stop_background_maintenance()
+        # An index build still running past the stop timeout must not see a half-closed connection
+        with self._write_lock:
+            if self.conn:
+                self._persist_ann_index()
+                if self.vector_shard_set:
+                    self.vector_shard_set.close()
+                    self.vector_shard_set = None
+                if self._pooled:
+                    # The last clone using the shared connection closes it
+                    get_connection_pool().release(self._pooled, closer=_optimize_before_close)
+                    self._pooled = None
+                else:
+                    _optimize_before_close(self.conn)
+                    self.conn.close()
+                self.conn = None
+        _open_memories.discard(self)
+
+
+def _optimize_before_close(conn: sqlite3.Connection):
+    try:
+        conn.execute("PRAGMA optimize")
+    except Exception:
+        pass
+
+
+# Memories with an open connection, flushed at interpreter exit so queued
+# messages are not lost when a program forgets to call close()
+_open_memories = weakref.WeakSet()
+
+
+@atexit.register
+def _flush_open_memories():
+    for memory in list(_open_memories):
+        try:
+            memory.flush()
+        except Exception as e:
+            print(f"⚠️ Error flushing {memory.clone_name} vector memory: {e}") 
\ No newline at end of file
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Memory-Mapped Vector Matrix
+An alternative to the vec0 index: a clone's embeddings are appended to a raw
+float32 matrix file with a sidecar of message ids, both memory-mapped, and a
+KNN search is one NumPy matrix-vector product plus argpartition
+Opening a clone maps the files without reading them, and the product runs in
+BLAS over the mapped pages instead of row by row through SQL
+"""
+
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MATRIX_SUFFIX = ".f32"
+IDS_SUFFIX = ".ids"
+
+# Rows per block when computing the cached row norms and when searching
+# (a search block holds one score per query and row)
+NORM_BLOCK_ROWS = 65536
+SEARCH_BLOCK_ROWS = 65536
+
+
+def matrix_files(base_path: str) -> Tuple[str, str]:
+    """Matrix and id sidecar files for a base path (the database path without .db)"""
+    return f"{base_path}{MATRIX_SUFFIX}", f"{base_path}{IDS_SUFFIX}"
+
+
+def remove_matrix_files(base_path: str) -> bool:
+    """Delete a clone's matrix and id sidecar; True if anything was removed"""
+    removed = False
+    for path in matrix_files(base_path):
+        if os.path.exists(path):
+            os.remove(path)
+            removed = True
+    return removed
+
+
+class VectorMatrix:
+    """
+    Append-only (id, embedding) rows in two files: row i of the matrix holds
+    the embedding of the message whose id is entry i of the sidecar.
+    The sidecar is written after the matrix, so its length decides how many
+    rows exist; a torn append is trimmed when the files are opened.
+    Rows are appended in message id order.
+    """
+
+    def __init__(self, base_path: str, embedding_dim: int):
+        """
+        Open (creating if needed) the matrix of a clone
+
+        Args:
+            base_path: Path prefix; files are base_path.f32 and base_path.ids
+            embedding_dim: Dimension of the stored embeddings
+        """
+        self.matrix_file, self.ids_file = matrix_files(base_path)
+        self.embedding_dim = embedding_dim
+        self.row_bytes = embedding_dim * 4
+        self._lock = threading.Lock()
+        for path in (self.matrix_file, self.ids_file):
+            if not os.path.exists(path):
+                open(path, "wb").close()
+        self._trim()
+        self._map()
+
+    def _trim(self):
+        """Cut both files to the rows present in both (recovers from interrupted appends)"""
+        rows = min(os.path.getsize(self.matrix_file) // self.row_bytes,
+                   os.path.getsize(self.ids_file) // 8)
+        for path, size in ((self.matrix_file, rows * self.row_bytes), (self.ids_file, rows * 8)):
+            if os.path.getsize(path) != size:
+                os.truncate(path, size)
+
+    def _map(self):
+        """Map the files as they are on disk (nothing is read until a search touches the pages)"""
+        rows = os.path.getsize(self.ids_file) // 8
+        if rows:
+            self._vectors = np.memmap(self.matrix_file, dtype=np.float32, mode="r",
+                                      shape=(rows, self.embedding_dim))
+            self._ids = np.memmap(self.ids_file, dtype=np.int64, mode="r", shape=(rows,))
+        else:
+            self._vectors = np.empty((0, self.embedding_dim), dtype=np.float32)
+            self._ids = np.empty(0, dtype=np.int64)
+        self._norms = None  # Squared row norms, computed by the first search
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def max_id(self) -> int:
+        """Id of the last row (0 when empty)"""
+        return int(self._ids[-1]) if len(self._ids) else 0
+
+    def append(self, ids: Sequence[int], vectors: Sequence[np.ndarray]) -> int:
+        """
+        Append rows to the end of the matrix
+
+        Args:
+            ids: Message ids, greater than every stored id
+            vectors: Embeddings, one per id
+
+        Returns:
+            int: Rows appended
+        """
+        if not len(ids):
+            return 0
+        block = np.ascontiguousarray(np.stack(vectors), dtype=np.float32)
+        with self._lock:
+            with open(self.matrix_file, "ab") as f:
+                f.write(block.tobytes())
+            with open(self.ids_file, "ab") as f:
+                f.write(np.asarray(ids, dtype=np.int64).tobytes())
+            norms = self._norms
+            self._map()
+            if norms is not None:
+                self._norms = np.concatenate([norms, np.einsum("ij,ij->i", block, block)])
+        return len(ids)
+
+    def rebuild(self, rows: Iterable[Tuple[int, bytes]], chunk_size: int) -> int:
+        """
+        Rewrite the matrix from (id, float32 blob) rows in id order
+
+        New files are written next to the old ones and swapped in, so searches
+        holding the old mapping keep reading valid pages.
+
+        Returns:
+            int: Rows written
+        """
+        with self._lock:
+            written = 0
+            temp_files = (f"{self.matrix_file}.tmp", f"{self.ids_file}.tmp")
+            with open(temp_files[0], "wb") as matrix, open(temp_files[1], "wb") as ids:
+                chunk: List[Tuple[int, bytes]] = []
+                for row in rows:
+                    chunk.append(row)
+                    if len(chunk) >= chunk_size:
+                        written += self._write_chunk(matrix, ids, chunk)
+                        chunk = []
+                written += self._write_chunk(matrix, ids, chunk)
+            os.replace(temp_files[0], self.matrix_file)
+            os.replace(temp_files[1], self.ids_file)
+            self._map()
+            return written
+
+    @staticmethod
+    def _write_chunk(matrix, ids, chunk: List[Tuple[int, bytes]]) -> int:
+        matrix.write(b"".join(blob for _, blob in chunk))
+        ids.write(np.array([message_id for message_id, _ in chunk], dtype=np.int64).tobytes())
+        return len(chunk)
+
+    def _row_norms(self) -> np.ndarray:
+        if self._norms is None:
+            vectors = self._vectors
+            self._norms = np.concatenate([
+                np.einsum("ij,ij->i", vectors[start:start + NORM_BLOCK_ROWS], vectors[start:start + NORM_BLOCK_ROWS])
+                for start in range(0, len(vectors), NORM_BLOCK_ROWS)
+            ] or [np.empty(0, dtype=np.float32)])
+        return self._norms
+
+    def search(self, query: np.ndarray, k: int, before_id: Optional[int] = None,
+               allowed_ids: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Exact k nearest rows by L2 distance
+
+        Args:
+            query: Query vector
+            k: Neighbors to return
+            before_id: Only rows whose id is below this one
+            allowed_ids: Only rows whose id is in this array
+
+        Returns:
+            List[Tuple[int, float]]: (id, L2 distance) pairs, nearest first
+        """
+        return self.search_many(np.asarray(query)[None, :], k, before_id, allowed_ids)[0]
+
+    def search_many(self, queries: np.ndarray, k: int, before_id: Optional[int] = None,
+                    allowed_ids: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Exact k nearest rows for several queries in one pass over the matrix
+
+        Every block of rows is multiplied with all queries at once (a
+        matrix-matrix product), keeping the k best rows per query and block.
+
+        Args:
+            queries: Query vectors (m, dim)
+            k: Neighbors per query
+            before_id: Only rows whose id is below this one
+            allowed_ids: Only rows whose id is in this array
+
+        Returns:
+            List[List[Tuple[int, float]]]: Per query, (id, L2 distance) pairs, nearest first
+        """
+        queries = np.ascontiguousarray(np.atleast_2d(queries), dtype=np.float32)
+        with self._lock:
+            vectors, ids, norms = self._vectors, self._ids, self._row_norms()
+        if not len(ids) or k <= 0:
+            return [[] for _ in queries]
+
+        excluded = None
+        if before_id is not None:
+            excluded = ids >= before_id
+        if allowed_ids is not None:
+            outside = ~np.isin(ids, allowed_ids)
+            excluded = outside if excluded is None else excluded | outside
+
+        best_rows, best_scores = [], []
+        for start in range(0, len(ids), SEARCH_BLOCK_ROWS):
+            end = min(start + SEARCH_BLOCK_ROWS, len(ids))
+            # ||v||^2 - 2 v.q orders rows like ||v - q||^2: one BLAS product per block
+            scores = norms[start:end][None, :] - 2.0 * (queries @ vectors[start:end].T)
+            if excluded is not None:
+                scores[:, excluded[start:end]] = np.inf
+            if end - start > k:
+                rows = np.argpartition(scores, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(scores, rows, axis=1)
+            else:
+                rows = np.broadcast_to(np.arange(end - start), scores.shape)
+            best_rows.append(rows + start)
+            best_scores.append(scores)
+        rows, scores = np.concatenate(best_rows, axis=1), np.concatenate(best_scores, axis=1)
+        if rows.shape[1] > k:
+            keep = np.argpartition(scores, k - 1, axis=1)[:, :k]
+            rows, scores = np.take_along_axis(rows, keep, axis=1), np.take_along_axis(scores, keep, axis=1)
+
+        results = []
+        for query, query_rows, query_scores in zip(queries, rows, scores):
+            # Exact distances for the survivors (the expanded form loses precision near 0)
+            nearest = np.sort(query_rows[np.isfinite(query_scores)])  # Page order for the mapped file
+            distances = np.linalg.norm(vectors[nearest] - query, axis=1)
+            results.append([(int(ids[nearest[i]]), float(distances[i]))
+                            for i in np.argsort(distances, kind="stable")])
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Rows and file footprint"""
+        return {
+            "rows": len(self),
+            "matrix_bytes": os.path.getsize(self.matrix_file),
+            "matrix_file": self.matrix_file
+        }
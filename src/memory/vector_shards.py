@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Vector Shards
+Splits one clone's vec0 index across several database files so that KNN
+searches run in parallel, one brute-force scan per shard, and the per-shard
+top-k lists are merged
+Messages are assigned to shards by consistent hashing of the message id or of
+its time bucket, so changing the shard count only moves a fraction of vectors
+"""
+
+import bisect
+import glob
+import hashlib
+import heapq
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+SHARD_KEYS = ("hash", "time")
+
+# Messages from the same 30 days share a shard with the "time" key, so time
+# filtered searches only scan the shards holding the requested range
+TIME_BUCKET_SECONDS = 30 * 86400
+
+# Ranges spanning more buckets than this search every shard
+MAX_PRUNED_BUCKETS = 4096
+
+
+def _hash64(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring over shard indexes.
+    Each shard owns many points on the ring; growing from n to n + 1 shards
+    moves roughly 1 / (n + 1) of the keys.
+    """
+
+    def __init__(self, num_shards: int, replicas: int = 128):
+        if num_shards < 1:
+            raise ValueError("num_shards must be at least 1")
+        self.num_shards = num_shards
+        points = sorted(
+            (_hash64(f"shard-{shard}-{replica}"), shard)
+            for shard in range(num_shards) for replica in range(replicas)
+        )
+        self._hashes = [point for point, _ in points]
+        self._shards = [shard for _, shard in points]
+
+    def shard_for(self, key: Any) -> int:
+        """Shard owning a key"""
+        index = bisect.bisect(self._hashes, _hash64(str(key)))
+        return self._shards[index % len(self._shards)]
+
+
+def shard_file(db_file: str, index: int) -> str:
+    """Database file of one vector shard of a clone"""
+    return f"{os.path.splitext(db_file)[0]}.shard{index:02d}.db"
+
+
+def existing_shard_files(db_file: str) -> Dict[int, str]:
+    """Vector shard files present on disk, by shard index"""
+    pattern = re.compile(r"\.shard(\d+)\.db$")
+    files = {}
+    for path in glob.glob(f"{glob.escape(os.path.splitext(db_file)[0])}.shard*.db"):
+        match = pattern.search(path)
+        if match:
+            files[int(match.group(1))] = path
+    return files
+
+
+def remove_shard_files(db_file: str) -> int:
+    """Delete every vector shard file of a clone (with WAL side files)"""
+    removed = 0
+    for path in existing_shard_files(db_file).values():
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        removed += 1
+    return removed
+
+
+class VectorShard:
+    """One shard file; writes serialize on lock, reads share the connection"""
+
+    def __init__(self, index: int, path: str, conn: sqlite3.Connection):
+        self.index = index
+        self.path = path
+        self.conn = conn
+        self.lock = threading.RLock()
+
+
+class VectorShardSet:
+    """
+    The vec0 index of one clone, split across shard files.
+    Rows written to the shards have the layout of the clone's message_vectors
+    rows: (rowid, message_id, embedding, ..., epoch).
+    """
+
+    def __init__(self, db_file: str, num_shards: int, shard_key: str,
+                 open_shard: Callable[[str], sqlite3.Connection],
+                 create_index: Callable[[sqlite3.Connection], None],
+                 insert_sql: str):
+        """
+        Open (creating if needed) the shard files of a clone
+
+        Args:
+            db_file: The clone's main database file; shards are stored next to it
+            num_shards: Number of shard files
+            shard_key: "hash" (message id) or "time" (TIME_BUCKET_SECONDS buckets)
+            open_shard: Opens a connection to a shard file with sqlite-vec loaded
+            create_index: Creates the message_vectors table on a connection if missing
+            insert_sql: INSERT statement for message_vectors rows
+        """
+        if shard_key not in SHARD_KEYS:
+            raise ValueError(f"Unknown shard key: {shard_key} (available: {', '.join(SHARD_KEYS)})")
+        self.db_file = db_file
+        self.shard_key = shard_key
+        self.ring = HashRing(num_shards)
+        self.open_shard = open_shard
+        self.create_index = create_index
+        self.insert_sql = insert_sql
+        self.shards = [self._open(index, shard_file(db_file, index)) for index in range(num_shards)]
+        self.executor = ThreadPoolExecutor(max_workers=num_shards,
+                                           thread_name_prefix=f"{os.path.basename(db_file)}-knn")
+
+    @property
+    def num_shards(self) -> int:
+        return len(self.shards)
+
+    def _open(self, index: int, path: str) -> VectorShard:
+        conn = self.open_shard(path)
+        self.create_index(conn)
+        conn.commit()
+        return VectorShard(index, path, conn)
+
+    def shard_for(self, message_id: int, epoch: float) -> int:
+        """Shard a message's vector belongs to"""
+        if self.shard_key == "time":
+            return self.ring.shard_for(int(epoch // TIME_BUCKET_SECONDS))
+        return self.ring.shard_for(message_id)
+
+    def shards_for_range(self, since: Optional[float], until: Optional[float]) -> List[int]:
+        """Shards that can hold messages in [since, until); all of them unless time keyed"""
+        if self.shard_key != "time" or since is None or until is None:
+            return list(range(self.num_shards))
+        first, last = int(since // TIME_BUCKET_SECONDS), int(until // TIME_BUCKET_SECONDS)
+        if last - first > MAX_PRUNED_BUCKETS:
+            return list(range(self.num_shards))
+        return sorted({self.ring.shard_for(bucket) for bucket in range(first, last + 1)})
+
+    def _group(self, rows: Iterable[Sequence]) -> Dict[int, List[Sequence]]:
+        grouped: Dict[int, List[Sequence]] = {}
+        for row in rows:
+            grouped.setdefault(self.shard_for(row[1], row[-1]), []).append(row)
+        return grouped
+
+    def _write(self, shard: VectorShard, rows: List[Sequence], replace: bool = False):
+        """Write rows to one shard in a single transaction"""
+        with shard.lock:
+            shard.conn.execute("BEGIN IMMEDIATE")
+            try:
+                if replace:
+                    shard.conn.executemany("DELETE FROM message_vectors WHERE rowid = ?",
+                                           [(row[0],) for row in rows])
+                shard.conn.executemany(self.insert_sql, rows)
+                shard.conn.execute("COMMIT")
+            except Exception:
+                shard.conn.execute("ROLLBACK")
+                raise
+
+    def insert(self, rows: Iterable[Sequence], replace: bool = False) -> int:
+        """Write vector rows to the shards that own them (replacing rows with the same id)"""
+        written = 0
+        for index, shard_rows in self._group(rows).items():
+            self._write(self.shards[index], shard_rows, replace)
+            written += len(shard_rows)
+        return written
+
+    def knn(self, sql: str, params: Dict[str, Any], k: int,
+            shard_indexes: Optional[List[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Run a KNN query on every shard in parallel and merge the results
+
+        Args:
+            sql: Query returning (message_id, distance) rows, best first
+            params: Named parameters of the query
+            k: Results to keep after merging
+            shard_indexes: Shards to search (default all)
+
+        Returns:
+            List[Tuple[int, float]]: The k nearest (message_id, distance) pairs
+        """
+        indexes = range(self.num_shards) if shard_indexes is None else shard_indexes
+        futures = [
+            self.executor.submit(lambda shard: shard.conn.execute(sql, params).fetchall(), self.shards[i])
+            for i in indexes
+        ]
+        best: Dict[int, float] = {}
+        for future in futures:
+            for message_id, distance in future.result():
+                if message_id not in best or distance < best[message_id]:
+                    best[message_id] = distance
+        return heapq.nsmallest(k, best.items(), key=lambda item: item[1])
+
+    def count(self) -> int:
+        """Vectors stored across all shards"""
+        return sum(shard.conn.execute("SELECT COUNT(*) FROM message_vectors").fetchone()[0]
+                   for shard in self.shards)
+
+    def rebuild(self, rows: Iterable[Sequence], chunk_size: int) -> int:
+        """
+        Recreate every shard's index from a stream of vector rows
+
+        Rows are buffered per shard and written chunk_size at a time.
+
+        Returns:
+            int: Vectors indexed
+        """
+        for shard in self.shards:
+            with shard.lock:
+                shard.conn.execute("DROP TABLE IF EXISTS message_vectors")
+                self.create_index(shard.conn)
+                shard.conn.commit()
+
+        buffers: Dict[int, List[Sequence]] = {}
+        indexed = 0
+        for row in rows:
+            index = self.shard_for(row[1], row[-1])
+            buffer = buffers.setdefault(index, [])
+            buffer.append(row)
+            if len(buffer) >= chunk_size:
+                self._write(self.shards[index], buffer)
+                indexed += len(buffer)
+                buffers[index] = []
+        for index, buffer in buffers.items():
+            if buffer:
+                self._write(self.shards[index], buffer)
+                indexed += len(buffer)
+        return indexed
+
+    def rebalance(self, fetch_rows: Callable[[List[int]], List[Sequence]], chunk_size: int) -> int:
+        """
+        Move vectors that are not on the shard owning them, e.g. after the
+        shard count changed, and delete shard files beyond the current count
+
+        Vectors are re-read from the source of truth by fetch_rows(message_ids),
+        written to their new shard and only then deleted from the old one, so an
+        interrupted rebalance loses nothing and can simply be run again.
+
+        Returns:
+            int: Vectors moved
+        """
+        sources = {shard.index: shard for shard in self.shards}
+        for index, path in existing_shard_files(self.db_file).items():
+            if index not in sources:
+                sources[index] = self._open(index, path)
+
+        moved = 0
+        for index, source in sorted(sources.items()):
+            misplaced = [
+                message_id for message_id, epoch in
+                source.conn.execute("SELECT message_id, epoch FROM message_vectors").fetchall()
+                if index >= self.num_shards or self.shard_for(message_id, epoch) != index
+            ]
+            for start in range(0, len(misplaced), chunk_size):
+                chunk = misplaced[start:start + chunk_size]
+                # Replacing makes re-running an interrupted rebalance safe
+                moved += self.insert(fetch_rows(chunk), replace=True)
+                with source.lock:
+                    source.conn.executemany("DELETE FROM message_vectors WHERE rowid = ?",
+                                            [(message_id,) for message_id in chunk])
+                    source.conn.commit()
+
+            if index >= self.num_shards:
+                source.conn.close()
+                for suffix in ("", "-wal", "-shm"):
+                    if os.path.exists(source.path + suffix):
+                        os.remove(source.path + suffix)
+        return moved
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Shard layout and vectors per shard"""
+        return {
+            "shards": self.num_shards,
+            "shard_key": self.shard_key,
+            "vectors_per_shard": [
+                shard.conn.execute("SELECT COUNT(*) FROM message_vectors").fetchone()[0]
+                for shard in self.shards
+            ]
+        }
+
+    def close(self):
+        """Stop the search threads and close every shard connection"""
+        self.executor.shutdown(wait=True)
+        for shard in self.shards:
+            with shard.lock:
+                try:
+                    shard.conn.execute("PRAGMA optimize")
+                except Exception:
+                    pass
+                shard.conn.close()
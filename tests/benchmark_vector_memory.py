@@ -0,0 +1,779 @@
+#!/usr/bin/env python3
+"""
+Vector Memory Benchmarks
+Measures insert and search throughput of SqliteVecMemory configurations
+
+Usage:
+    python tests/benchmark_vector_memory.py profiles --messages 5000 --searches 200
+    python tests/benchmark_vector_memory.py recency --sizes 10000 100000 1000000
+    python tests/benchmark_vector_memory.py text-search --sizes 10000 100000 1000000
+    python tests/benchmark_vector_memory.py shards --messages 200000 --shards 1 2 4 8
+    python tests/benchmark_vector_memory.py hot-tier --messages 100000 --hot-size 500
+    python tests/benchmark_vector_memory.py quantization --messages 200000 --searches 50
+    python tests/benchmark_vector_memory.py engines --messages 200000 --searches 50
+    python tests/benchmark_vector_memory.py search-many --messages 100000 --queries 32
+    python tests/benchmark_vector_memory.py ann --sizes 10000 100000 1000000 --nprobe 8 32
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from rich.console import Console
+from rich.table import Table
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+import numpy as np
+import sqlite_vec
+
+from memory.ann_index import IVFIndex
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.sqlite_tuning import CONNECTION_PROFILES
+from helpers import temporary_workdir
+
+console = Console()
+
+TOPICS = ["colors", "travel", "music", "books", "food", "technology", "sports", "movies"]
+RARE_TERM = "zeppelin"
+RARE_TERM_EVERY = 100000
+
+
+def generate_messages(count: int, seed: int = 42) -> List[Dict]:
+    """Synthetic conversation messages"""
+    rng = random.Random(seed)
+    return [
+        {
+            "speaker": "User" if i % 2 == 0 else "Clone",
+            "content": f"Message {i} about {rng.choice(TOPICS)} and {rng.choice(TOPICS)}"
+        }
+        for i in range(count)
+    ]
+
+
+def _rate(count: int, seconds: float) -> float:
+    return count / seconds if seconds > 0 else float("inf")
+
+
+def benchmark_connection_profiles(message_count: int = 5000, search_count: int = 200,
+                                  commit_each_count: int = 500) -> List[Dict]:
+    """
+    Insert and search throughput for every connection profile
+
+    Args:
+        message_count: Messages inserted with batched writes
+        search_count: Vector (or text) searches run after inserting
+        commit_each_count: Messages inserted with one commit per message
+
+    Returns:
+        List[Dict]: One result row per profile
+    """
+    messages = generate_messages(message_count)
+    queries = [msg["content"] for msg in random.Random(7).sample(messages, min(search_count, message_count))]
+    results = []
+
+    for profile in CONNECTION_PROFILES:
+        with temporary_workdir():
+            # Per-message commits expose journal and fsync costs
+            memory = SqliteVecMemory(f"bench_{profile}_single", connection_profile=profile,
+                                     batch_size=1, flush_interval=0)
+            start = time.perf_counter()
+            for msg in messages[:commit_each_count]:
+                memory.add_message(msg["speaker"], msg["content"])
+            single_rate = _rate(commit_each_count, time.perf_counter() - start)
+            memory.close()
+
+            memory = SqliteVecMemory(f"bench_{profile}", connection_profile=profile)
+            start = time.perf_counter()
+            for msg in messages:
+                memory.add_message(msg["speaker"], msg["content"])
+            memory.flush()
+            batched_rate = _rate(message_count, time.perf_counter() - start)
+
+            start = time.perf_counter()
+            for query in queries:
+                memory.search_similar_messages(query, 10)
+            search_rate = _rate(len(queries), time.perf_counter() - start)
+
+            results.append({
+                "profile": profile,
+                "journal_mode": memory.connection_settings.get("journal_mode", "delete"),
+                "insert_single_per_sec": single_rate,
+                "insert_batched_per_sec": batched_rate,
+                "search_per_sec": search_rate,
+                "vector_search": memory.vector_extension_available
+            })
+            memory.close()
+
+    table = Table(title=f"Connection profiles ({message_count} messages, {len(queries)} searches)")
+    table.add_column("Profile", style="cyan")
+    table.add_column("Journal")
+    table.add_column("Insert/s (commit each)", justify="right")
+    table.add_column("Insert/s (batched)", justify="right")
+    table.add_column("Search/s", justify="right")
+    for row in results:
+        table.add_row(
+            row["profile"],
+            str(row["journal_mode"]),
+            f"{row['insert_single_per_sec']:,.0f}",
+            f"{row['insert_batched_per_sec']:,.0f}",
+            f"{row['search_per_sec']:,.0f}" + ("" if row["vector_search"] else " (text)")
+        )
+    console.print(table)
+    return results
+
+
+def _raw_content(i: int) -> str:
+    """Content of synthetic message i; one message in RARE_TERM_EVERY mentions RARE_TERM"""
+    content = f"Message {i} about {TOPICS[i % len(TOPICS)]}"
+    if i % RARE_TERM_EVERY == 1:
+        content += f" and a {RARE_TERM}"
+    return content
+
+
+def _append_raw_messages(db_file: str, start_id: int, count: int, chunk_size: int = 50000):
+    """Bulk insert message rows directly, skipping embeddings (recency does not need them)"""
+    conn = sqlite3.connect(db_file)
+    base_epoch = time.time() - 86400 * 365
+    try:
+        for chunk_start in range(start_id, start_id + count, chunk_size):
+            chunk_end = min(chunk_start + chunk_size, start_id + count)
+            conn.executemany("""
+                INSERT INTO messages (id, speaker, content, timestamp, epoch)
+                VALUES (?, ?, ?, ?, ?)
+            """, [
+                (i, "User" if i % 2 else "Clone", _raw_content(i),
+                 datetime.fromtimestamp(base_epoch + i).isoformat(), base_epoch + i)
+                for i in range(chunk_start, chunk_end)
+            ])
+            conn.commit()
+    finally:
+        conn.close()
+
+
+def _time_calls(func, repeats: int) -> float:
+    """Average seconds per call"""
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+def benchmark_recency(sizes: List[int] = None, context_size: int = 10,
+                      repeats: int = 200, legacy_repeats: int = 5) -> List[Dict]:
+    """
+    Recent-context fetch latency as the message table grows
+
+    Compares get_context() (primary key order) with the previous
+    ORDER BY timestamp query, which scans and sorts the whole table.
+
+    Args:
+        sizes: Table sizes to measure, in increasing order
+        context_size: Messages fetched per call
+        repeats: Calls averaged for get_context()
+        legacy_repeats: Calls averaged for the timestamp-ordered query
+
+    Returns:
+        List[Dict]: One result row per table size
+    """
+    sizes = sorted(sizes or [10000, 100000, 1000000])
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_recency", batch_size=1000)
+        stored = 0
+        for size in sizes:
+            _append_raw_messages(memory.db_file, stored + 1, size - stored)
+            stored = size
+
+            recent = _time_calls(lambda: memory.get_context(context_size), repeats)
+            legacy = _time_calls(lambda: memory.conn.execute("""
+                SELECT speaker, content, timestamp FROM messages
+                ORDER BY timestamp DESC, id DESC LIMIT ?
+            """, (context_size,)).fetchall(), legacy_repeats)
+
+            results.append({
+                "messages": size,
+                "recent_ms": recent * 1000,
+                "legacy_ms": legacy * 1000,
+                "speedup": legacy / recent if recent > 0 else float("inf")
+            })
+        memory.close()
+
+    table = Table(title=f"Recent context fetch (last {context_size} messages)")
+    table.add_column("Messages", justify="right", style="cyan")
+    table.add_column("get_context (ms)", justify="right")
+    table.add_column("ORDER BY timestamp (ms)", justify="right")
+    table.add_column("Speedup", justify="right")
+    for row in results:
+        table.add_row(
+            f"{row['messages']:,}",
+            f"{row['recent_ms']:.3f}",
+            f"{row['legacy_ms']:.1f}",
+            f"{row['speedup']:,.0f}x"
+        )
+    console.print(table)
+    return results
+
+
+def benchmark_text_search(sizes: List[int] = None, limit: int = 10,
+                          repeats: int = 50, legacy_repeats: int = 5) -> List[Dict]:
+    """
+    Text search latency as the message table grows
+
+    Compares the BM25-ranked FTS5 lookup used by the text search fallback
+    with the previous LIKE '%query%' scan.
+
+    Args:
+        sizes: Table sizes to measure, in increasing order
+        limit: Results per search
+        repeats: Searches averaged for FTS5
+        legacy_repeats: Searches averaged for LIKE
+
+    Returns:
+        List[Dict]: One result row per table size
+    """
+    sizes = sorted(sizes or [10000, 100000, 1000000])
+    # A rare term: LIKE has to scan the whole table to fill the limit
+    query = RARE_TERM
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_text_search", batch_size=1000)
+        memory.vector_extension_available = False
+        stored = 0
+        for size in sizes:
+            _append_raw_messages(memory.db_file, stored + 1, size - stored)
+            stored = size
+
+            fts = _time_calls(lambda: memory.search_messages(query, limit), repeats)
+            legacy = _time_calls(lambda: memory.conn.execute("""
+                SELECT speaker, content, timestamp FROM messages
+                WHERE content LIKE ? ORDER BY id DESC LIMIT ?
+            """, (f"%{query}%", limit)).fetchall(), legacy_repeats)
+
+            results.append({
+                "messages": size,
+                "fts_ms": fts * 1000,
+                "like_ms": legacy * 1000,
+                "speedup": legacy / fts if fts > 0 else float("inf")
+            })
+        memory.close()
+
+    table = Table(title=f"Text search (top {limit}, query {query!r})")
+    table.add_column("Messages", justify="right", style="cyan")
+    table.add_column("FTS5 bm25 (ms)", justify="right")
+    table.add_column("LIKE scan (ms)", justify="right")
+    table.add_column("Speedup", justify="right")
+    for row in results:
+        table.add_row(
+            f"{row['messages']:,}",
+            f"{row['fts_ms']:.3f}",
+            f"{row['like_ms']:.1f}",
+            f"{row['speedup']:,.0f}x"
+        )
+    console.print(table)
+    return results
+
+
+def benchmark_vector_shards(message_count: int = 200000, shard_counts: List[int] = None,
+                            limit: int = 10, repeats: int = 20) -> List[Dict]:
+    """
+    Vector search latency of one clone as its index is split across shard files
+
+    The same clone is reopened with every shard count, so the first sharded
+    open rebuilds the index and later ones rebalance it.
+
+    Args:
+        message_count: Messages stored in the clone
+        shard_counts: vector_shards values to measure
+        limit: Results per search
+        repeats: Searches averaged per shard count
+
+    Returns:
+        List[Dict]: One result row per shard count
+    """
+    shard_counts = shard_counts or [1, 2, 4, 8]
+    queries = [f"Message {i} about {TOPICS[i % len(TOPICS)]}" for i in range(repeats)]
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_shards", batch_size=1000)
+        if not memory.vector_extension_available:
+            console.print("[yellow]sqlite-vec is not available; skipping shard benchmark[/yellow]")
+            memory.close()
+            return results
+        messages = generate_messages(message_count)
+        for start in range(0, message_count, 10000):
+            memory.add_messages(messages[start:start + 10000])
+        memory.close()
+
+        baseline = None
+        for count in shard_counts:
+            start = time.perf_counter()
+            memory = SqliteVecMemory("bench_shards", batch_size=1000, vector_shards=count)
+            open_seconds = time.perf_counter() - start
+
+            memory.search_similar_messages(queries[0], limit)  # Warm the page caches
+            start = time.perf_counter()
+            for query in queries:
+                memory.search_similar_messages(query, limit)
+            search = (time.perf_counter() - start) / repeats
+            memory.close()
+
+            baseline = baseline or search
+            results.append({
+                "shards": count,
+                "open_s": open_seconds,
+                "search_ms": search * 1000,
+                "speedup": baseline / search if search > 0 else float("inf")
+            })
+
+    table = Table(title=f"Sharded vector search ({message_count:,} messages, top {limit})")
+    table.add_column("Shards", justify="right", style="cyan")
+    table.add_column("Open + rebalance (s)", justify="right")
+    table.add_column("Search (ms)", justify="right")
+    table.add_column("Speedup", justify="right")
+    for row in results:
+        table.add_row(
+            str(row["shards"]),
+            f"{row['open_s']:.1f}",
+            f"{row['search_ms']:.2f}",
+            f"{row['speedup']:.1f}x"
+        )
+    console.print(table)
+    return results
+
+
+def benchmark_hot_tier(message_count: int = 100000, hot_size: int = 500,
+                       repeats: int = 100) -> List[Dict]:
+    """
+    get_smart_context latency with and without the in-memory hot tier
+
+    Queries repeat recent messages, the common case of a prompt about the
+    ongoing conversation; the hit rate shows how many never reached the database.
+
+    Args:
+        message_count: Messages stored in the clone
+        hot_size: hot_tier_size of the tiered configuration
+        repeats: Smart context lookups measured per configuration
+
+    Returns:
+        List[Dict]: One result row per configuration
+    """
+    messages = generate_messages(message_count)
+    rng = random.Random(7)
+    queries = [messages[-rng.randrange(10, hot_size)]["content"] for _ in range(repeats)]
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_tiers", batch_size=1000)
+        for start in range(0, message_count, 10000):
+            memory.add_messages(messages[start:start + 10000])
+        memory.close()
+
+        for label, size in (("single tier", 0), (f"hot tier ({hot_size})", hot_size)):
+            memory = SqliteVecMemory("bench_tiers", hot_tier_size=size)
+            timings = []
+            for query in queries:
+                start = time.perf_counter()
+                memory.get_smart_context(query)
+                timings.append(time.perf_counter() - start)
+            results.append({
+                "configuration": label,
+                "median_ms": statistics.median(timings) * 1000,
+                "p95_ms": sorted(timings)[int(len(timings) * 0.95) - 1] * 1000,
+                "hot_hit_rate": memory.stats["hot_tier_hits"] / len(queries)
+            })
+            memory.close()
+
+    table = Table(title=f"Smart context retrieval ({message_count:,} messages)")
+    table.add_column("Configuration", style="cyan")
+    table.add_column("Median (ms)", justify="right")
+    table.add_column("p95 (ms)", justify="right")
+    table.add_column("Hot hits", justify="right")
+    for row in results:
+        table.add_row(
+            row["configuration"],
+            f"{row['median_ms']:.3f}",
+            f"{row['p95_ms']:.3f}",
+            f"{row['hot_hit_rate']:.0%}"
+        )
+    console.print(table)
+    return results
+
+
+def benchmark_quantization(message_count: int = 200000, search_count: int = 50,
+                           limit: int = 10, truncate_dims: List[int] = None) -> List[Dict]:
+    """
+    Recall and latency of quantized and truncated vector indexes against the
+    full float32 baseline
+
+    The same clone is reopened with every index configuration, rebuilding its
+    index from the stored float embeddings; recall@limit compares each search
+    (with full-embedding re-ranking) to the exact float32 results.
+
+    Args:
+        message_count: Messages stored in the clone
+        search_count: Queries per configuration
+        limit: Results per search
+        truncate_dims: Index dimensions measured for float32 and int8 truncated indexes
+
+    Returns:
+        List[Dict]: One result row per index configuration
+    """
+    truncate_dims = [64, 128] if truncate_dims is None else truncate_dims
+    configurations = [("float32", None), ("int8", None), ("bit", None)]
+    configurations += [(quantization, dim) for dim in truncate_dims for quantization in ("float32", "int8")]
+    bytes_per_component = {"float32": 4.0, "int8": 1.0, "bit": 0.125}
+    queries = [f"Question {i} about {TOPICS[i % len(TOPICS)]}" for i in range(search_count)]
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_quantization", batch_size=1000)
+        if not memory.vector_extension_available:
+            console.print("[yellow]sqlite-vec is not available; skipping quantization benchmark[/yellow]")
+            memory.close()
+            return results
+        messages = generate_messages(message_count)
+        for start in range(0, message_count, 10000):
+            memory.add_messages(messages[start:start + 10000])
+        memory.close()
+
+        baseline = {}
+        for quantization, truncate_dim in configurations:
+            memory = SqliteVecMemory("bench_quantization", vector_quantization=quantization,
+                                     truncate_dim=truncate_dim)
+            memory.search_similar_messages(queries[0], limit)  # Warm the page cache
+
+            start = time.perf_counter()
+            found = [[r["content"] for r in memory.search_similar_messages(query, limit)]
+                     for query in queries]
+            elapsed = (time.perf_counter() - start) / search_count
+            memory.close()
+
+            if not baseline:
+                baseline = dict(zip(queries, found))
+            recall = statistics.mean(
+                len(set(baseline[query]) & set(hits)) / limit for query, hits in zip(queries, found)
+            )
+            results.append({
+                "index": f"{quantization}[{memory.index_dim}]",
+                "index_bytes_per_vector": memory.index_dim * bytes_per_component[quantization],
+                "search_ms": elapsed * 1000,
+                "recall": recall
+            })
+
+    table = Table(title=f"Reduced vector indexes ({message_count:,} messages, top {limit})")
+    table.add_column("Index", style="cyan")
+    table.add_column("Bytes/vector", justify="right")
+    table.add_column("Search (ms)", justify="right")
+    table.add_column(f"Recall@{limit}", justify="right")
+    for row in results:
+        table.add_row(
+            row["index"],
+            f"{row['index_bytes_per_vector']:,.0f}",
+            f"{row['search_ms']:.2f}",
+            f"{row['recall']:.3f}"
+        )
+    console.print(table)
+    return results
+
+
+def benchmark_vector_engines(message_count: int = 200000, search_count: int = 50,
+                             limit: int = 10) -> List[Dict]:
+    """
+    Open and search latency of the vec0 index vs the memory-mapped matrix
+
+    Each engine is opened once to build its index from the stored embeddings,
+    then opened again to time a cold open and the first and later searches.
+
+    Args:
+        message_count: Messages stored in the clone
+        search_count: Queries per engine
+        limit: Results per search
+
+    Returns:
+        List[Dict]: One result row per engine
+    """
+    queries = [f"Question {i} about {TOPICS[i % len(TOPICS)]}" for i in range(search_count)]
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_engines", batch_size=1000, vector_engine="mmap")
+        messages = generate_messages(message_count)
+        for start in range(0, message_count, 10000):
+            memory.add_messages(messages[start:start + 10000])
+        memory.close()
+        engines = ["mmap", "vec0"] if memory.vector_extension_available else ["mmap"]
+
+        for engine in engines:
+            SqliteVecMemory("bench_engines", vector_engine=engine).close()  # Build the index
+
+            start = time.perf_counter()
+            memory = SqliteVecMemory("bench_engines", vector_engine=engine)
+            open_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            memory.search_similar_messages(queries[0], limit)
+            first_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            for query in queries:
+                memory.search_similar_messages(query, limit)
+            elapsed = (time.perf_counter() - start) / search_count
+            memory.close()
+            results.append({"engine": engine, "open_ms": open_seconds * 1000,
+                            "first_search_ms": first_seconds * 1000, "search_ms": elapsed * 1000})
+
+    table = Table(title=f"Vector engines ({message_count:,} messages, top {limit})")
+    table.add_column("Engine", style="cyan")
+    table.add_column("Open (ms)", justify="right")
+    table.add_column("First search (ms)", justify="right")
+    table.add_column("Search (ms)", justify="right", style="green")
+    for row in results:
+        table.add_row(row["engine"], f"{row['open_ms']:.1f}", f"{row['first_search_ms']:.2f}",
+                      f"{row['search_ms']:.2f}")
+    console.print(table)
+    return results
+
+
+def benchmark_search_many(message_count: int = 100000, query_count: int = 32,
+                          limit: int = 10) -> List[Dict]:
+    """
+    One search_many call vs one search_similar_messages call per query
+
+    Args:
+        message_count: Messages stored in the clone
+        query_count: Queries per round (e.g. retrievals in one tournament round)
+        limit: Results per query
+
+    Returns:
+        List[Dict]: One result row per vector engine
+    """
+    queries = [f"Round question {i} about {TOPICS[i % len(TOPICS)]}" for i in range(query_count)]
+    results = []
+
+    with temporary_workdir():
+        memory = SqliteVecMemory("bench_many", batch_size=1000)
+        messages = generate_messages(message_count)
+        for start in range(0, message_count, 10000):
+            memory.add_messages(messages[start:start + 10000])
+        memory.close()
+        engines = ["vec0", "mmap"] if memory.vector_extension_available else ["mmap"]
+
+        for engine in engines:
+            memory = SqliteVecMemory("bench_many", vector_engine=engine)
+            memory.search_many(queries[:1], limit)  # Warm caches
+
+            start = time.perf_counter()
+            for query in queries:
+                memory.search_similar_messages(query, limit)
+            single_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            memory.search_many(queries, limit)
+            batched_seconds = time.perf_counter() - start
+            memory.close()
+            results.append({"engine": engine, "single_ms": single_seconds * 1000,
+                             "batched_ms": batched_seconds * 1000})
+
+    table = Table(title=f"Batched search ({message_count:,} messages, {query_count} queries, top {limit})")
+    table.add_column("Engine", style="cyan")
+    table.add_column("One by one (ms)", justify="right")
+    table.add_column("search_many (ms)", justify="right", style="green")
+    table.add_column("Speedup", justify="right")
+    for row in results:
+        table.add_row(row["engine"], f"{row['single_ms']:.1f}", f"{row['batched_ms']:.1f}",
+                      f"{row['single_ms'] / row['batched_ms']:.1f}x")
+    console.print(table)
+    return results
+
+
+def clustered_embeddings(count: int, dim: int = 384, clusters: int = 1000, spread: float = 1.5,
+                         seed: int = 42) -> np.ndarray:
+    """
+    Unit vectors grouped around overlapping topic centers, like sentence embeddings
+    (hash embeddings are close to uniformly random, which no ANN index can cluster)
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim)).astype(np.float32)
+    vectors = np.empty((count, dim), dtype=np.float32)
+    for start in range(0, count, 100000):
+        size = min(100000, count - start)
+        block = centers[rng.integers(0, clusters, size)] + spread * rng.normal(size=(size, dim)).astype(np.float32)
+        vectors[start:start + size] = block / np.linalg.norm(block, axis=1, keepdims=True)
+    return vectors
+
+
+def _percentile_ms(samples: List[float], percentile: int) -> float:
+    return statistics.quantiles(samples, n=100)[percentile - 1] * 1000
+
+
+def benchmark_ann(sizes: List[int] = None, nprobes: List[int] = None, search_count: int = 200,
+                  limit: int = 10) -> List[Dict]:
+    """
+    Recall@limit and latency percentiles of the IVF index against the vec0 brute-force scan
+
+    Args:
+        sizes: Vector counts to measure
+        nprobes: IVF lists scanned per search (None: the index default)
+        search_count: Queries per configuration
+        limit: Neighbors per search
+
+    Returns:
+        List[Dict]: One result row per size and search method
+    """
+    sizes = sizes or [10000, 100000, 1000000]
+    nprobes = nprobes or [None]
+    results = []
+
+    for size in sizes:
+        vectors = clustered_embeddings(size)
+        ids = np.arange(1, size + 1)
+        rng = np.random.default_rng(size)
+        queries = vectors[rng.choice(size, search_count, replace=False)]
+        queries = queries + 0.05 * rng.normal(size=queries.shape).astype(np.float32)
+
+        exact = []
+        for query in queries:
+            distances = np.linalg.norm(vectors - query, axis=1)
+            exact.append(set(ids[np.argpartition(distances, limit)[:limit]].tolist()))
+
+        with temporary_workdir():
+            try:
+                conn = sqlite3.connect("vec0.db")
+                conn.enable_load_extension(True)
+                sqlite_vec.load(conn)
+            except (AttributeError, sqlite3.OperationalError):
+                conn = None
+                console.print("[yellow]sqlite-vec is not available; skipping the vec0 baseline[/yellow]")
+            if conn:
+                conn.execute(f"CREATE VIRTUAL TABLE vectors USING vec0(embedding float[{vectors.shape[1]}])")
+                for start in range(0, size, 50000):
+                    conn.executemany("INSERT INTO vectors(rowid, embedding) VALUES (?, ?)", [
+                        (int(i), vector.tobytes())
+                        for i, vector in zip(ids[start:start + 50000], vectors[start:start + 50000])
+                    ])
+                conn.commit()
+                latencies, recall = [], 0.0
+                for query, expected in zip(queries, exact):
+                    start = time.perf_counter()
+                    rows = conn.execute("SELECT rowid FROM vectors WHERE embedding MATCH ? AND k = ?",
+                                        (query.tobytes(), limit)).fetchall()
+                    latencies.append(time.perf_counter() - start)
+                    recall += len(expected & {row[0] for row in rows}) / limit
+                conn.close()
+                results.append({"vectors": size, "method": "vec0 scan", "build_s": None,
+                                "recall": recall / search_count,
+                                "p50_ms": _percentile_ms(latencies, 50), "p99_ms": _percentile_ms(latencies, 99)})
+
+        start = time.perf_counter()
+        index = IVFIndex.build(ids, vectors)
+        build_seconds = time.perf_counter() - start
+        for nprobe in nprobes:
+            latencies, recall = [], 0.0
+            for query, expected in zip(queries, exact):
+                start = time.perf_counter()
+                found = index.search(query, limit, nprobe)
+                latencies.append(time.perf_counter() - start)
+                recall += len(expected & {message_id for message_id, _ in found}) / limit
+            results.append({"vectors": size, "method": f"IVF {index.nlist} lists, nprobe {nprobe or index.nprobe}",
+                            "build_s": build_seconds, "recall": recall / search_count,
+                            "p50_ms": _percentile_ms(latencies, 50), "p99_ms": _percentile_ms(latencies, 99)})
+        del index, vectors
+
+    table = Table(title=f"Approximate vs brute-force vector search (top {limit})")
+    table.add_column("Vectors", justify="right", style="cyan")
+    table.add_column("Method")
+    table.add_column("Build (s)", justify="right")
+    table.add_column(f"Recall@{limit}", justify="right")
+    table.add_column("p50 (ms)", justify="right")
+    table.add_column("p99 (ms)", justify="right", style="green")
+    for row in results:
+        table.add_row(
+            f"{row['vectors']:,}",
+            row["method"],
+            f"{row['build_s']:.1f}" if row["build_s"] is not None else "-",
+            f"{row['recall']:.3f}",
+            f"{row['p50_ms']:.2f}",
+            f"{row['p99_ms']:.2f}"
+        )
+    console.print(table)
+    return results
+
+
+def main():
+    """Run the selected benchmark"""
+    parser = argparse.ArgumentParser(description="SqliteVecMemory benchmarks")
+    subparsers = parser.add_subparsers(dest="benchmark", required=True)
+
+    profiles = subparsers.add_parser("profiles", help="Throughput per connection profile")
+    profiles.add_argument("--messages", type=int, default=5000)
+    profiles.add_argument("--searches", type=int, default=200)
+
+    recency = subparsers.add_parser("recency", help="Recent-context latency as the table grows")
+    recency.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    recency.add_argument("--context", type=int, default=10)
+
+    text_search = subparsers.add_parser("text-search", help="FTS5 vs LIKE as the table grows")
+    text_search.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+
+    shards = subparsers.add_parser("shards", help="Vector search latency per shard count")
+    shards.add_argument("--messages", type=int, default=200000)
+    shards.add_argument("--shards", type=int, nargs="+", default=[1, 2, 4, 8])
+
+    hot_tier = subparsers.add_parser("hot-tier", help="Smart context latency with the hot tier")
+    hot_tier.add_argument("--messages", type=int, default=100000)
+    hot_tier.add_argument("--hot-size", type=int, default=500)
+
+    quantization = subparsers.add_parser("quantization",
+                                         help="Recall and latency of quantized and truncated indexes")
+    quantization.add_argument("--messages", type=int, default=200000)
+    quantization.add_argument("--searches", type=int, default=50)
+    quantization.add_argument("--truncate", type=int, nargs="*", default=[64, 128])
+
+    engines = subparsers.add_parser("engines", help="vec0 index vs memory-mapped matrix")
+    engines.add_argument("--messages", type=int, default=200000)
+    engines.add_argument("--searches", type=int, default=50)
+
+    many = subparsers.add_parser("search-many", help="Batched vs one-by-one vector searches")
+    many.add_argument("--messages", type=int, default=100000)
+    many.add_argument("--queries", type=int, default=32)
+
+    ann = subparsers.add_parser("ann", help="Recall and tail latency of the IVF index vs vec0")
+    ann.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    ann.add_argument("--nprobe", type=int, nargs="*", default=None)
+    ann.add_argument("--searches", type=int, default=200)
+
+    args = parser.parse_args()
+    if args.benchmark == "profiles":
+        benchmark_connection_profiles(args.messages, args.searches)
+    elif args.benchmark == "recency":
+        benchmark_recency(args.sizes, args.context)
+    elif args.benchmark == "text-search":
+        benchmark_text_search(args.sizes)
+    elif args.benchmark == "shards":
+        benchmark_vector_shards(args.messages, args.shards)
+    elif args.benchmark == "hot-tier":
+        benchmark_hot_tier(args.messages, args.hot_size)
+    elif args.benchmark == "quantization":
+        benchmark_quantization(args.messages, args.searches, truncate_dims=args.truncate)
+    elif args.benchmark == "engines":
+        benchmark_vector_engines(args.messages, args.searches)
+    elif args.benchmark == "search-many":
+        benchmark_search_many(args.messages, args.queries)
+    elif args.benchmark == "ann":
+        benchmark_ann(args.sizes, args.nprobe, args.searches)
+
+
+if __name__ == "__main__":
+    main()
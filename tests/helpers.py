@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test Helpers
+Shared by the test scripts: a throwaway working directory, skips for tests
+that need an optional component, and a runner for the scripts' main()
+"""
+
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+
+
+@contextmanager
+def temporary_workdir():
+    """Run a test inside a throwaway directory so data/ files are not touched"""
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(temp_dir)
+        try:
+            yield temp_dir
+        finally:
+            os.chdir(original_dir)
+
+
+def require_vector_extension(*memories):
+    """Skip the running test when sqlite-vec could not be loaded, closing the given memories first"""
+    if all(memory.vector_extension_available for memory in memories):
+        return
+    for memory in memories:
+        memory.close()
+    raise unittest.SkipTest("sqlite-vec extension not available")
+
+
+def require_module(module, name: str):
+    """Skip the running test when an optional module failed to import"""
+    if module is None:
+        raise unittest.SkipTest(f"{name} not installed")
+
+
+def run_tests(*tests):
+    """Run test functions in order, reporting skipped ones instead of stopping"""
+    for test in tests:
+        try:
+            test()
+        except unittest.SkipTest as skip:
+            print(f"⏭️  Skipped {test.__name__}: {skip}")
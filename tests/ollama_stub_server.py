@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Ollama Stand-in Server
+A tiny local HTTP server that mimics the Ollama API endpoints used by the
+project, so embedding and generation code can be tested without Ollama
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+
+def stub_embedding(text: str, embedding_dim: int) -> List[float]:
+    """Deterministic fake embedding derived from the text hash"""
+    digest = hashlib.sha256(text.encode()).digest()
+    return [(digest[i % len(digest)] / 255.0) * 2.0 - 1.0 for i in range(embedding_dim)]
+
+
+def stub_response(prompt: str) -> str:
+    """Deterministic fake completion for a prompt"""
+    return f"Stub reply number {int(hashlib.sha256(prompt.encode()).hexdigest()[:6], 16) % 1000}."
+
+
+class OllamaStubServer:
+    """
+    Ollama-compatible stand-in running on a background thread.
+    Records every request so tests can check how the API was called.
+    """
+
+    def __init__(self, embedding_dim: int = 384, support_batch_embed: bool = True,
+                 busy_responses: int = 0):
+        self.embedding_dim = embedding_dim
+        self.support_batch_embed = support_batch_embed
+        self.busy_responses = busy_responses  # /api/generate calls answered with 503 first
+        self.reply: Optional[str] = None  # Completion for every prompt (default: stub_response)
+        self.delay = 0.0  # Seconds /api/generate waits before answering
+        self.requests: List[Dict] = []
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        """Base URL of the running server"""
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def requests_to(self, path: str) -> List[Dict]:
+        """Recorded request bodies for one endpoint"""
+        return [r["body"] for r in self.requests if r["path"] == path]
+
+    def connections(self) -> int:
+        """Distinct client connections the recorded requests arrived on"""
+        return len({r["client"] for r in self.requests})
+
+    def start(self) -> "OllamaStubServer":
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "OllamaStubServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass  # Keep test output quiet
+
+            def _send_json(self, status: int, payload: Dict):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _send_ndjson_stream(self, lines: List[Dict]):
+                """Send one JSON object per line with chunked encoding, like a streaming Ollama"""
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for line in lines:
+                    data = json.dumps(line).encode() + b"\n"
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                stub.requests.append({"path": self.path, "body": None, "client": self.client_address})
+                if self.path == "/api/tags":
+                    self._send_json(200, {"models": [{"name": "llama3.2:3b"}, {"name": "all-minilm"}]})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                stub.requests.append({"path": self.path, "body": body, "client": self.client_address})
+
+                if self.path == "/api/embed" and stub.support_batch_embed:
+                    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    self._send_json(200, {
+                        "model": body["model"],
+                        "embeddings": [stub_embedding(text, stub.embedding_dim) for text in inputs]
+                    })
+                elif self.path == "/api/embeddings":
+                    self._send_json(200, {"embedding": stub_embedding(body["prompt"], stub.embedding_dim)})
+                elif self.path == "/api/generate" and stub.busy_responses > 0:
+                    stub.busy_responses -= 1
+                    self._send_json(503, {"error": "server busy, please try again"})
+                elif self.path == "/api/generate":
+                    time.sleep(stub.delay)
+                    text = stub.reply if stub.reply is not None else stub_response(body["prompt"])
+                    if body.get("stream", True):
+                        tokens = re.findall(r"\s*\S+", text)
+                        self._send_ndjson_stream(
+                            [{"model": body["model"], "response": token, "done": False} for token in tokens]
+                            + [{"model": body["model"], "response": "", "done": True}])
+                    else:
+                        self._send_json(200, {"model": body["model"], "response": text, "done": True})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+        return Handler
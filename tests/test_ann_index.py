@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Test ANN Index
+Verifies the NumPy IVF index and its use by SqliteVecMemory for large clones
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.ann_index import IVFIndex, index_files
+from memory.sqlite_vec_memory import SqliteVecMemory
+from helpers import require_vector_extension, run_tests, temporary_workdir
+
+
+def _clustered_vectors(count: int, dim: int = 64, clusters: int = 20, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    return (centers[rng.integers(0, clusters, count)] + 0.3 * rng.normal(size=(count, dim))).astype(np.float32)
+
+
+def _wait_for(condition, timeout: float = 10.0) -> bool:
+    """Poll until condition() holds (background work) or the timeout passes"""
+    deadline = time.time() + timeout
+    while not condition() and time.time() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def _messages(start: int, count: int):
+    return [{"speaker": "User" if i % 2 else "Clone", "content": f"entry {i} on subject {i % 11}"}
+            for i in range(start, start + count)]
+
+
+def test_ivf_recall_and_persistence():
+    """The index finds the exact neighbors of clustered data and survives a save/load"""
+    vectors = _clustered_vectors(3000)
+    ids = np.arange(1, 3001)
+    index = IVFIndex.build(ids[:2000], vectors[:2000])
+    index.add(ids[2000:], vectors[2000:])
+    assert len(index) == 3000 and index.max_id == 3000 and index.trained_size == 2000
+
+    recall = 0.0
+    for query in vectors[::150] + 0.05:
+        exact = np.argsort(np.linalg.norm(vectors - query, axis=1))[:10] + 1
+        found = index.search(query, 10)
+        distances = [distance for _, distance in found]
+        assert distances == sorted(distances)
+        recall += len(set(exact) & {message_id for message_id, _ in found}) / 10
+    assert recall / 20 >= 0.9
+
+    assert all(message_id < 500 for message_id, _ in index.search(vectors[10], 5, before_id=500))
+    assert index.search(vectors[0], 0) == []
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "index.ivf.npz")
+        index.save(path, {"signature": "test"})
+        loaded, metadata = IVFIndex.load(path)
+        assert metadata == {"signature": "test"} and len(loaded) == 3000
+        assert loaded.search(vectors[42], 5) == index.search(vectors[42], 5)
+        loaded.add([3001], vectors[:1])
+        assert loaded.search(vectors[0], 2)[1][0] in (1, 3001)
+
+        # New vectors go to the append log; a torn record at its end is cut off on load
+        snapshot_size = os.path.getsize(path)
+        assert loaded.save_appended(path) == 1 and loaded.save_appended(path) == 0
+        log_path = index_files(path)[1]
+        with open(log_path, "ab") as f:
+            f.write(b"torn")
+        assert os.path.getsize(path) == snapshot_size
+        replayed, _ = IVFIndex.load(path)
+        assert len(replayed) == 3001 and replayed.logged_vectors == 1
+        assert replayed.search(vectors[0], 2) == loaded.search(vectors[0], 2)
+        replayed.save(path)
+        assert not os.path.exists(log_path) and len(IVFIndex.load(path)[0]) == 3001
+
+
+def test_memory_switches_to_ann_above_threshold():
+    """Vector searches use the IVF index once the clone reaches ann_threshold vectors"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("ann_clone", batch_size=100, ann_threshold=300)
+        memory.add_messages(_messages(0, 200))
+        memory.flush()
+        if not memory.vector_extension_available:
+            assert memory.ann_index is None
+        require_vector_extension(memory)
+        assert memory.ann_index is None
+        memory.search_similar_messages("entry 5 on subject 5", 3)
+        assert memory.stats["ann_searches"] == 0
+
+        memory.add_messages(_messages(200, 400))
+        memory.flush()
+        # The index is trained on the maintenance scheduler, not while the batch is written
+        assert _wait_for(lambda: os.path.exists(memory._ann_index_file()))
+        assert memory.get_memory_stats()["ann_index"]["vectors"] == 600
+
+        query = "entry 421 on subject 3"
+        top = memory.search_similar_messages(query, 5)
+        assert memory.stats["ann_searches"] == 1
+        assert top[0]["content"] == query and abs(top[0]["similarity_score"] - 1.0) < 1e-5
+        assert top[0]["source"] == "vector_search"
+        assert memory.search_messages(query, 3)[0]["content"] == query
+
+        # Filters the index does not hold fall back to the exact vec0 search
+        clone_only = memory.search_similar_messages(query, 5, speaker="Clone")
+        assert memory.stats["ann_searches"] == 2 and {r["speaker"] for r in clone_only} == {"Clone"}
+
+        # Saving appends the new vectors to the log instead of rewriting the snapshot
+        snapshot = memory._ann_index_file()
+        saved = os.stat(snapshot)
+        memory.add_messages(_messages(600, 50))
+        memory.save_memory()
+        assert os.stat(snapshot).st_mtime_ns == saved.st_mtime_ns
+        assert os.path.getsize(index_files(snapshot)[1]) == 50 * (8 + 384 * 4)
+        memory.close()
+
+        # Messages written while the index was disabled are added when it is loaded
+        plain = SqliteVecMemory("ann_clone")
+        plain.add_messages(_messages(650, 50))
+        plain.close()
+        reopened = SqliteVecMemory("ann_clone", ann_threshold=300)
+        assert len(reopened.ann_index) == 700
+        query = "entry 690 on subject 8"
+        assert reopened.search_similar_messages(query, 1)[0]["content"] == query
+        reopened.close()
+
+
+def main():
+    """Run all ANN index tests"""
+    run_tests(
+        test_ivf_recall_and_persistence,
+        test_memory_switches_to_ann_above_threshold,
+    )
+    print("✅ All ANN index tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test Async Clone
+Verifies AsyncAIClone: concurrent turns over one pooled httpx client,
+streaming, per-turn timeouts and cancellation
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ai_clone.async_clone import AsyncAIClone
+from ai_clone.ollama_client import AsyncOllamaClient, OllamaError, close_async_http_clients
+from personality.templates import create_demo_personalities
+from ollama_stub_server import OllamaStubServer, stub_response
+from helpers import require_module, run_tests, temporary_workdir
+
+
+def test_concurrent_turns():
+    """Many clones answer at once over a bounded pool; retries work as in the sync client"""
+    require_module(httpx, "httpx")
+
+    async def scenario(server):
+        personalities = create_demo_personalities()
+        clones = await asyncio.gather(*[
+            AsyncAIClone.create(personalities[i % 3], ollama_host=server.url, memory_type="simple",
+                                ollama_options={"pool_size": 4})
+            for i in range(12)])
+        server.delay = 0.05
+        start = time.perf_counter()
+        replies = await asyncio.gather(*[clone.respond_async(f"Question {i}") for i, clone in enumerate(clones)])
+        elapsed = time.perf_counter() - start
+        assert all(reply.startswith("Stub reply") for reply in replies)
+        assert all(len(clone.conversation_history) == 2 for clone in clones)
+        assert elapsed < 12 * 0.05  # Turns overlapped instead of running one after another
+        assert server.connections() <= 4
+
+        server.busy_responses = 2
+        client = AsyncOllamaClient(server.url, backoff_factor=0.05)
+        start = time.perf_counter()
+        assert await client.generate("llama3.2:3b", "hello") == stub_response("hello")
+        assert time.perf_counter() - start >= 0.05 + 0.1  # Backoff before every retry, the first included
+        server.busy_responses = 5
+        try:
+            await client.generate("llama3.2:3b", "hello")
+            assert False, "a server that stays busy should raise"
+        except OllamaError as e:
+            assert "503" in str(e)
+        await close_async_http_clients()
+
+    with temporary_workdir(), OllamaStubServer() as server:
+        asyncio.run(scenario(server))
+        assert len(server.requests_to("/api/tags")) == 12
+
+
+def test_stream_timeout_and_cancellation():
+    """Streams stop at the personality budget; slow or cancelled turns leave no history"""
+    require_module(httpx, "httpx")
+
+    async def scenario(server):
+        alex = await AsyncAIClone.create(create_demo_personalities()[0], ollama_host=server.url,
+                                         memory_type="simple", turn_timeout=0.5)
+        sentences = [f"Sentence number {i} is here." for i in range(20)]
+        server.reply = " ".join(sentences)
+        streamed = "".join([token async for token in alex.respond_stream_async("Tell me everything")])
+        assert streamed == " ".join(sentences[:2])
+        assert alex.get_recent_history(1)[0]["content"] == streamed
+
+        server.delay = 2.0
+        start = time.perf_counter()
+        assert (await alex.respond_async("Hello?")).startswith("Sorry")
+        tokens = [token async for token in alex.respond_stream_async("Hello?")]
+        assert len(tokens) == 1 and tokens[0].startswith("Sorry")
+        assert time.perf_counter() - start < 1.5
+
+        alex.turn_timeout = 10
+        turn = asyncio.create_task(alex.respond_async("Hello?"))
+        await asyncio.sleep(0.1)
+        turn.cancel()
+        try:
+            await turn
+            assert False, "a cancelled turn should raise CancelledError"
+        except asyncio.CancelledError:
+            pass
+        assert len(alex.conversation_history) == 2 and not alex._turn_lock.locked()
+        await close_async_http_clients()
+
+    with temporary_workdir(), OllamaStubServer() as server:
+        asyncio.run(scenario(server))
+
+
+def test_abandoned_stream_releases_clone():
+    """A stream the consumer stops iterating without closing holds the clone only until its deadline"""
+    require_module(httpx, "httpx")
+
+    async def scenario(server):
+        alex = await AsyncAIClone.create(create_demo_personalities()[0], ollama_host=server.url,
+                                         memory_type="simple", turn_timeout=0.5)
+        server.reply = " ".join(f"Sentence number {i} is here." for i in range(20))
+        abandoned = alex.respond_stream_async("Tell me everything")
+        await abandoned.__anext__()
+
+        alex.turn_timeout = 10
+        start = time.perf_counter()
+        assert (await alex.respond_async("Still there?")).startswith("Sentence number 0")
+        assert time.perf_counter() - start < 1.5
+
+        # Resumed after its deadline, the stream ends without recording its turn
+        try:
+            await abandoned.__anext__()
+            assert False, "a stream resumed after its deadline should end"
+        except StopAsyncIteration:
+            pass
+        assert [m["content"] for m in alex.conversation_history][0] == "Still there?"
+        assert len(alex.conversation_history) == 2 and not alex._turn_lock.locked()
+        await close_async_http_clients()
+
+    with temporary_workdir(), OllamaStubServer() as server:
+        asyncio.run(scenario(server))
+
+
+def main():
+    """Run all async clone tests"""
+    run_tests(
+        test_concurrent_turns,
+        test_stream_timeout_and_cancellation,
+        test_abandoned_stream_releases_clone,
+    )
+    print("✅ All async clone tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Test Embedding Backends
+Verifies vectorized embedding generation, the backend registry and batched
+inserts into vector memory
+"""
+
+import os
+import sys
+import hashlib
+import sqlite3
+import threading
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.embeddings import (
+    EmbeddingBackend, HashEmbeddingBackend, OllamaEmbeddingBackend,
+    create_embedding_backend, register_embedding_backend, serialize_embedding
+)
+from memory.embedding_cache import LRUEmbeddingCache, SharedEmbeddingCache, text_hash
+from memory.sqlite_vec_memory import SqliteVecMemory
+from ollama_stub_server import OllamaStubServer, stub_embedding
+from helpers import temporary_workdir
+
+
+def _reference_hash_embedding(text: str, embedding_dim: int):
+    """The original per-element hash embedding loop"""
+    hash_bytes = hashlib.md5(text.encode()).digest()
+    return [(hash_bytes[i % len(hash_bytes)] / 255.0) * 2.0 - 1.0 for i in range(embedding_dim)]
+
+
+def test_hash_embedding_matches_reference():
+    """Vectorized embeddings match the original loop bit-for-bit in float32"""
+    engine = HashEmbeddingBackend(384)
+    for text in ["Hello! How are you?", "", "I love blue and green colors"]:
+        expected = np.array(_reference_hash_embedding(text, 384), dtype=np.float32)
+        embedding = engine.embed(text)
+        assert embedding.dtype == np.float32
+        assert embedding.shape == (384,)
+        assert np.array_equal(embedding, expected)
+
+
+def test_embed_many_is_batched():
+    """embed_many returns one row per text, consistent with embed()"""
+    engine = HashEmbeddingBackend(100)
+    texts = ["first", "second", "first"]
+    matrix = engine.embed_many(texts)
+    assert matrix.shape == (3, 100)
+    assert np.array_equal(matrix[0], matrix[2])
+    assert np.array_equal(matrix[1], engine.embed("second"))
+    assert engine.embed_many([]).shape == (0, 100)
+
+
+def test_serialize_embedding():
+    """Serialized embeddings are raw float32 bytes"""
+    vector = np.array([0.5, -1.0, 1.0], dtype=np.float64)
+    blob = serialize_embedding(vector)
+    assert len(blob) == 3 * 4
+    assert np.array_equal(np.frombuffer(blob, dtype=np.float32), vector.astype(np.float32))
+
+
+def test_add_messages_bulk():
+    """Bulk inserts embed once per distinct content and store every message"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("embedding_test_clone")
+        memory.add_messages([
+            {"speaker": "User", "content": "Hello there"},
+            {"speaker": "Clone", "content": "Hi! Nice to meet you"},
+            {"speaker": "User", "content": "Hello there"},
+        ])
+        memory.add_message("Clone", "Hi! Nice to meet you")
+
+        assert memory.stats["cache_hits"] == 1
+        assert memory.get_memory_stats()["total_messages"] == 4
+        memory.close()
+
+
+def test_backend_registry():
+    """Backends are created by name and custom backends can be registered"""
+    assert isinstance(create_embedding_backend("hash", 64), HashEmbeddingBackend)
+
+    class ConstantBackend(EmbeddingBackend):
+        name = "constant"
+
+        def embed_many(self, texts):
+            return np.ones((len(texts), self.embedding_dim), dtype=np.float32)
+
+    register_embedding_backend("constant", ConstantBackend)
+    backend = create_embedding_backend("constant", 8)
+    assert backend.embed("anything").shape == (8,)
+
+    try:
+        create_embedding_backend("does_not_exist")
+        assert False, "Unknown backends should be rejected"
+    except ValueError:
+        pass
+
+
+def test_ollama_backend_batches_requests():
+    """The Ollama backend sends one /api/embed request per batch"""
+    with OllamaStubServer(embedding_dim=32) as server:
+        backend = OllamaEmbeddingBackend(embedding_dim=32, host=server.url, batch_size=4)
+        texts = [f"message {i}" for i in range(10)]
+        matrix = backend.embed_many(texts)
+
+        assert matrix.dtype == np.float32
+        assert matrix.shape == (10, 32)
+        assert np.allclose(matrix[3], stub_embedding("message 3", 32))
+        assert len(server.requests_to("/api/embed")) == 3
+        assert not server.requests_to("/api/embeddings")
+
+
+def test_ollama_backend_legacy_fallback():
+    """Servers without /api/embed fall back to per-text /api/embeddings"""
+    with OllamaStubServer(embedding_dim=16, support_batch_embed=False) as server:
+        backend = OllamaEmbeddingBackend(embedding_dim=16, host=server.url)
+        matrix = backend.embed_many(["a", "b"])
+        assert matrix.shape == (2, 16)
+        assert len(server.requests_to("/api/embeddings")) == 2
+
+
+def test_ollama_backend_dimension_mismatch():
+    """Vectors of the wrong dimension are rejected instead of stored"""
+    with OllamaStubServer(embedding_dim=16) as server:
+        backend = OllamaEmbeddingBackend(embedding_dim=384, host=server.url)
+        try:
+            backend.embed("hello")
+            assert False, "Dimension mismatch should raise"
+        except ValueError:
+            pass
+
+
+def test_memory_uses_selected_backend():
+    """SqliteVecMemory takes its dimension from the selected backend"""
+    with temporary_workdir(), OllamaStubServer(embedding_dim=48) as server:
+        memory = SqliteVecMemory(
+            "backend_test_clone",
+            embedding_dim=48,
+            embedding_backend="ollama",
+            embedding_options={"host": server.url}
+        )
+        memory.add_messages([
+            {"speaker": "User", "content": "I love hiking"},
+            {"speaker": "Clone", "content": "Mountains are the best"},
+        ])
+
+        stats = memory.get_memory_stats()
+        assert stats["embedding_backend"] == "ollama"
+        assert stats["embedding_dimension"] == 48
+        assert stats["total_messages"] == 2
+        assert len(server.requests_to("/api/embed")) == 1
+
+        if memory.vector_extension_available:
+            results = memory.search_similar_messages("I love hiking", 1)
+            assert results[0]["content"] == "I love hiking"
+        memory.close()
+
+
+def test_embedding_failure_keeps_messages():
+    """Messages are stored without vectors when the backend is unreachable"""
+    with temporary_workdir():
+        memory = SqliteVecMemory(
+            "offline_backend_clone",
+            embedding_backend="ollama",
+            embedding_options={"host": "http://127.0.0.1:9", "timeout": 1}
+        )
+        memory.add_message("User", "Is anyone there?")
+        assert memory.get_memory_stats()["total_messages"] == 1
+        memory.close()
+
+
+def test_shared_cache_across_clones():
+    """A second clone reuses embeddings computed by the first, even after a restart"""
+    with temporary_workdir(), OllamaStubServer(embedding_dim=32) as server:
+        options = {"embedding_dim": 32, "embedding_backend": "ollama",
+                   "embedding_options": {"host": server.url}}
+
+        first = SqliteVecMemory("cache_clone_a", **options)
+        first.add_message("User", "Hey! How is your day going?")
+        first.close()
+        assert len(server.requests_to("/api/embed")) == 1
+
+        second = SqliteVecMemory("cache_clone_b", **options)
+        second.add_message("User", "Hey! How is your day going?")
+        assert len(server.requests_to("/api/embed")) == 1
+
+        stats = second.get_memory_stats()["shared_embedding_cache"]
+        assert stats["hits"] >= 1
+        assert stats["entries"] == 1
+        second.close()
+
+        # A fresh cache object on the same file still has the entry
+        reopened = SharedEmbeddingCache(stats["cache_file"])
+        found = reopened.get_many("ollama", "all-minilm", 32, [text_hash("Hey! How is your day going?")])
+        assert len(found) == 1
+        reopened.close()
+
+
+def test_shared_cache_lru_eviction():
+    """Least recently used embeddings are evicted first"""
+    with temporary_workdir():
+        cache = SharedEmbeddingCache("cache.db", max_entries=2)
+        vector = np.zeros(4, dtype=np.float32)
+        cache.put_many("hash", "md5", 4, {"a": vector, "b": vector})
+        cache.get_many("hash", "md5", 4, ["a"])  # "a" is now more recent than "b"
+        cache.put_many("hash", "md5", 4, {"c": vector})
+
+        remaining = cache.get_many("hash", "md5", 4, ["a", "b", "c"])
+        assert set(remaining) == {"a", "c"}
+        assert cache.get_stats()["evictions"] == 1
+        assert cache.get_stats()["entries"] == 2
+        cache.close()
+
+
+def test_shared_cache_batches_recency_updates():
+    """Cache hits do not write to the shared file until a batch is due"""
+    with temporary_workdir():
+        cache = SharedEmbeddingCache("cache.db")
+        cache.put_many("hash", "md5", 4, {"a": np.zeros(4, dtype=np.float32)})
+        written = cache.conn.total_changes
+        for _ in range(10):
+            assert set(cache.get_many("hash", "md5", 4, ["a"])) == {"a"}
+        assert cache.conn.total_changes == written
+
+        cache.TOUCH_BATCH = 1
+        cache.get_many("hash", "md5", 4, ["a"])
+        assert cache.conn.total_changes == written + 1
+        cache.close()
+
+
+def test_shared_cache_replaces_old_layout():
+    """A cache file written with an older table layout is started over"""
+    with temporary_workdir():
+        conn = sqlite3.connect("cache.db")
+        conn.execute('''
+            CREATE TABLE embedding_cache (backend TEXT, model TEXT, dim INTEGER, text_hash TEXT,
+                                          vector BLOB, last_used REAL)
+        ''')
+        conn.execute("INSERT INTO embedding_cache VALUES ('hash', 'md5', 4, 'a', x'00', 0)")
+        conn.commit()
+        conn.close()
+
+        cache = SharedEmbeddingCache("cache.db")
+        assert cache.get_stats()["entries"] == 0
+        cache.put_many("hash", "md5", 4, {"a": np.ones(4, dtype=np.float32)})
+        assert cache.get_many("hash", "md5", 4, ["a"])["a"].tolist() == [1.0] * 4
+        cache.close()
+
+
+def test_lru_cache_bounds():
+    """The in-process cache respects entry and byte limits and counts evictions"""
+    cache = LRUEmbeddingCache(max_entries=3, max_bytes=10 * 16 * 4)
+    batch = HashEmbeddingBackend(16).embed_many([f"text {i}" for i in range(5)])
+    for i, vector in enumerate(batch):
+        cache.put(f"k{i}", vector)
+
+    assert len(cache) == 3
+    assert "k0" not in cache and "k4" in cache
+    assert cache.get("k2") is not None
+    assert cache.get("k0") is None
+
+    stats = cache.get_stats()
+    assert stats["evictions"] == 2
+    assert stats["bytes"] == 3 * 16 * 4
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+    # Stored vectors are compact float32 copies, not views into the batch matrix
+    assert cache.get("k4").dtype == np.float32
+    assert cache.get("k4").base is None
+
+    small = LRUEmbeddingCache(max_entries=100, max_bytes=2 * 16 * 4)
+    for i, vector in enumerate(batch):
+        small.put(f"k{i}", vector)
+    assert len(small) == 2
+
+
+def test_lru_cache_concurrent_access():
+    """Concurrent puts and gets keep the size accounting consistent"""
+    cache = LRUEmbeddingCache(max_entries=50, max_bytes=40 * 16 * 4)
+    batch = HashEmbeddingBackend(16).embed_many([f"text {i}" for i in range(200)])
+
+    def worker(offset):
+        for i in range(2000):
+            key = f"k{(i + offset) % 200}"
+            if cache.get(key) is None:
+                cache.put(key, batch[(i + offset) % 200])
+
+    threads = [threading.Thread(target=worker, args=(n * 37,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.get_stats()
+    assert stats["entries"] == 40
+    assert stats["bytes"] == 40 * 16 * 4
+    assert stats["hits"] + stats["misses"] == 8 * 2000
+
+
+def test_memory_cache_is_bounded():
+    """SqliteVecMemory exposes cache metrics and never exceeds its cache size"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("bounded_cache_clone", embedding_cache_size=5)
+        memory.add_messages([{"speaker": "User", "content": f"message {i}"} for i in range(12)])
+        cache_stats = memory.get_memory_stats()["embedding_cache"]
+        assert cache_stats["entries"] == 5
+        assert cache_stats["evictions"] == 7
+        memory.close()
+
+
+def main():
+    """Run all embedding tests"""
+    test_hash_embedding_matches_reference()
+    test_embed_many_is_batched()
+    test_serialize_embedding()
+    test_add_messages_bulk()
+    test_backend_registry()
+    test_ollama_backend_batches_requests()
+    test_ollama_backend_legacy_fallback()
+    test_ollama_backend_dimension_mismatch()
+    test_memory_uses_selected_backend()
+    test_embedding_failure_keeps_messages()
+    test_shared_cache_across_clones()
+    test_shared_cache_lru_eviction()
+    test_shared_cache_batches_recency_updates()
+    test_shared_cache_replaces_old_layout()
+    test_lru_cache_bounds()
+    test_lru_cache_concurrent_access()
+    test_memory_cache_is_bounded()
+    print("✅ All embedding tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Test Hot Tier
+Verifies the in-memory tier of recent messages and hot-first smart context retrieval
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.embeddings import HashEmbeddingBackend
+from memory.hot_tier import HotTier
+from memory.sqlite_vec_memory import SqliteVecMemory
+from helpers import temporary_workdir
+
+
+def _content(i: int) -> str:
+    return f"story {i} about {['travel', 'music', 'books', 'food'][i % 4]}"
+
+
+def test_ring_buffer_and_search():
+    """The tier keeps the newest messages and ranks them by L2 distance"""
+    embedder = HashEmbeddingBackend(64)
+    tier = HotTier(10, 64)
+    tier.add([
+        {"id": i, "speaker": "User" if i % 2 else "Clone", "content": _content(i),
+         "timestamp": "2024-01-01T00:00:00", "epoch": float(i), "embedding": embedder.embed(_content(i))}
+        for i in range(1, 26)
+    ])
+    assert len(tier) == 10 and tier.oldest_id == 16
+
+    query = embedder.embed(_content(20))
+    results = tier.search(query, 3)
+    assert results[0]["content"] == _content(20) and results[0]["source"] == "hot_tier"
+    assert abs(results[0]["similarity_score"] - 1.0) < 1e-5
+
+    stored = np.stack([embedder.embed(_content(i)) for i in range(16, 26)])
+    expected = np.argsort(np.linalg.norm(stored - query, axis=1))[:3] + 16
+    assert [r["content"] for r in results] == [_content(i) for i in expected]
+
+    assert {r["speaker"] for r in tier.search(query, 10, {"speaker": "Clone"})} == {"Clone"}
+    assert len(tier.search(query, 10, {"before_id": 20, "since": 17.0})) == 3
+    assert tier.search(query, 10, {"conversation_id": "other"}) == []
+
+
+def test_smart_context_serves_recent_messages_from_memory():
+    """Smart context only searches the database when the hot tier is not good enough"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("hot_clone", batch_size=50, hot_tier_size=40)
+        memory.add_messages([{"speaker": "User", "content": _content(i)} for i in range(100)])
+        memory.flush()
+        assert memory.get_memory_stats()["hot_tier"]["messages"] == 40
+
+        memory.hot_similarity_threshold = float("-inf")
+        context = memory.get_smart_context(_content(90), max_total=8)
+        assert memory.stats["hot_tier_hits"] == 1 and memory.stats["cold_tier_searches"] == 0
+        assert _content(90) in context
+        assert len(set(context.splitlines())) == 8
+
+        # Too dissimilar: the cold tier is searched, reaching messages older than the hot tier
+        memory.hot_similarity_threshold = float("inf")
+        context = memory.get_smart_context(_content(3), max_total=8)
+        assert memory.stats["cold_tier_searches"] == 1
+        assert _content(3) in context
+        memory.close()
+
+        # The tier is filled from the database on open
+        reopened = SqliteVecMemory("hot_clone", hot_tier_size=40)
+        assert reopened.hot_tier.oldest_id == 61
+        reopened.close()
+
+        disabled = SqliteVecMemory("hot_clone")
+        assert disabled.hot_tier is None and "hot_tier" not in disabled.get_memory_stats()
+        disabled.close()
+
+
+def main():
+    """Run all hot tier tests"""
+    test_ring_buffer_and_search()
+    test_smart_context_serves_recent_messages_from_memory()
+    print("✅ All hot tier tests passed")
+
+
+if __name__ == "__main__":
+    main()
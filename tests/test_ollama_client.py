@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test Ollama Client
+Verifies the pooled keep-alive session shared by clones, its retry policy
+and streamed responses
+"""
+
+import os
+import sys
+import socket
+import time
+
+import requests
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ai_clone.clone import AIClone
+from ai_clone.conversation import CloneConversation
+from ai_clone.ollama_client import OllamaClient, OllamaError, close_sessions, get_session
+from personality.templates import create_demo_personalities
+from ollama_stub_server import OllamaStubServer, stub_response
+from helpers import temporary_workdir
+
+
+def _closed_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_clients_share_one_connection():
+    """Clients of the same host reuse one session and one kept-alive connection"""
+    with OllamaStubServer() as server:
+        first, second = OllamaClient(server.url), OllamaClient(server.url + "/")
+        assert first.session is second.session is get_session(server.url)
+        assert OllamaClient(server.url, pool_size=2).session is not first.session
+
+        assert "llama3.2:3b" in first.list_models()
+        for i in range(5):
+            client = first if i % 2 else second
+            assert client.generate("llama3.2:3b", f"turn {i}") == stub_response(f"turn {i}")
+        assert len(server.requests) == 6 and server.connections() == 1
+        assert server.requests_to("/api/generate")[0]["stream"] is False
+    close_sessions()
+
+
+def test_retries_busy_server_but_not_probes():
+    """503 answers and refused connections are retried; health checks fail at once"""
+    with OllamaStubServer(busy_responses=2) as server:
+        client = OllamaClient(server.url, backoff_factor=0.01)
+        assert client.generate("llama3.2:3b", "hello") == stub_response("hello")
+        assert len(server.requests_to("/api/generate")) == 3
+
+        server.busy_responses = 5
+        try:
+            client.generate("llama3.2:3b", "hello")
+            assert False, "a server that stays busy should raise"
+        except OllamaError as e:
+            assert "503" in str(e)
+        assert len(server.requests_to("/api/generate")) == 7  # 1 + 3 retries
+
+    client = OllamaClient(f"http://127.0.0.1:{_closed_port()}", backoff_factor=0.1)
+    start = time.perf_counter()
+    try:
+        client.list_models()
+        assert False, "a stopped server should raise"
+    except requests.exceptions.ConnectionError:
+        pass
+    probe_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        client.generate("llama3.2:3b", "hello")
+        assert False, "a stopped server should raise"
+    except requests.exceptions.ConnectionError:
+        pass
+    assert probe_seconds < 0.1 <= time.perf_counter() - start  # Only generate backs off
+    close_sessions()
+
+
+def test_clone_responds_through_pool():
+    """A clone probes the server and answers turns over the shared connection"""
+    with temporary_workdir(), OllamaStubServer() as server:
+        personality = create_demo_personalities()[0]
+        clones = [AIClone(personality, ollama_host=server.url, memory_type="simple") for _ in range(2)]
+        assert clones[0].ollama.session is clones[1].ollama.session
+
+        for clone in clones:
+            assert clone.respond("How was your weekend?").startswith("Stub reply")
+        assert len(server.requests_to("/api/tags")) == 2
+        assert len(server.requests_to("/api/generate")) == 2
+        assert server.connections() == 1
+    close_sessions()
+
+
+def test_respond_stream():
+    """Tokens are yielded as they arrive and generation stops at the personality budget"""
+    with temporary_workdir(), OllamaStubServer() as server:
+        client = OllamaClient(server.url)
+        tokens = list(client.generate_stream("llama3.2:3b", "hello"))
+        assert len(tokens) > 1 and "".join(tokens) == stub_response("hello")
+        assert client.generate("llama3.2:3b", "hello") == stub_response("hello")
+        assert server.connections() == 1  # The streamed body was read to the end
+
+        alex, _, jordan = [AIClone(p, ollama_host=server.url, memory_type="simple")
+                           for p in create_demo_personalities()]
+        sentences = [f"Sentence number {i} is here." for i in range(20)]
+        server.reply = "  " + " ".join(sentences)
+
+        # Alex answers "very short" (50 characters): the sentence crossing the budget is the last
+        streamed = "".join(alex.respond_stream("Tell me everything"))
+        request = server.requests_to("/api/generate")[-1]
+        assert request["stream"] is True and "max_tokens" not in request["options"]
+        assert request["options"]["num_predict"] == 50 and "\nUser:" in request["options"]["stop"]
+        assert streamed == " ".join(sentences[:2])
+        assert alex.get_recent_history(1)[0]["content"] == streamed
+        assert alex.get_recent_history(2)[0]["content"] == "Tell me everything"
+
+        # Jordan's budget is 200 characters
+        assert "".join(jordan.respond_stream("Tell me everything")) == " ".join(sentences[:8])
+        assert server.requests_to("/api/generate")[-1]["options"]["num_predict"] == 88
+
+        # Without sentence ends the stream is cut before Alex's 150 character limit
+        server.reply = " ".join(["word"] * 100)
+        streamed = "".join(alex.respond_stream("Go on"))
+        assert 140 < len(streamed) <= 150 and server.reply.startswith(streamed)
+
+        # The stream returns the post-processed reply, which the conversation log records
+        server.reply = "First sentence here. Second one trails"
+        log = CloneConversation(alex, jordan).run_conversation("Test scenario", max_turns=1, delay=0)
+        assert log[0]["content"] == "First sentence here."
+        assert alex.get_recent_history(1)[0]["content"] == log[0]["content"]
+
+        # An unreachable server yields a single apology instead of raising
+        offline = AIClone(create_demo_personalities()[0], memory_type="simple",
+                          ollama_host=f"http://127.0.0.1:{_closed_port()}", ollama_options={"retries": 0})
+        reply = list(offline.respond_stream("Still there?"))
+        assert len(reply) == 1 and reply[0].startswith("Sorry") and not offline.conversation_history
+    close_sessions()
+
+
+def main():
+    """Run all Ollama client tests"""
+    test_clients_share_one_connection()
+    test_retries_busy_server_but_not_probes()
+    test_clone_responds_through_pool()
+    test_respond_stream()
+    print("✅ All Ollama client tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test Response Cache
+Verifies the SQLite completion cache (TTL, eviction, keys) and its use by
+clones replaying deterministic conversations
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from ai_clone.clone import AIClone
+from ai_clone.response_cache import ResponseCache, is_deterministic, response_cache_key
+from personality.templates import create_demo_personalities
+from ollama_stub_server import OllamaStubServer
+from helpers import temporary_workdir
+
+
+def test_cache_ttl_and_eviction():
+    """Entries expire after the TTL and the least recently used are evicted"""
+    assert is_deterministic({"temperature": 0}) and is_deterministic({"temperature": 0.7, "seed": 1})
+    assert not is_deterministic({"temperature": 0.7}) and not is_deterministic({})
+    key = response_cache_key("llama3.2:3b", {"seed": 1}, "prompt")
+    assert key == response_cache_key("llama3.2:3b", {"seed": 1}, "prompt")
+    assert key != response_cache_key("llama3.2:3b", {"seed": 2}, "prompt")
+    assert key != response_cache_key("llama3.2:3b", {"seed": 1}, "prompt", stream=True)
+
+    with temporary_workdir():
+        cache = ResponseCache("cache/responses.db", max_entries=3)
+        for i in range(3):
+            cache.put(f"key{i}", "llama3.2:3b", f"response {i}")
+        assert cache.get("key0") == "response 0" and cache.get("missing") is None
+        cache.put("key3", "llama3.2:3b", "response 3")  # Evicts key1, the least recently used
+        assert cache.get("key1") is None and cache.get("key0") == "response 0"
+        stats = cache.get_stats()
+        assert stats["entries"] == 3 and stats["evictions"] == 1 and stats["hits"] == 2
+        cache.close()
+
+        short_lived = ResponseCache("cache/responses.db", ttl=0.05)
+        short_lived.put("fresh", "llama3.2:3b", "fresh response")
+        assert short_lived.get("fresh") == "fresh response"
+        time.sleep(0.1)
+        assert short_lived.get("fresh") is None and short_lived.get("key0") is None
+        assert short_lived.get_stats()["expirations"] == 2
+        short_lived.put("fresh", "llama3.2:3b", "new response")
+        assert short_lived.get("fresh") == "new response"
+        short_lived.close()
+
+
+async def _async_replay(personality, host, messages, options):
+    from ai_clone.async_clone import AsyncAIClone
+    from ai_clone.ollama_client import close_async_http_clients
+
+    clone = await AsyncAIClone.create(personality, ollama_host=host, memory_type="simple", **options)
+    replies = [await clone.respond_async(message) for message in messages]
+    replies.append("".join([token async for token in clone.respond_stream_async("Tell me more")]))
+    await close_async_http_clients()
+    return replies
+
+
+def test_clones_replay_cached_conversations():
+    """A seeded conversation replays from the cache; random sampling and bypasses do not"""
+    with tempfile.TemporaryDirectory() as cache_dir, OllamaStubServer() as server:
+        cache = ResponseCache(os.path.join(cache_dir, "responses.db"))
+        personality = create_demo_personalities()[1]
+        messages = ["Hi there", "What do you do for fun?"]
+
+        def run(**options):
+            with temporary_workdir():
+                clone = AIClone(personality, ollama_host=server.url, memory_type="simple", **options)
+                replies = [clone.respond(message) for message in messages]
+                replies.append("".join(clone.respond_stream("Tell me more")))
+                return replies
+
+        seeded = {"response_cache": cache, "generation_options": {"seed": 7}}
+        first = run(**seeded)
+        assert len(server.requests_to("/api/generate")) == 3
+        assert run(**seeded) == first
+        assert len(server.requests_to("/api/generate")) == 3 and cache.get_stats()["hits"] == 3
+
+        # Default sampling (temperature 0.7, no seed) is not deterministic: never cached
+        run(response_cache=cache)
+        assert len(server.requests_to("/api/generate")) == 6
+
+        with temporary_workdir():
+            clone = AIClone(personality, ollama_host=server.url, memory_type="simple", **seeded)
+            assert clone.respond(messages[0], use_cache=False) == first[0]
+            assert len(server.requests_to("/api/generate")) == 7
+
+        # Async clones share the cache entries
+        if httpx is not None:
+            with temporary_workdir():
+                assert asyncio.run(_async_replay(personality, server.url, messages, seeded)) == first
+            assert len(server.requests_to("/api/generate")) == 7
+        cache.close()
+
+
+def main():
+    """Run all response cache tests"""
+    test_cache_ttl_and_eviction()
+    test_clones_replay_cached_conversations()
+    print("✅ All response cache tests passed")
+
+
+if __name__ == "__main__":
+    main()
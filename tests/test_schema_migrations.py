@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Test Schema Migrations
+Verifies versioned migrations, chunked backfills and embedding re-indexing
+"""
+
+import os
+import sys
+import sqlite3
+
+import sqlite_vec
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.embeddings import HashEmbeddingBackend, serialize_embedding
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.schema_migrations import (
+    SCHEMA_VERSION, Migration, get_meta, get_schema_version, migrate, run_chunked_update,
+    set_meta, write_in_chunks
+)
+from helpers import temporary_workdir
+
+
+def _create_legacy_database(db_file: str) -> bool:
+    """
+    Database as written before schema versioning, including the unused embeddings
+    table. Returns whether a vec0 index could be created as well.
+    """
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        with_vectors = True
+    except Exception:
+        with_vectors = False
+
+    conn.executescript('''
+        CREATE TABLE messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            speaker TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            embedding BLOB,
+            metadata TEXT
+        );
+        CREATE TABLE embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER,
+            vector_data BLOB
+        );
+    ''')
+    conn.executemany("INSERT INTO messages (speaker, content, timestamp) VALUES ('User', ?, ?)",
+                     [(f"legacy {i}", f"2024-05-0{1 + i % 9}T10:00:00") for i in range(12)])
+    if with_vectors:
+        conn.execute("CREATE VIRTUAL TABLE message_vectors USING vec0(message_id INTEGER, embedding float32[384])")
+        embedder = HashEmbeddingBackend(384)
+        for message_id, content in conn.execute("SELECT id, content FROM messages").fetchall():
+            # Old versions let vec0 pick its own rowids
+            conn.execute("INSERT INTO message_vectors (message_id, embedding) VALUES (?, ?)",
+                         (message_id, serialize_embedding(embedder.embed(content))))
+    conn.commit()
+    conn.close()
+    return with_vectors
+
+
+def _create_uuid_database(db_file: str, schema_version: int = 0) -> bool:
+    """
+    Database in the layout of the first releases: TEXT UUID ids (NULL for most
+    messages) and vectors kept only in message_vectors, keyed by those ids.
+    schema_version > 0 adds what the interrupted migrations of earlier releases
+    left behind. Returns whether the vectors could be written.
+    """
+    os.makedirs(os.path.dirname(db_file), exist_ok=True)
+    conn = sqlite3.connect(db_file)
+    try:
+        conn.enable_load_extension(True)
+        sqlite_vec.load(conn)
+        with_vectors = True
+    except Exception:
+        with_vectors = False
+
+    conn.executescript('''
+        CREATE TABLE messages (
+            id TEXT PRIMARY KEY,
+            speaker TEXT NOT NULL,
+            content TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            conversation_id TEXT,
+            metadata TEXT
+        );
+        CREATE INDEX idx_messages_timestamp ON messages(timestamp);
+        CREATE INDEX idx_messages_speaker ON messages(speaker);
+        CREATE TABLE embeddings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            message_id INTEGER,
+            vector_data BLOB
+        );
+    ''')
+    rows = [(f"uuid-{i}" if i % 3 == 0 else None, f"first release {i}", f"2024-03-0{1 + i % 9}T09:30:00")
+            for i in range(9)]
+    conn.executemany("INSERT INTO messages (id, speaker, content, timestamp) VALUES (?, 'User', ?, ?)", rows)
+    if with_vectors:
+        conn.execute("CREATE VIRTUAL TABLE message_vectors USING vec0(message_id TEXT, embedding float[384])")
+        embedder = HashEmbeddingBackend(384)
+        conn.executemany("INSERT INTO message_vectors (message_id, embedding) VALUES (?, ?)",
+                         [(message_id, serialize_embedding(embedder.embed(content)))
+                          for message_id, content, _ in rows if message_id])
+    if schema_version:
+        # Migration 2 could only backfill the rows that had an id
+        conn.executescript(f'''
+            CREATE TABLE schema_meta (key TEXT PRIMARY KEY, value TEXT);
+            ALTER TABLE messages ADD COLUMN epoch REAL;
+            UPDATE messages SET epoch = (julianday(timestamp, 'utc') - 2440587.5) * 86400.0 WHERE id IS NOT NULL;
+            DROP TABLE embeddings;
+            PRAGMA user_version = {schema_version};
+        ''')
+    conn.commit()
+    conn.close()
+    return with_vectors
+
+
+def test_legacy_database_is_migrated():
+    """Unversioned databases are brought to the current schema version"""
+    with temporary_workdir():
+        db_file = "data/vector_memory/legacy_clone_vectors.db"
+        had_vectors = _create_legacy_database(db_file)
+
+        memory = SqliteVecMemory("legacy_clone", connection_profile="legacy")
+        assert get_schema_version(memory.conn) == SCHEMA_VERSION
+        assert memory.get_memory_stats()["schema_version"] == SCHEMA_VERSION
+        tables = {row[0] for row in memory.conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert "embeddings" not in tables
+        assert memory.conn.execute("SELECT COUNT(*) FROM messages WHERE epoch IS NULL").fetchone()[0] == 0
+        assert memory.conn.execute(
+            "SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH 'legacy'").fetchone()[0] == 12
+
+        if had_vectors:
+            # Vectors were copied onto messages and the index now uses message ids as rowids
+            lengths = {row[0] for row in memory.conn.execute("SELECT length(embedding) FROM messages")}
+            assert lengths == {384 * 4}
+            results = memory.search_similar_messages("legacy 3", 1)
+            assert results[0]["content"] == "legacy 3"
+        assert get_meta(memory.conn, "embedding_signature") == "hash:md5:384"
+        memory.close()
+
+        # Reopening is a no-op
+        reopened = SqliteVecMemory("legacy_clone", connection_profile="legacy")
+        assert migrate(reopened.conn) == []
+        reopened.close()
+
+
+def test_uuid_database_is_rebuilt():
+    """Databases with TEXT ids are rebuilt with integer ids, keeping order and vectors"""
+    for schema_version in (0, 3):
+        with temporary_workdir():
+            db_file = "data/vector_memory/uuid_clone_vectors.db"
+            had_vectors = _create_uuid_database(db_file, schema_version)
+
+            memory = SqliteVecMemory("uuid_clone")
+            assert get_schema_version(memory.conn) == SCHEMA_VERSION
+            rows = memory.conn.execute("SELECT id, content, epoch FROM messages ORDER BY id").fetchall()
+            assert [(row[0], row[1]) for row in rows] == [(i + 1, f"first release {i}") for i in range(9)]
+            assert all(row[2] is not None and row[2] > 0 for row in rows)
+            assert memory.conn.execute(
+                "SELECT COUNT(*) FROM messages_fts WHERE messages_fts MATCH 'release'").fetchone()[0] == 9
+
+            if had_vectors:
+                # Vectors keyed by the old UUIDs moved onto their messages
+                embedder = HashEmbeddingBackend(384)
+                stored = memory.conn.execute("SELECT embedding FROM messages WHERE id = 4").fetchone()[0]
+                assert stored == serialize_embedding(embedder.embed("first release 3"))
+                assert memory.search_similar_messages("first release 6", 1)[0]["content"] == "first release 6"
+
+            # Messages that had no vector were embedded and indexed on open
+            assert memory.conn.execute("SELECT COUNT(*) FROM messages WHERE embedding IS NULL").fetchone()[0] == 0
+            if memory.vector_extension_available:
+                assert memory.search_similar_messages("first release 4", 1)[0]["content"] == "first release 4"
+            memory.close()
+
+
+def test_chunked_helpers():
+    """Backfills commit one chunk at a time"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, value INTEGER)")
+    conn.executemany("INSERT INTO t (id) VALUES (?)", [(i,) for i in range(10)])
+    conn.commit()
+
+    changed = run_chunked_update(
+        conn, "UPDATE t SET value = id * 2 WHERE id IN (SELECT id FROM t WHERE value IS NULL LIMIT ?)",
+        chunk_size=3)
+    assert changed == 10
+    assert conn.execute("SELECT SUM(value) FROM t").fetchone()[0] == 90
+
+    chunks = []
+    written = write_in_chunks(conn, ((i, i) for i in range(7)), "UPDATE t SET value = ? WHERE id = ?",
+                              chunk_size=3, on_chunk=lambda rows: chunks.append(len(rows)))
+    assert written == 7 and chunks == [3, 3, 1]
+    assert not conn.in_transaction
+
+
+def test_failed_migration_rolls_back():
+    """A failing transactional migration leaves the version and schema unchanged"""
+    conn = sqlite3.connect(":memory:")
+
+    def create_table(conn, chunk_size):
+        conn.execute("CREATE TABLE a (x INTEGER)")
+
+    def broken(conn, chunk_size):
+        conn.execute("CREATE TABLE b (x INTEGER)")
+        raise ValueError("boom")
+
+    migrations = [Migration(1, "create a", create_table), Migration(2, "broken", broken)]
+    try:
+        migrate(conn, migrations)
+        assert False, "The failing migration should raise"
+    except ValueError:
+        pass
+    assert get_schema_version(conn) == 1
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    assert tables == {"a"}
+
+    conn.execute("PRAGMA user_version = 5")
+    try:
+        migrate(conn, migrations)
+        assert False, "Databases from newer versions should be rejected"
+    except RuntimeError:
+        pass
+
+
+def test_unknown_layout_is_refused():
+    """A messages table the migrations cannot upgrade is refused before anything is written"""
+    layouts = [
+        "CREATE TABLE messages (id TEXT PRIMARY KEY, speaker TEXT, content TEXT)",
+        "CREATE TABLE messages (id TEXT PRIMARY KEY, speaker TEXT, content TEXT, timestamp TEXT) WITHOUT ROWID",
+    ]
+    for create_table in layouts:
+        conn = sqlite3.connect(":memory:")
+        conn.execute(create_table)
+        conn.execute("INSERT INTO messages (id, speaker, content) VALUES ('a', 'User', 'hello')")
+        conn.commit()
+        try:
+            migrate(conn)
+            assert False, "The unknown layout should be refused"
+        except RuntimeError:
+            pass
+        assert get_schema_version(conn) == 0
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        assert tables == {"messages"}
+
+
+def test_dimension_change_reembeds_messages():
+    """Opening a clone with a new embedding dimension re-embeds and re-indexes it"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("dimension_clone")
+        memory.add_messages([{"speaker": "User", "content": f"note {i}"} for i in range(20)])
+        memory.close()
+
+        resized = SqliteVecMemory("dimension_clone", embedding_dim=128)
+        lengths = {row[0] for row in resized.conn.execute("SELECT length(embedding) FROM messages")}
+        assert lengths == {128 * 4}
+        assert get_meta(resized.conn, "embedding_signature") == "hash:md5:128"
+        assert get_meta(resized.conn, "reembed_last_id") is None
+
+        if resized.vector_extension_available:
+            assert get_meta(resized.conn, "vector_index_layout").startswith("float32[128];")
+            assert resized.search_similar_messages("note 7", 1)[0]["content"] == "note 7"
+        resized.close()
+
+
+def test_interrupted_reembed_resumes():
+    """A re-embed resumes after the last committed chunk"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("resume_clone")
+        memory.add_messages([{"speaker": "User", "content": f"entry {i}"} for i in range(10)])
+        memory.flush()
+
+        # Simulate a run to dimension 64 that stopped after message 4
+        set_meta(memory.conn, "reembed_signature", "hash:md5:64")
+        set_meta(memory.conn, "reembed_last_id", 4)
+        memory.conn.commit()
+        memory.close()
+
+        resumed = SqliteVecMemory("resume_clone", embedding_dim=64)
+        lengths = [row[0] for row in resumed.conn.execute("SELECT length(embedding) FROM messages ORDER BY id")]
+        assert lengths == [384 * 4] * 4 + [64 * 4] * 6
+        assert get_meta(resumed.conn, "reembed_signature") is None
+
+        # Messages skipped by the interrupted run can be filled in explicitly
+        resumed.conn.execute("UPDATE messages SET embedding = NULL WHERE id <= 4")
+        resumed.conn.commit()
+        assert resumed.reembed_messages(missing_only=True) == 4
+        lengths = {row[0] for row in resumed.conn.execute("SELECT length(embedding) FROM messages")}
+        assert lengths == {64 * 4}
+        resumed.close()
+
+
+def main():
+    """Run all migration tests"""
+    test_legacy_database_is_migrated()
+    test_uuid_database_is_rebuilt()
+    test_chunked_helpers()
+    test_failed_migration_rolls_back()
+    test_unknown_layout_is_refused()
+    test_dimension_change_reembeds_messages()
+    test_interrupted_reembed_resumes()
+    print("✅ All schema migration tests passed")
+
+
+if __name__ == "__main__":
+    main()
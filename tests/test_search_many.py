@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test Batched Search
+Verifies that search_many returns the same results as one search per query
+for every vector index configuration
+"""
+
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory import sqlite_vec_memory
+from memory.sqlite_vec_memory import SqliteVecMemory
+from helpers import require_vector_extension, run_tests, temporary_workdir
+
+
+MESSAGES = [{"speaker": "User" if i % 2 else "Clone", "content": f"line {i} concerning theme {i % 17}"}
+            for i in range(500)]
+QUERIES = [f"line {i * 7} concerning theme {i % 17}" for i in range(30)] + ["theme", "unrelated words"]
+
+
+def _summary(results):
+    return [(r["content"], round(r["similarity_score"], 4), r["source"]) for r in results]
+
+
+def test_search_many_matches_single_searches():
+    """Every configuration returns per-query results identical to search_similar_messages"""
+    configurations = {
+        "vec0": {},
+        "int8": {"vector_quantization": "int8"},
+        "mmap": {"vector_engine": "mmap"},
+        "shards": {"vector_shards": 2},
+        "ann": {"ann_threshold": 100},
+    }
+    with temporary_workdir():
+        for name, options in configurations.items():
+            memory = SqliteVecMemory(f"{name}_clone", batch_size=250, **options)
+            memory.add_messages(MESSAGES)
+            assert memory.search_many([], 5) == []
+
+            for filters in ({}, {"speaker": "Clone"}, {"before_id": 300}):
+                batched = memory.search_many(QUERIES, 5, **filters)
+                assert len(batched) == len(QUERIES)
+                for query, results in zip(QUERIES, batched):
+                    assert _summary(results) == _summary(memory.search_similar_messages(query, 5, **filters)), name
+            if memory._vector_search_available():
+                assert memory.search_many(QUERIES[:1], 1)[0][0]["content"] == QUERIES[0]
+            memory.close()
+
+
+def test_vec0_statements_are_chunked():
+    """More queries than one statement holds are split across statements"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("chunked_clone", batch_size=500)
+        memory.add_messages(MESSAGES)
+        require_vector_extension(memory)
+        original = sqlite_vec_memory.MAX_QUERIES_PER_STATEMENT
+        sqlite_vec_memory.MAX_QUERIES_PER_STATEMENT = 7
+        try:
+            batched = memory.search_many(QUERIES, 3)
+        finally:
+            sqlite_vec_memory.MAX_QUERIES_PER_STATEMENT = original
+        assert [_summary(results) for results in batched] == [
+            _summary(memory.search_similar_messages(query, 3)) for query in QUERIES]
+        memory.close()
+
+
+def main():
+    """Run all batched search tests"""
+    run_tests(
+        test_search_many_matches_single_searches,
+        test_vec0_statements_are_chunked,
+    )
+    print("✅ All batched search tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Test Shared Store
+Verifies that many clones can share one vector store without seeing each other's messages
+"""
+
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.shared_store import ConnectionPool, get_connection_pool, shard_for_clone, shard_path
+from helpers import temporary_workdir
+
+
+def _clone(name: str, **kwargs) -> SqliteVecMemory:
+    memory = SqliteVecMemory(name, shared_store="store", batch_size=100, **kwargs)
+    memory.add_messages([
+        {"speaker": "User" if i % 2 else name, "content": f"{name} remembers travel story {i}"}
+        for i in range(10)
+    ])
+    return memory
+
+
+def test_clones_are_isolated():
+    """Searches, recent context and stats only see the clone's own messages"""
+    with temporary_workdir():
+        alice, bob = _clone("alice"), _clone("bob")
+        assert alice.db_file == bob.db_file
+        assert alice.conn is bob.conn
+
+        for memory, other in ((alice, "bob"), (bob, "alice")):
+            for search in (memory.search_messages, memory.search_similar_messages,
+                           memory._basic_text_search):
+                results = search("remembers travel story", 20)
+                assert len(results) == 10
+                assert not any(other in r["content"] for r in results)
+
+            speaker_only = memory.search_messages("travel story", 20, speaker="User")
+            assert len(speaker_only) == 5 and {r["speaker"] for r in speaker_only} == {"User"}
+
+            assert [m["content"] for m in memory.get_context(2)][-1].startswith(memory.clone_name)
+            assert memory.get_memory_stats()["total_messages"] == 10
+            assert memory.get_conversation_summary().startswith("Conversation: 10 messages")
+            context = memory.get_smart_context("travel story", max_total=8)
+            assert other not in context
+
+        if alice.vector_extension_available:
+            assert alice.get_memory_stats()["vector_embeddings"] == 10
+            assert alice.search_similar_messages("travel", 3)[0]["source"] == "vector_search"
+        alice.flush()
+        bob.flush()
+        total = alice.conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+        assert total == 20
+        alice.close()
+        bob.close()
+
+
+def test_clones_share_one_connection():
+    """Every clone on a shard uses the pooled connection; the last one closes it"""
+    with temporary_workdir():
+        pool = get_connection_pool()
+        opened_before = pool.get_stats()["connections_opened"]
+        clones = [_clone(f"clone_{i}") for i in range(20)]
+        stats = clones[0].get_memory_stats()["shared_store"]
+        assert stats["connections_opened"] == opened_before + 1
+        assert stats["users"][clones[0].db_file] == 20
+
+        conn = clones[0].conn
+        for memory in clones[:-1]:
+            memory.close()
+        conn.execute("SELECT 1")  # Still open for the remaining clone
+        assert clones[-1].search_messages("travel story", 3)
+        clones[-1].close()
+        assert clones[-1].db_file not in pool.get_stats()["users"]
+
+        # Queued messages were flushed before release
+        reopened = SqliteVecMemory("clone_3", shared_store="store")
+        assert reopened.get_memory_stats()["total_messages"] == 10
+        reopened.close()
+
+
+def test_shard_assignment():
+    """Clones map to a stable shard, spreading a store over a fixed number of files"""
+    assert shard_for_clone("alice", 1) == 0
+    assert shard_for_clone("alice", 8) == shard_for_clone("alice", 8)
+    assert len({shard_for_clone(f"clone_{i}", 4) for i in range(50)}) == 4
+    assert shard_path("alice", "store", 8).endswith(f"shard_{shard_for_clone('alice', 8):03d}.db")
+    try:
+        shard_for_clone("alice", 0)
+        assert False, "A store needs at least one shard"
+    except ValueError:
+        pass
+
+    with temporary_workdir():
+        clones = [_clone(f"clone_{i}", store_shards=4) for i in range(12)]
+        files = {memory.db_file for memory in clones}
+        assert 1 < len(files) <= 4
+        assert all(memory.get_memory_stats()["total_messages"] == 10 for memory in clones)
+        for memory in clones:
+            memory.close()
+        assert set(os.listdir("store")) >= {os.path.basename(f) for f in files}
+
+
+def test_pool_reference_counting():
+    """The pool opens a file once and closes it when the last user releases it"""
+    with temporary_workdir():
+        import sqlite3
+        pool = ConnectionPool()
+        opens = []
+
+        def opener():
+            opens.append(1)
+            return sqlite3.connect("pooled.db"), {}
+
+        first = pool.acquire("pooled.db", opener)
+        second = pool.acquire("./pooled.db", opener)
+        assert first is second and len(opens) == 1
+        assert pool.release(first) is False
+        assert pool.release(second) is True
+        assert pool.get_stats()["open_connections"] == 0
+
+
+def test_mismatched_embeddings_are_rejected():
+    """A clone cannot join a store whose vectors come from another embedding configuration"""
+    with temporary_workdir():
+        alice = _clone("alice")
+        alice.close()
+        try:
+            SqliteVecMemory("bob", shared_store="store", embedding_dim=128)
+            assert False, "Mismatched embedding dimensions should be rejected"
+        except ValueError:
+            pass
+        assert get_connection_pool().get_stats()["users"].get(alice.db_file) is None
+
+        reopened = SqliteVecMemory("alice", shared_store="store")
+        assert reopened.get_memory_stats()["total_messages"] == 10
+        if reopened.vector_extension_available:
+            # The store-wide index is not rebuilt for a clone with another quantization or dimension
+            for options in ({"vector_quantization": "int8"}, {"truncate_dim": 64}):
+                try:
+                    SqliteVecMemory("bob", shared_store="store", **options)
+                    assert False, f"{options} should be rejected"
+                except ValueError:
+                    pass
+            assert reopened.search_similar_messages("travel story 4", 1)[0]["source"] == "vector_search"
+        reopened.close()
+
+
+def main():
+    """Run all shared store tests"""
+    test_clones_are_isolated()
+    test_clones_share_one_connection()
+    test_shard_assignment()
+    test_pool_reference_counting()
+    test_mismatched_embeddings_are_rejected()
+    print("✅ All shared store tests passed")
+
+
+if __name__ == "__main__":
+    main()
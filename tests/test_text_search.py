@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Test Text Search
+Verifies the FTS5 index, hybrid (vector + BM25) retrieval and search filters of SqliteVecMemory
+"""
+
+import os
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.sqlite_vec_memory import SqliteVecMemory, build_fts_query
+from helpers import require_vector_extension, run_tests, temporary_workdir
+
+
+def _fts_rowids(memory: SqliteVecMemory, word: str):
+    return [row[0] for row in memory.conn.execute(
+        "SELECT rowid FROM messages_fts WHERE messages_fts MATCH ? ORDER BY rowid", (f'"{word}"',))]
+
+
+def test_build_fts_query():
+    """Free text becomes a safe OR of quoted words"""
+    assert build_fts_query("What's NOT (blue)?") == '"what" OR "s" OR "not" OR "blue"'
+    assert build_fts_query("blue blue sky") == '"blue" OR "sky"'
+    assert build_fts_query("?!") == ""
+
+
+def test_fts_index_follows_messages():
+    """Triggers keep the index in sync with inserts, updates and deletes"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("fts_sync_clone", batch_size=1, flush_interval=0)
+        assert memory.fts_available
+        memory.add_message("User", "I love hiking in the mountains")
+        memory.add_message("Clone", "Mountains are great for photography")
+        assert _fts_rowids(memory, "mountain") == [1, 2]  # porter stemming
+
+        memory.conn.execute("UPDATE messages SET content = 'I love sailing' WHERE id = 1")
+        memory.conn.execute("DELETE FROM messages WHERE id = 2")
+        memory.conn.commit()
+        assert _fts_rowids(memory, "mountain") == []
+        assert _fts_rowids(memory, "sailing") == [1]
+        memory.close()
+
+
+def test_basic_mode_uses_bm25_ranking():
+    """Without vector search, search_messages is served by the FTS index"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("fts_rank_clone", batch_size=50)
+        memory.vector_extension_available = False
+        memory.add_messages([
+            {"speaker": "User", "content": "My favorite color is blue"},
+            {"speaker": "Clone", "content": "Blue is calming, like the ocean"},
+            {"speaker": "User", "content": "Let's talk about cooking pasta"},
+            {"speaker": "User", "content": "The blue ocean near my favorite beach"},
+        ])
+
+        results = memory.search_messages("favorite blue ocean", 3)
+        assert [r["source"] for r in results] == ["fts_search"] * 3
+        assert results[0]["content"] == "The blue ocean near my favorite beach"
+        assert all(0 < r["similarity_score"] < 1 for r in results)
+        assert "pasta" not in " ".join(r["content"] for r in results)
+
+        # Queries without words still fall back to substring matching
+        assert memory.search_messages("'", 5)[0]["content"] == "Let's talk about cooking pasta"
+        memory.close()
+
+
+HYBRID_MESSAGES = [
+    "We planned a trip to the mountains in June",
+    "My favorite color is blue",
+    "The mountains were covered in snow",
+    "Blue mountains look beautiful at sunset",
+    "Let's cook pasta tonight",
+]
+
+
+def test_hybrid_search_fuses_rankings():
+    """Messages ranked well by both signals come first"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("hybrid_clone", batch_size=50)
+        memory.add_messages([{"speaker": "User", "content": text} for text in HYBRID_MESSAGES])
+        memory.flush()
+        if not memory.vector_extension_available:
+            # Basic mode: hybrid search is the BM25 ranking
+            assert memory.hybrid_search("blue mountains", 3) == memory._basic_text_search("blue mountains", 3)
+        require_vector_extension(memory)
+
+        results = memory.hybrid_search("Blue mountains look beautiful at sunset", 3)
+        top = results[0]
+        assert top["content"] == "Blue mountains look beautiful at sunset"
+        assert top["source"] == "hybrid_search"
+        assert top["vector_distance"] is not None and top["bm25"] is not None
+        assert abs(top["similarity_score"] - 1.0) < 1e-9
+        assert [r["rrf_score"] for r in results] == sorted((r["rrf_score"] for r in results), reverse=True)
+
+        # Zero weights reduce fusion to a single ranking
+        vector_only = memory.hybrid_search("mountains", 5, text_weight=0.0)
+        assert [r["content"] for r in vector_only] == \
+            [r["content"] for r in memory.search_similar_messages("mountains", 5)]
+        text_only = memory.hybrid_search("blue mountains", 5, vector_weight=0.0)
+        assert [r["content"] for r in text_only] == \
+            [r["content"] for r in memory._basic_text_search("blue mountains", 5)]
+
+        # Candidate depth bounds how many messages each signal contributes
+        assert len(memory.hybrid_search("mountains", 5, candidate_depth=1)) <= 2
+        memory.close()
+
+
+def test_smart_context_uses_hybrid_search():
+    """Context for the prompt includes keyword matches older than the recent window"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("hybrid_context_clone", batch_size=100)
+        memory.add_message("User", "My dog is called Biscuit")
+        memory.add_messages([{"speaker": "User", "content": f"small talk {i}"} for i in range(20)])
+        context = memory.get_smart_context("What is my dog called?", max_total=6)
+        assert "Biscuit" in context
+        memory.close()
+
+
+def _filtered_memory(name: str, vector_search: bool = True):
+    """Memory with User/Clone messages in two conversations and two time windows"""
+    memory = SqliteVecMemory(name, batch_size=100)
+    memory.vector_extension_available = memory.vector_extension_available and vector_search
+    memory.add_messages([
+        {"speaker": "User" if i % 5 else "Clone", "content": f"first week talk about travel {i}",
+         "conversation_id": "week-1"}
+        for i in range(20)
+    ])
+    memory.flush()
+    time.sleep(0.01)
+    boundary = time.time()
+    time.sleep(0.01)
+    memory.conversation_id = "week-2"
+    memory.add_messages([{"speaker": "User", "content": f"second week talk about travel {i}"} for i in range(10)])
+    return memory, boundary
+
+
+def test_filters_are_pushed_into_search():
+    """Filtered searches return limit matching results instead of filtering afterwards"""
+    with temporary_workdir():
+        for vector_search in (True, False):
+            memory, boundary = _filtered_memory(f"filter_clone_{vector_search}", vector_search)
+            for search in (memory.search_similar_messages, memory.search_messages):
+                clone_only = search("talk about travel", 3, speaker="Clone")
+                assert len(clone_only) == 3 and {r["speaker"] for r in clone_only} == {"Clone"}
+
+                recent = search("talk about travel", 5, since=boundary)
+                assert len(recent) == 5 and all(r["content"].startswith("second") for r in recent)
+
+                older = search("talk about travel", 5, until=boundary, speaker=["User", "Clone"])
+                assert len(older) == 5 and all(r["content"].startswith("first") for r in older)
+
+                week_two = search("talk about travel", 20, conversation_id="week-2")
+                assert len(week_two) == 10
+
+            stored = memory.conn.execute(
+                "SELECT COUNT(*) FROM messages WHERE conversation_id = 'week-1'").fetchone()[0]
+            assert stored == 20
+
+            try:
+                memory.search_messages("travel", 3, speakr="Clone")
+                assert False, "Misspelled filters should be rejected"
+            except TypeError:
+                pass
+            memory.close()
+
+
+def test_vector_index_layout_is_rebuilt():
+    """Indexes created without metadata columns are rebuilt on open"""
+    with temporary_workdir():
+        memory, _ = _filtered_memory("layout_clone")
+        require_vector_extension(memory)
+        memory.flush()
+        memory.conn.execute("DROP TABLE message_vectors")
+        memory.conn.execute("""
+            CREATE VIRTUAL TABLE message_vectors USING vec0(message_id INTEGER, embedding float32[384])
+        """)
+        memory.conn.execute("DELETE FROM schema_meta WHERE key = 'vector_index_layout'")
+        memory.conn.commit()
+        memory.close()
+
+        reopened = SqliteVecMemory("layout_clone")
+        assert reopened.conn.execute("SELECT COUNT(*) FROM message_vectors").fetchone()[0] == 30
+        results = reopened.search_similar_messages("talk about travel", 4, speaker="Clone")
+        assert len(results) == 4 and {r["speaker"] for r in results} == {"Clone"}
+        assert {r["source"] for r in results} == {"vector_search"}
+        reopened.close()
+
+
+def test_smart_context_does_not_repeat_recent_messages():
+    """Retrieval slots are only spent on messages outside the recent window"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("context_window_clone", batch_size=100)
+        memory.add_messages([{"speaker": "User", "content": f"travel story {i}"} for i in range(12)])
+        lines = memory.get_smart_context("travel story", max_total=8).splitlines()
+        assert len(lines) == 8
+        assert len(set(lines)) == 8
+        memory.close()
+
+
+def main():
+    """Run all text search tests"""
+    run_tests(
+        test_build_fts_query,
+        test_fts_index_follows_messages,
+        test_basic_mode_uses_bm25_ranking,
+        test_hybrid_search_fuses_rankings,
+        test_smart_context_uses_hybrid_search,
+        test_filters_are_pushed_into_search,
+        test_vector_index_layout_is_rebuilt,
+        test_smart_context_does_not_repeat_recent_messages,
+    )
+    print("✅ All text search tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Test Vector Matrix
+Verifies the memory-mapped float32 matrix engine and its use by SqliteVecMemory
+"""
+
+import os
+import sys
+
+import numpy as np
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.schema_migrations import get_meta
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.vector_matrix import VectorMatrix, matrix_files
+from helpers import temporary_workdir
+
+
+def _messages(start: int, count: int):
+    return [{"speaker": "User" if i % 2 else "Clone", "content": f"record {i} about area {i % 13}"}
+            for i in range(start, start + count)]
+
+
+def test_matrix_search_append_and_recovery():
+    """Searches are exact, appends are persisted and torn appends are trimmed"""
+    with temporary_workdir():
+        rng = np.random.default_rng(3)
+        vectors = rng.normal(size=(500, 32)).astype(np.float32)
+        matrix = VectorMatrix("clone", 32)
+        matrix.append(list(range(1, 301)), vectors[:300])
+        matrix.search(vectors[0], 1)  # Caches the row norms before the next append
+        matrix.append(list(range(301, 501)), vectors[300:])
+        assert len(matrix) == 500 and matrix.max_id == 500
+
+        query = vectors[420] + 0.01
+        distances = np.linalg.norm(vectors - query, axis=1)
+        expected = list(np.argsort(distances)[:5] + 1)
+        found = matrix.search(query, 5)
+        assert [message_id for message_id, _ in found] == expected
+        assert abs(found[0][1] - distances[420]) < 1e-4
+        assert all(message_id < 100 for message_id, _ in matrix.search(query, 5, before_id=100))
+        assert [i for i, _ in matrix.search(query, 10, allowed_ids=np.array([7, 9]))] in ([7, 9], [9, 7])
+
+        # A crash between the two file writes leaves a partial row behind
+        matrix_file, ids_file = matrix_files("clone")
+        with open(matrix_file, "ab") as f:
+            f.write(b"\0" * 100)
+        reopened = VectorMatrix("clone", 32)
+        assert len(reopened) == 500 and os.path.getsize(matrix_file) == 500 * 32 * 4
+        assert reopened.search(query, 5) == found
+
+        assert reopened.rebuild(((i, vectors[i - 1].tobytes()) for i in range(1, 51)), 20) == 50
+        assert len(reopened) == 50 and reopened.search(vectors[9], 1)[0][0] == 10
+
+
+def test_memory_with_mmap_engine():
+    """The mmap engine answers vector and hybrid searches, with or without sqlite-vec"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("matrix_clone", batch_size=100, vector_engine="mmap")
+        memory.add_messages(_messages(0, 400))
+        memory.flush()
+        stats = memory.get_memory_stats()
+        assert stats["vector_engine"] == "mmap" and stats["vector_embeddings"] == 400
+        assert memory.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'message_vectors'").fetchone()[0] == 0
+
+        query = "record 123 about area 6"
+        results = memory.search_similar_messages(query, 5)
+        assert results[0]["content"] == query and results[0]["source"] == "vector_search"
+        assert abs(results[0]["similarity_score"] - 1.0) < 1e-5
+        assert memory.search_messages(query, 3)[0]["content"] == query
+        clone_only = memory.search_similar_messages(query, 5, speaker="Clone")
+        assert len(clone_only) == 5 and {r["speaker"] for r in clone_only} == {"Clone"}
+        assert memory.search_similar_messages(query, 5, before_id=100)[0]["content"] != query
+
+        if memory.vector_extension_available:
+            reference = SqliteVecMemory("vec0_clone", batch_size=400)
+            reference.add_messages(_messages(0, 400))
+            expected = [(r["content"], round(r["similarity_score"], 4))
+                        for r in reference.search_similar_messages("area 4 records", 10)]
+            assert [(r["content"], round(r["similarity_score"], 4))
+                    for r in memory.search_similar_messages("area 4 records", 10)] == expected
+            reference.close()
+        memory.close()
+
+        # Rows lost before reaching the matrix are appended again from messages
+        _, ids_file = matrix_files(os.path.splitext(memory.db_file)[0])
+        os.truncate(ids_file, 390 * 8)
+        reopened = SqliteVecMemory("matrix_clone", vector_engine="mmap")
+        assert len(reopened.vector_matrix) == 400
+        assert get_meta(reopened.conn, "vector_index_layout") == "mmap float32[384]"
+        reopened.close()
+
+        if memory.vector_extension_available:
+            # Back to vec0: the index is rebuilt and the matrix files removed
+            vec0 = SqliteVecMemory("matrix_clone")
+            assert vec0.get_memory_stats()["vector_embeddings"] == 400
+            assert not os.path.exists(ids_file)
+            vec0.close()
+
+        for options in ({"vector_engine": "faiss"},
+                        {"vector_engine": "mmap", "vector_shards": 2},
+                        {"vector_engine": "mmap", "vector_quantization": "int8"},
+                        {"vector_engine": "mmap", "shared_store": True}):
+            try:
+                SqliteVecMemory("invalid_clone", **options)
+                assert False, f"{options} should be rejected"
+            except ValueError:
+                pass
+
+
+def main():
+    """Run all vector matrix tests"""
+    test_matrix_search_append_and_recovery()
+    test_memory_with_mmap_engine()
+    print("✅ All vector matrix tests passed")
+
+
+if __name__ == "__main__":
+    main()
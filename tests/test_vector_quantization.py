@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Test Vector Quantization
+Verifies quantized and truncated vector indexes with exact float re-ranking
+"""
+
+import os
+import sys
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.schema_migrations import get_meta
+from helpers import require_vector_extension, run_tests, temporary_workdir
+
+
+MESSAGES = [{"speaker": "User" if i % 2 else "Clone", "content": f"note {i} about topic {i % 9}"}
+            for i in range(600)]
+QUERIES = [f"question {i} on topic {i % 5}" for i in range(20)]
+
+
+def _recall(expected, actual) -> float:
+    return len(set(expected) & set(actual)) / len(expected)
+
+
+def test_quantized_search_is_reranked_exactly():
+    """Quantized indexes find the float neighbors and report exact float similarities"""
+    with temporary_workdir():
+        baseline = SqliteVecMemory("float_clone", batch_size=600)
+        baseline.add_messages(MESSAGES)
+        require_vector_extension(baseline)
+
+        for quantization, min_recall in (("int8", 0.95), ("bit", 0.5)):
+            memory = SqliteVecMemory(f"{quantization}_clone", batch_size=600,
+                                     vector_quantization=quantization)
+            memory.add_messages(MESSAGES)
+            assert get_meta(memory.conn, "vector_index_layout").startswith(f"{quantization}[384];")
+            assert memory.get_memory_stats()["vector_quantization"] == quantization
+
+            recall = 0.0
+            for query in QUERIES:
+                expected = baseline.search_similar_messages(query, 10)
+                results = memory.search_similar_messages(query, 10)
+                scores = [r["similarity_score"] for r in results]
+                assert scores == sorted(scores, reverse=True)
+                # Scores come from the float embeddings, so shared hits score the same
+                exact = {r["content"]: r["similarity_score"] for r in expected}
+                for result in results:
+                    if result["content"] in exact:
+                        assert abs(exact[result["content"]] - result["similarity_score"]) < 1e-4
+                recall += _recall([r["content"] for r in expected], [r["content"] for r in results])
+            assert recall / len(QUERIES) >= min_recall
+
+            top = memory.search_similar_messages("note 17 about topic 8", 1, speaker="User")
+            assert top[0]["content"] == "note 17 about topic 8" and abs(top[0]["similarity_score"] - 1.0) < 1e-6
+            assert memory.search_messages("note 17 about topic 8", 3)[0]["content"] == "note 17 about topic 8"
+            memory.close()
+        baseline.close()
+
+
+def test_changing_quantization_rebuilds_index():
+    """Reopening with another quantization rebuilds the index from the stored floats"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("switch_clone", batch_size=600)
+        memory.add_messages(MESSAGES[:100])
+        memory.close()
+        require_vector_extension(memory)
+
+        quantized = SqliteVecMemory("switch_clone", vector_quantization="int8")
+        assert get_meta(quantized.conn, "vector_index_layout").startswith("int8[384];")
+        assert quantized.get_memory_stats()["vector_embeddings"] == 100
+        lengths = {row[0] for row in quantized.conn.execute("SELECT length(embedding) FROM messages")}
+        assert lengths == {384 * 4}
+        quantized.close()
+
+        sharded = SqliteVecMemory("switch_clone", vector_quantization="bit", vector_shards=2)
+        assert sharded.search_similar_messages("note 42 about topic 6", 1)[0]["content"] == "note 42 about topic 6"
+        sharded.close()
+
+
+def test_truncated_index_reranks_full_dimension():
+    """A truncated index is a first pass; results are ranked by the full embeddings"""
+    with temporary_workdir():
+        baseline = SqliteVecMemory("full_clone", batch_size=600)
+        baseline.add_messages(MESSAGES)
+        require_vector_extension(baseline)
+
+        for options in ({"truncate_dim": 64}, {"truncate_dim": 128, "vector_quantization": "int8"}):
+            name = f"truncated_{options['truncate_dim']}_clone"
+            memory = SqliteVecMemory(name, batch_size=600, **options)
+            memory.add_messages(MESSAGES)
+            layout = get_meta(memory.conn, "vector_index_layout")
+            assert layout.split(";")[0].endswith(f"[{options['truncate_dim']}]")
+            assert memory.get_memory_stats()["index_dimension"] == options["truncate_dim"]
+            lengths = {row[0] for row in memory.conn.execute("SELECT length(embedding) FROM messages")}
+            assert lengths == {384 * 4}
+
+            for query in QUERIES[:5]:
+                expected = [(r["content"], round(r["similarity_score"], 4))
+                            for r in baseline.search_similar_messages(query, 5)]
+                results = [(r["content"], round(r["similarity_score"], 4))
+                           for r in memory.search_similar_messages(query, 5)]
+                assert results == expected
+            memory.close()
+
+            # Back to the full dimension: the index is rebuilt from the stored embeddings
+            full = SqliteVecMemory(name)
+            assert get_meta(full.conn, "vector_index_layout").startswith("float32[384];")
+            assert full.get_memory_stats()["vector_embeddings"] == len(MESSAGES)
+            full.close()
+        baseline.close()
+
+
+def test_invalid_quantization_is_rejected():
+    """Unknown quantizations, bit vectors of odd sizes and bad truncations are refused"""
+    with temporary_workdir():
+        for options in ({"vector_quantization": "int4"},
+                        {"vector_quantization": "bit", "embedding_dim": 100},
+                        {"vector_quantization": "bit", "truncate_dim": 60},
+                        {"truncate_dim": 384},
+                        {"truncate_dim": 0}):
+            try:
+                SqliteVecMemory("invalid_clone", **options)
+                assert False, f"{options} should be rejected"
+            except ValueError:
+                pass
+
+
+def main():
+    """Run all vector quantization tests"""
+    run_tests(
+        test_quantized_search_is_reranked_exactly,
+        test_changing_quantization_rebuilds_index,
+        test_truncated_index_reranks_full_dimension,
+        test_invalid_quantization_is_rejected,
+    )
+    print("✅ All vector quantization tests passed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test Vector Shards
+Verifies consistent hashing, parallel sharded KNN and shard rebalancing of SqliteVecMemory
+"""
+
+import os
+import sys
+import time
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.schema_migrations import get_meta
+from memory.vector_shards import TIME_BUCKET_SECONDS, HashRing, existing_shard_files
+from helpers import require_vector_extension, run_tests, temporary_workdir
+
+
+def _messages(count: int):
+    return [
+        {"speaker": "User" if i % 3 else "Clone", "content": f"memory number {i} about topic {i % 7}"}
+        for i in range(count)
+    ]
+
+
+def test_hash_ring():
+    """Keys spread over all shards and mostly stay put when a shard is added"""
+    four, five = HashRing(4), HashRing(5)
+    keys = range(10000)
+    counts = [0] * 4
+    for key in keys:
+        counts[four.shard_for(key)] += 1
+    assert min(counts) > 1500
+
+    moved = sum(1 for key in keys if four.shard_for(key) != five.shard_for(key))
+    assert moved < 0.3 * len(keys)
+    try:
+        HashRing(0)
+        assert False, "A ring needs at least one shard"
+    except ValueError:
+        pass
+
+
+def test_sharded_search_matches_single_index():
+    """Merged per-shard KNN returns the same neighbors as one index"""
+    with temporary_workdir():
+        single = SqliteVecMemory("single_clone", batch_size=100)
+        sharded = SqliteVecMemory("sharded_clone", batch_size=100, vector_shards=4)
+        for memory in (single, sharded):
+            memory.add_messages(_messages(200))
+            memory.flush()
+
+        if not sharded.vector_extension_available:
+            assert sharded.vector_shard_set is None
+        require_vector_extension(single, sharded)
+
+        assert len(existing_shard_files(sharded.db_file)) == 4
+        assert sharded.conn.execute(
+            "SELECT COUNT(*) FROM sqlite_master WHERE name = 'message_vectors'").fetchone()[0] == 0
+        stats = sharded.get_memory_stats()
+        assert stats["vector_embeddings"] == 200
+        assert all(count > 0 for count in stats["vector_shards"]["vectors_per_shard"])
+
+        for query in ("memory number 42", "topic 3", "number 150 about topic 3"):
+            expected = [r["content"] for r in single.search_similar_messages(query, 10)]
+            results = sharded.search_similar_messages(query, 10)
+            assert [r["content"] for r in results] == expected
+            assert {r["source"] for r in results} == {"vector_search"}
+            assert ([r["content"] for r in sharded.search_messages(query, 10)] ==
+                    [r["content"] for r in single.search_messages(query, 10)])
+
+        clone_only = sharded.search_similar_messages("memory number", 10, speaker="Clone")
+        assert len(clone_only) == 10 and {r["speaker"] for r in clone_only} == {"Clone"}
+        single.close()
+        sharded.close()
+
+
+def test_changing_shard_count_rebalances():
+    """Reopening with another shard count moves only misplaced vectors"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("rebalance_clone", batch_size=100, vector_shards=4)
+        memory.add_messages(_messages(300))
+        memory.close()
+        require_vector_extension(memory)
+
+        grown = SqliteVecMemory("rebalance_clone", vector_shards=5)
+        assert get_meta(grown.conn, "vector_shards") == "5"
+        per_shard = grown.get_memory_stats()["vector_shards"]["vectors_per_shard"]
+        assert len(per_shard) == 5 and sum(per_shard) == 300
+        assert grown.rebalance_vector_shards() == 0
+        query = "memory number 7 about topic 0"
+        assert grown.search_similar_messages(query, 1)[0]["content"] == query
+        grown.close()
+
+        shrunk = SqliteVecMemory("rebalance_clone", vector_shards=2)
+        assert len(existing_shard_files(shrunk.db_file)) == 2
+        assert shrunk.get_memory_stats()["vector_embeddings"] == 300
+        shrunk.close()
+
+        # Back to a single index in the clone's own database
+        single = SqliteVecMemory("rebalance_clone")
+        assert existing_shard_files(single.db_file) == {}
+        assert single.get_memory_stats()["vector_embeddings"] == 300
+        single.close()
+
+
+def test_time_sharding_prunes_searches():
+    """Time keyed shards only search the shards holding the requested range"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("time_clone", batch_size=100, vector_shards=4, shard_key="time")
+        memory.add_messages(_messages(50))
+        memory.flush()
+        require_vector_extension(memory)
+
+        now = time.time()
+        shard_set = memory.vector_shard_set
+        assert len(shard_set.shards_for_range(now - 60, now + 60)) <= 2
+        assert len(shard_set.shards_for_range(None, now)) == 4
+        assert shard_set.shard_for(1, now) == shard_set.shard_for(2, now + 1)
+        assert shard_set.shards_for_range(now, now + TIME_BUCKET_SECONDS * 100) == [0, 1, 2, 3]
+
+        results = memory.search_similar_messages("memory number 5", 5, since=now - 3600, until=now + 3600)
+        assert len(results) == 5
+        assert memory.search_similar_messages("memory number 5", 5, until=now - 3600) == []
+        memory.close()
+
+        try:
+            SqliteVecMemory("bad_key_clone", vector_shards=2, shard_key="random")
+            assert False, "Unknown shard keys should be rejected"
+        except ValueError:
+            pass
+        try:
+            SqliteVecMemory("shared_clone", vector_shards=2, shared_store=True)
+            assert False, "Shared stores cannot be sharded per clone"
+        except ValueError:
+            pass
+
+
+def main():
+    """Run all vector shard tests"""
+    run_tests(
+        test_hash_ring,
+        test_sharded_search_matches_single_index,
+        test_changing_shard_count_rebalances,
+        test_time_sharding_prunes_searches,
+    )
+    print("✅ All vector shard tests passed")
+
+
+if __name__ == "__main__":
+    main()
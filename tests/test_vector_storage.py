@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Test Vector Memory Storage
+Verifies write batching, read-your-writes and storage maintenance of SqliteVecMemory
+"""
+
+import os
+import sys
+import time
+import sqlite3
+from datetime import datetime
+
+# Add src to path for imports
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src'))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from memory.sqlite_vec_memory import SqliteVecMemory
+from memory.sqlite_tuning import apply_connection_profile
+from helpers import temporary_workdir
+
+
+def _stored_message_count(memory: SqliteVecMemory) -> int:
+    """Count rows actually written to the database file, bypassing the memory object"""
+    conn = sqlite3.connect(memory.db_file)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM messages").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_size_based_flush():
+    """Messages are written once the queue reaches batch_size"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("batch_clone", batch_size=4, flush_interval=60)
+        for i in range(3):
+            memory.add_message("User", f"message {i}")
+        assert _stored_message_count(memory) == 0
+        assert len(memory.pending_messages) == 3
+
+        memory.add_message("User", "message 3")
+        assert _stored_message_count(memory) == 4
+        assert memory.pending_messages == []
+        memory.close()
+
+
+def test_time_based_flush():
+    """A partially filled queue is flushed after flush_interval"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("timer_clone", batch_size=100, flush_interval=0.1)
+        memory.add_message("User", "hello")
+        deadline = time.time() + 5
+        while _stored_message_count(memory) == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert _stored_message_count(memory) == 1
+        memory.close()
+
+
+def test_reads_see_unflushed_messages():
+    """Recent context and search include messages still in the write queue"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("read_your_writes_clone", batch_size=3, flush_interval=60)
+        memory.add_messages([
+            {"speaker": "User", "content": "first"},
+            {"speaker": "Clone", "content": "second"},
+            {"speaker": "User", "content": "third"},
+        ])
+        memory.add_message("Clone", "fourth (queued)")
+        memory.add_message("User", "fifth (queued)")
+
+        recent = memory.get_context(4)
+        assert [m["content"] for m in recent] == ["second", "third", "fourth (queued)", "fifth (queued)"]
+
+        results = memory.search_messages("fifth (queued)", 5)
+        assert any(r["content"] == "fifth (queued)" for r in results)
+        assert memory.search_similar_messages("fourth (queued)", 1)[0]["content"] == "fourth (queued)"
+        by_user = memory.search_messages("queued", 5, speaker="User")
+        assert by_user[0]["content"] == "fifth (queued)" and {r["speaker"] for r in by_user} == {"User"}
+        assert memory.get_memory_stats()["total_messages"] == 5
+        assert memory.get_conversation_summary().startswith("Conversation: 5 messages")
+        assert "fifth (queued)" in memory.get_smart_context("fifth", max_total=4)
+
+        # Reads answer from the queue instead of writing it
+        assert _stored_message_count(memory) == 3
+        assert len(memory.pending_messages) == 2
+        memory.close()
+
+
+def test_batches_continue_ids_and_close_flushes():
+    """Explicit ids continue after existing rows and close() writes the queue"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("id_clone", batch_size=2, flush_interval=60)
+        memory.add_messages([{"speaker": "User", "content": f"m{i}"} for i in range(5)])
+        memory.close()
+
+        reopened = SqliteVecMemory("id_clone", batch_size=2, flush_interval=60)
+        reopened.add_message("User", "m5")
+        reopened.flush()
+        ids = [row[0] for row in reopened.conn.execute("SELECT id FROM messages ORDER BY id")]
+        assert ids == [1, 2, 3, 4, 5, 6]
+
+        if reopened.vector_extension_available:
+            vector_ids = [row[0] for row in reopened.conn.execute(
+                "SELECT message_id FROM message_vectors ORDER BY message_id")]
+            assert vector_ids == ids
+        reopened.close()
+
+
+def test_legacy_text_id_database_is_rebuilt():
+    """Tables with the TEXT ids of the first releases get integer ids and accept batches"""
+    with temporary_workdir():
+        os.makedirs("data/vector_memory")
+        conn = sqlite3.connect("data/vector_memory/legacy_clone_vectors.db")
+        conn.execute("""
+            CREATE TABLE messages (
+                id TEXT PRIMARY KEY,
+                speaker TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                conversation_id TEXT,
+                metadata TEXT
+            )
+        """)
+        conn.executemany("INSERT INTO messages VALUES (?, 'User', ?, '2025-08-06T21:28:36', 'c1', NULL)",
+                         [(f"uuid-{i}" if i % 2 else None, f"old {i}") for i in range(4)])
+        conn.commit()
+        conn.close()
+
+        memory = SqliteVecMemory("legacy_clone", batch_size=10, flush_interval=60)
+        memory.add_message("User", "new 4")
+        memory.flush()
+        assert memory.pending_messages == []
+        rows = memory.conn.execute("SELECT id, content, conversation_id FROM messages ORDER BY id").fetchall()
+        assert [row[0] for row in rows] == [1, 2, 3, 4, 5]
+        assert [row[1] for row in rows] == ["old 0", "old 1", "old 2", "old 3", "new 4"]
+        assert rows[0][2] == "c1"
+        memory.close()
+
+
+def test_connection_profiles():
+    """Profiles are applied at open time and reported in stats"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("profile_clone", connection_profile="throughput")
+        settings = memory.get_memory_stats()["connection_settings"]
+        assert settings["journal_mode"] == "wal"
+        assert settings["synchronous"] == 1  # NORMAL
+        assert settings["page_size"] == 8192
+        assert settings["temp_store"] == 2  # MEMORY
+        memory.close()
+
+        legacy = SqliteVecMemory("legacy_clone", connection_profile="legacy")
+        journal_mode = legacy.conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert journal_mode == "delete"
+        legacy.close()
+
+        custom = sqlite3.connect(":memory:")
+        assert apply_connection_profile(custom, {"cache_size": -1024}) == {"cache_size": -1024}
+        custom.close()
+
+        try:
+            SqliteVecMemory("bad_profile_clone", connection_profile="turbo")
+            assert False, "Unknown profiles should be rejected"
+        except ValueError:
+            pass
+
+
+def test_wal_allows_reads_during_writes():
+    """With WAL a second connection reads committed data while a write is open"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("wal_clone", batch_size=1, flush_interval=0)
+        memory.add_message("User", "committed")
+
+        memory.conn.execute("BEGIN IMMEDIATE")
+        memory.conn.execute(
+            "INSERT INTO messages (speaker, content, timestamp) VALUES ('User', 'uncommitted', '2024-01-01T00:00:00')")
+
+        reader = sqlite3.connect(memory.db_file, timeout=0)
+        assert reader.execute("SELECT COUNT(*) FROM messages").fetchone()[0] == 1
+        reader.close()
+
+        memory.conn.execute("ROLLBACK")
+        memory.close()
+
+
+def test_incremental_maintenance_on_save():
+    """save_memory releases free pages incrementally instead of running VACUUM"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("maintenance_clone", batch_size=500)
+        assert memory.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2  # INCREMENTAL
+
+        memory.add_messages([{"speaker": "User", "content": "x" * 2000 + str(i)} for i in range(500)])
+        memory.flush()
+        memory.conn.execute("DELETE FROM messages")
+        memory.conn.commit()
+        free_before = memory.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_before > memory.max_free_pages
+
+        memory.vacuum_pages_per_step = 100
+        report = memory.run_maintenance()
+        assert report["pages_released"] >= 100
+        memory.save_memory()
+        free_after = memory.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_after <= free_before - 200
+        assert "last_maintenance" in memory.stats
+        memory.close()
+
+
+def test_background_maintenance_and_conversion():
+    """Maintenance runs on a schedule and old databases can be converted once"""
+    with temporary_workdir():
+        legacy = SqliteVecMemory("legacy_vacuum_clone", connection_profile="legacy")
+        assert legacy.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        assert legacy.enable_incremental_vacuum() is True
+        assert legacy.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert legacy.enable_incremental_vacuum() is False
+        legacy.close()
+
+        memory = SqliteVecMemory("scheduled_clone", maintenance_interval=0.05)
+        deadline = time.time() + 5
+        while memory.maintenance_scheduler.runs == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        assert memory.maintenance_scheduler.runs > 0
+        memory.close()
+        assert not memory.maintenance_scheduler.running
+
+
+def test_recency_uses_primary_key():
+    """Recent context is read from the primary key without sorting the table"""
+    with temporary_workdir():
+        memory = SqliteVecMemory("recency_clone", batch_size=10, flush_interval=60)
+        memory.add_messages([{"speaker": "User", "content": f"m{i}"} for i in range(25)])
+        memory.flush()
+
+        plan = " ".join(row[-1] for row in memory.conn.execute("""
+            EXPLAIN QUERY PLAN SELECT speaker, content, timestamp FROM messages ORDER BY id DESC LIMIT 5
+        """))
+        assert "TEMP B-TREE" not in plan.upper()
+
+        assert [m["content"] for m in memory.get_context(3)] == ["m22", "m23", "m24"]
+        epoch, timestamp = memory.conn.execute(
+            "SELECT epoch, timestamp FROM messages ORDER BY id DESC LIMIT 1").fetchone()
+        assert abs(datetime.fromisoformat(timestamp).timestamp() - epoch) < 1e-3
+        memory.close()
+
+
+def test_epoch_migration_for_existing_databases():
+    """Databases without the epoch column are migrated and backfilled on open"""
+    with temporary_workdir():
+        os.makedirs("data/vector_memory")
+        conn = sqlite3.connect("data/vector_memory/old_clone_vectors.db")
+        conn.execute("""
+            CREATE TABLE messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                speaker TEXT NOT NULL,
+                content TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                embedding BLOB,
+                metadata TEXT
+            )
+        """)
+        timestamps = ["2024-03-01T09:15:00.250000", "2024-03-01T09:16:30", "2024-07-15T22:00:00"]
+        conn.executemany("INSERT INTO messages (speaker, content, timestamp) VALUES ('User', ?, ?)",
+                         [(f"old {i}", ts) for i, ts in enumerate(timestamps)])
+        conn.commit()
+        conn.close()
+
+        memory = SqliteVecMemory("old_clone", connection_profile="legacy")
+        rows = memory.conn.execute("SELECT timestamp, epoch FROM messages ORDER BY id").fetchall()
+        for timestamp, epoch in rows:
+            assert abs(datetime.fromisoformat(timestamp).timestamp() - epoch) < 1e-3
+        indexes = {row[1] for row in memory.conn.execute("PRAGMA index_list(messages)")}
+        assert "idx_messages_epoch" in indexes
+
+        memory.add_message("User", "new message")
+        assert [m["content"] for m in memory.get_context(2)] == ["old 2", "new message"]
+        memory.close()
+
+
+def main():
+    """Run all storage tests"""
+    test_size_based_flush()
+    test_time_based_flush()
+    test_reads_see_unflushed_messages()
+    test_batches_continue_ids_and_close_flushes()
+    test_legacy_text_id_database_is_rebuilt()
+    test_connection_profiles()
+    test_wal_allows_reads_during_writes()
+    test_incremental_maintenance_on_save()
+    test_background_maintenance_and_conversion()
+    test_recency_uses_primary_key()
+    test_epoch_migration_for_existing_databases()
+    print("✅ All vector storage tests passed")
+
+
+if __name__ == "__main__":
+    main()